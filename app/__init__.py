@@ -1,5 +1,6 @@
 from flask import Flask
 from app.extensions import db
+from app.services.SQLite_Profiles import DEFAULT_SQLITE_PROFILE, init_flask_sqlite
 from app.routes._init_ import register_blueprints
 from app.api._init_ import init_api
 
@@ -12,8 +13,8 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///user.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
-    # 初始化扩展
-    db.init_app(app)
+    # 初始化扩展（SQLite 按 oltp 配置设置 PRAGMA 与连接池）
+    init_flask_sqlite(app, db, DEFAULT_SQLITE_PROFILE)
 
     # 初始化API（注册auth和user蓝图）
     init_api(app)
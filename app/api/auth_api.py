@@ -26,7 +26,7 @@ def login():
         if not user:
             return api_response(401, user_service.error_msg or "用户名或密码错误", None)
 
-        tokens = jwt_service.generate_tokens(
+        tokens = jwt_service.generate_login_tokens(
             username=user.username,
             role=user.role,
             user_id=user.id
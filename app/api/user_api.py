@@ -1,13 +1,13 @@
 from flask import Blueprint, request
 from app.utils.response import api_response
 from app.middleware.jwt_auth import jwt_required
-from app.services.SM2_Utils import SM2Service
-from app.services.user_service import user_service
+from app.services.Crypto_Sidecar import create_sm2_service
+from app.services.user_service import iter_user_records, user_service
 
 # 定义用户接口蓝图（路径前缀：/api/v1）
 user_bp = Blueprint("user", __name__, url_prefix="/api/v1")
 
-sm2_service = SM2Service()
+sm2_service = create_sm2_service()
 
 
 # 接口1：用户注册（POST /api/v1/users）
@@ -93,4 +93,46 @@ def update_phone():
     if success:
         return api_response(200, "手机号更新成功")
     else:
-        return api_response(500, "更新失败，请重试")
\ No newline at end of file
+        return api_response(500, "更新失败，请重试")
+
+
+# 接口4：批量导入用户（POST /api/v1/users/bulk，仅管理员）
+# 请求体为 NDJSON（Content-Type: application/x-ndjson）或 CSV（text/csv，首行表头 username,password,phone），流式读取
+@user_bp.route("/users/bulk", methods=["POST"])
+@jwt_required
+def bulk_import_users():
+    if request.user_info.get("role") != "admin":
+        return api_response(403, "仅管理员可批量导入用户")
+    import io
+    fmt = "csv" if "csv" in (request.content_type or "") else "ndjson"
+    stream = io.TextIOWrapper(request.stream, encoding="utf-8-sig", newline="")
+    try:
+        report = user_service.bulk_import(iter_user_records(stream, fmt), sm2_service)
+    except Exception as e:
+        return api_response(500, f"批量导入失败：{str(e)}")
+    print(f"✅ 批量导入完成: 共 {report['total']} 行，成功 {report['imported']}，失败 {report['failed']}")
+    return api_response(200, "导入完成", report)
+
+
+# 接口5：运行指标（GET /api/v1/stats，仅管理员）
+# 汇总各服务已有的 stats()：临时密钥池、计算卸载池、SM2 加密重试、用户缓存、令牌注销表与数据库连接池
+@user_bp.route("/stats", methods=["GET"])
+@jwt_required
+def runtime_stats():
+    if request.user_info.get("role") != "admin":
+        return api_response(403, "仅管理员可查看运行指标")
+    from app.services.Crypto_Executor import crypto_executor_stats
+    from app.services.JWT_SM2_Utils import jwt_service
+    from app.services.SM2_Cipher import encryption_stats
+    from app.services.SM2_NoncePool import nonce_pool_stats
+    from app.services.SQLite_Pool import pool_stats as sqlite_pool_stats
+    from app.services.数据安全层访问 import pool_stats
+    return api_response(200, "查询成功", {
+        "nonce_pool": nonce_pool_stats(),
+        "crypto_executor": crypto_executor_stats(),
+        "sm2_encryption": encryption_stats(),
+        "user_cache": user_service.cache_stats(),
+        "token_revocation": jwt_service.revocation_stats(),
+        "sqlite_pools": sqlite_pool_stats(),
+        "data_layer_pool": pool_stats(),
+    })
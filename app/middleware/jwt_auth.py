@@ -5,7 +5,7 @@ from app.services.JWT_SM2_Utils import jwt_service
 
 
 def jwt_required(f):
-    """保护需要登录的接口：校验 Bearer JWT（SM2 签名）"""
+    """保护需要登录的接口：校验 Bearer JWT（SM2 签名，已验证的令牌走缓存）"""
 
     @wraps(f)
     def wrapper(*args, **kwargs):
@@ -19,7 +19,7 @@ def jwt_required(f):
 
         token = parts[1]
         try:
-            payload = jwt_service.verify_token(token)
+            payload = jwt_service.verify_token_cached(token)
         except Exception:
             return api_response(401, "令牌无效或已过期，请重新登录")
 
@@ -40,8 +40,8 @@ def issue_cert():
         cert = cert_service.issue_user_cert(username)
         
         # 将证书信息保存到数据库 (使用原生 SQLite，如你原有代码)
-        import sqlite3
-        import os
+        from app.services.user_service import DB_PATH
+        from app.services.SQLite_Pool import get_pool
         from cryptography.hazmat.primitives import hashes
         from cryptography import x509 as x509_lib
         from cryptography.hazmat.backends import default_backend
@@ -53,54 +53,50 @@ def issue_cert():
         )
         fingerprint = cert_obj.fingerprint(hashes.SHA256()).hex()
         
-        # 获取用户 ID（从 users 表）- 使用绝对路径
-        db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "user.db")
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-        user_row = cursor.fetchone()
-        
-        if not user_row:
-            conn.close()
-            return jsonify({"code": 404, "msg": f"用户 {username} 不存在"}), 404
-        
-        user_id = user_row["id"]
-        
-        # 检查是否已存在该用户的证书
-        cursor.execute("SELECT id FROM certificates WHERE user_id = ?", (user_id,))
-        existing_cert = cursor.fetchone()
+        # 从 user.db 连接池借出连接；查重与写入放在同一事务内，异常时回滚，结束后连接归还连接池
+        with get_pool(DB_PATH).connection() as conn:
+            cursor = conn.cursor()
+            # 获取用户 ID（从 users 表）
+            cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+            user_row = cursor.fetchone()
+
+            if not user_row:
+                return jsonify({"code": 404, "msg": f"用户 {username} 不存在"}), 404
+
+            user_id = user_row["id"]
+
+            # 检查是否已存在该用户的证书
+            cursor.execute("SELECT id FROM certificates WHERE user_id = ?", (user_id,))
+            existing_cert = cursor.fetchone()
         
-        if existing_cert:
-            # 更新现有证书
-            cursor.execute(
-                """UPDATE certificates 
-                   SET fingerprint = ?, serial_number = ?, expired_at = ?, status = 1 
-                   WHERE user_id = ?""",
-                (fingerprint, str(cert["serial_number"]), cert["not_after"], user_id)
-            )
-        else:
-            # 创建新证书记录
-            import uuid
-            from datetime import datetime
-            cert_id = str(uuid.uuid4())
-            cursor.execute(
-                """INSERT INTO certificates (id, user_id, fingerprint, serial_number, subject, cert_type, status, issued_at, expired_at)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    cert_id,
-                    user_id,
-                    fingerprint,
-                    str(cert["serial_number"]),
-                    f"CN={username},O=CA-CERT-PLATFORM",
-                    "client",
-                    1,
-                    datetime.utcnow().isoformat(),
-                    cert["not_after"]
+            if existing_cert:
+                # 更新现有证书
+                cursor.execute(
+                    """UPDATE certificates 
+                       SET fingerprint = ?, serial_number = ?, expired_at = ?, status = 1 
+                       WHERE user_id = ?""",
+                    (fingerprint, str(cert["serial_number"]), cert["not_after"], user_id)
+                )
+            else:
+                # 创建新证书记录
+                import uuid
+                from datetime import datetime
+                cert_id = str(uuid.uuid4())
+                cursor.execute(
+                    """INSERT INTO certificates (id, user_id, fingerprint, serial_number, subject, cert_type, status, issued_at, expired_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (
+                        cert_id,
+                        user_id,
+                        fingerprint,
+                        str(cert["serial_number"]),
+                        f"CN={username},O=CA-CERT-PLATFORM",
+                        "client",
+                        1,
+                        datetime.utcnow().isoformat(),
+                        cert["not_after"]
+                    )
                 )
-            )
-        conn.commit()
-        conn.close()
         
         print(f"[DEBUG] 证书已保存到数据库，用户: {username}, 用户ID: {user_id}, 指纹: {fingerprint}")
         
@@ -116,7 +112,8 @@ def issue_cert():
 
 @cert_bp.route("/cert-login", methods=["POST"])
 def cert_login():
-    import sqlite3
+    from app.services.user_service import DB_PATH
+    from app.services.SQLite_Pool import get_pool
     
     try:
         print("=" * 50)
@@ -152,20 +149,15 @@ def cert_login():
         client_cert, fingerprint = CertService.verify_client_cert(client_cert_pem, CA_CERT_PATH)
         print(f"[DEBUG] 证书验证成功，指纹: {fingerprint}")
 
-        # 使用原生 SQLite 查询数据库
-        conn = sqlite3.connect('user.db')
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
+        # 使用原生 SQLite 查询数据库（与 user_service 同一个 user.db，不依赖工作目录）
         # 首先查询证书信息
-        cursor.execute(
-            "SELECT id, user_id, fingerprint, serial_number, status, expired_at FROM certificates WHERE fingerprint = ? AND status = 1",
-            (fingerprint,)
-        )
-        cert_row = cursor.fetchone()
+        with get_pool(DB_PATH).connection() as conn:
+            cert_row = conn.execute(
+                "SELECT id, user_id, fingerprint, serial_number, status, expired_at FROM certificates WHERE fingerprint = ? AND status = 1",
+                (fingerprint,)
+            ).fetchone()
         
         if not cert_row:
-            conn.close()
             print(f"[ERROR] 证书未授权，指纹: {fingerprint}")
             print("=" * 50)
             return jsonify({"code": 401, "msg": "证书未授权或已禁用"}), 401
@@ -176,16 +168,14 @@ def cert_login():
             from datetime import datetime as dt
             expired_at = dt.fromisoformat(expired_at_str) if isinstance(expired_at_str, str) else expired_at
             if expired_at < dt.utcnow():
-                conn.close()
                 print(f"[ERROR] 证书已过期")
                 print("=" * 50)
                 return jsonify({"code": 401, "msg": "证书已过期"}), 401
 
         # 通过 user_id 获取用户信息
         user_id = cert_row["user_id"]
-        cursor.execute("SELECT id, username, role FROM users WHERE id = ?", (user_id,))
-        user_row = cursor.fetchone()
-        conn.close()
+        with get_pool(DB_PATH).connection() as conn:
+            user_row = conn.execute("SELECT id, username, role FROM users WHERE id = ?", (user_id,)).fetchone()
         
         if not user_row:
             print(f"[ERROR] 用户不存在，user_id: {user_id}")
@@ -194,7 +184,7 @@ def cert_login():
 
         # 生成 JWT Token（使用 SM2 签名）
         from app.services.JWT_SM2_Utils import jwt_service
-        tokens = jwt_service.generate_tokens(
+        tokens = jwt_service.generate_login_tokens(
             username=user_row["username"],
             role=user_row["role"] or "user",
             user_id=user_row["id"]
@@ -0,0 +1,264 @@
+"""
+国密/RSA 计算卸载：SM2 签名、验签、加解密、密钥生成与批量 SM3 密码哈希在进程池中执行，不占用 Web 线程的 GIL。
+
+- 进程池按 CPU 核数建立，启动时用 fork 继承父进程已预建的固定基表和已登记公钥，
+  initializer 再补登记一次传入的公钥，首个请求不必现场建表；
+- 每种运算都有同步接口（sign / verify / ...）和返回 concurrent.futures.Future 的 submit_* 接口；
+- stats() 给出排队深度（已提交未完成的任务数）、峰值与各运算计数；
+- 进程级单例按 enable_crypto_executor() / get_crypto_executor() 启用和获取，
+  未启用时各服务仍在本线程内计算（与 SM2_NoncePool 的用法一致）。
+"""
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .SM2_Cipher import decrypt as sm2_decrypt, encrypt as sm2_encrypt
+from .SM2_Curve import N, base_table, derive_public_key, register_public_key, sign_digest, verify_signature
+from .SM3_Service import hash_passwords
+
+# 进程池大小，默认为 CPU 核数
+DEFAULT_MAX_WORKERS = os.cpu_count() or 1
+# 同步接口等待结果的超时（秒）
+TASK_TIMEOUT = 30
+RSA_KEY_SIZE = 2048
+
+
+# ---------- 子进程内执行的函数（须为模块级，才能被 pickle） ----------
+
+def _init_worker(public_keys):
+    # fork 继承来的临时密钥池已由 SM2_NoncePool 的 at-fork 钩子清空，子进程一律现场生成 k
+    base_table()
+    for public_key in public_keys:
+        register_public_key(public_key)
+
+
+def _sign(private_key, data):
+    d = int(private_key, 16)
+    e = int.from_bytes(data, "big")
+    rs = None
+    while rs is None:
+        rs = sign_digest(d, e, secrets.randbelow(N - 1) + 1)
+    return rs
+
+
+def _verify(public_key, data, r, s):
+    return verify_signature(public_key, r, s, int.from_bytes(data, "big"))
+
+
+def _encrypt(public_key, data, mode):
+    return sm2_encrypt(public_key, data, mode)
+
+
+def _encrypt_many(public_key, items, mode):
+    return [sm2_encrypt(public_key, data, mode) for data in items]
+
+
+def _hash_passwords(passwords):
+    return hash_passwords(passwords)
+
+
+def _decrypt(private_key, cipher, mode):
+    return sm2_decrypt(private_key, cipher, mode)
+
+
+def _keygen(kind, key_size):
+    """kind="sm2" 返回 (私钥 hex, 公钥 hex)；kind="rsa" 返回 PKCS8 PEM 字节（密钥对象不能跨进程传递）"""
+    if kind == "sm2":
+        private_key = "%064x" % (secrets.randbelow(N - 1) + 1)
+        return private_key, derive_public_key(private_key)
+    if kind == "rsa":
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+        return key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+    raise ValueError(f"不支持的密钥类型: {kind}")
+
+
+def _noop():
+    return os.getpid()
+
+
+# ---------- 父进程侧 ----------
+
+def _mp_context():
+    # fork 直接继承父进程内存中的预建表；不支持 fork 的平台退回 spawn
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+class CryptoExecutor:
+    """
+    :param max_workers: 进程数，默认 CPU 核数
+    :param public_keys: 子进程启动时预登记（预建固定基表）的公钥
+    """
+
+    def __init__(self, max_workers=None, public_keys=()):
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.public_keys = tuple(public_keys)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_pending = 0
+        self.restarts = 0
+        self.busy_seconds = 0.0
+        self.ops = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=_mp_context(),
+            initializer=_init_worker,
+            initargs=(self.public_keys,),
+        )
+
+    def start(self):
+        """建立进程池并等子进程就绪；应在 Web 线程和后台线程启动前调用，fork 时进程内只有主线程"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._new_pool()
+        self._pool.submit(_noop).result(TASK_TIMEOUT)
+        return self
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def _submit(self, op, fn, *args):
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._new_pool()
+            pool = self._pool
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            # 子进程异常退出后整个池不可用，重建一次
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = self._new_pool()
+                    self.restarts += 1
+                pool = self._pool
+            future = pool.submit(fn, *args)
+        started = time.perf_counter()
+        with self._lock:
+            self.submitted += 1
+            self._pending += 1
+            self.max_pending = max(self.max_pending, self._pending)
+            self.ops[op] = self.ops.get(op, 0) + 1
+        future.add_done_callback(lambda f: self._done(f, started))
+        return future
+
+    def _done(self, future, started):
+        with self._lock:
+            self._pending -= 1
+            self.busy_seconds += time.perf_counter() - started
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    # ---------- concurrent.futures 接口 ----------
+
+    def submit_sign(self, private_key, data):
+        """SM2 签名，Future 结果为 (r, s)"""
+        return self._submit("sign", _sign, private_key, data)
+
+    def submit_verify(self, public_key, data, r, s):
+        return self._submit("verify", _verify, public_key, data, r, s)
+
+    def submit_encrypt(self, public_key, data, mode):
+        """SM2 加密，mode 为 SM2_Cipher.C1C2C3 / C1C3C2"""
+        return self._submit("encrypt", _encrypt, public_key, data, mode)
+
+    def submit_encrypt_many(self, public_key, items, mode):
+        """同一公钥批量加密，一个任务处理一批，省去逐条的进程间往返"""
+        return self._submit("encrypt_many", _encrypt_many, public_key, list(items), mode)
+
+    def submit_hash_passwords(self, passwords):
+        """批量 SM3 密码哈希，Future 结果为与输入顺序一致的十六进制摘要列表"""
+        return self._submit("hash_passwords", _hash_passwords, list(passwords))
+
+    def submit_decrypt(self, private_key, cipher, mode):
+        """SM2 解密，C3 校验失败时 Future 抛 ValueError"""
+        return self._submit("decrypt", _decrypt, private_key, cipher, mode)
+
+    def submit_keygen(self, kind="sm2", key_size=RSA_KEY_SIZE):
+        return self._submit("keygen_" + kind, _keygen, kind, key_size)
+
+    # ---------- 同步接口 ----------
+
+    def sign(self, private_key, data):
+        return self.submit_sign(private_key, data).result(TASK_TIMEOUT)
+
+    def verify(self, public_key, data, r, s):
+        return self.submit_verify(public_key, data, r, s).result(TASK_TIMEOUT)
+
+    def encrypt(self, public_key, data, mode):
+        return self.submit_encrypt(public_key, data, mode).result(TASK_TIMEOUT)
+
+    def decrypt(self, private_key, cipher, mode):
+        return self.submit_decrypt(private_key, cipher, mode).result(TASK_TIMEOUT)
+
+    def keygen(self, kind="sm2", key_size=RSA_KEY_SIZE):
+        return self.submit_keygen(kind, key_size).result(TASK_TIMEOUT)
+
+    def stats(self):
+        with self._lock:
+            done = self.completed + self.failed
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self._pending,
+                "max_queue_depth": self.max_pending,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "restarts": self.restarts,
+                "avg_latency_ms": self.busy_seconds / done * 1000 if done else 0.0,
+                "ops": dict(self.ops),
+            }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def enable_crypto_executor(max_workers=None, public_keys=()):
+    """启用进程级计算卸载池（已启用则先关闭旧池）"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = CryptoExecutor(max_workers, public_keys).start()
+        return _executor
+
+
+def disable_crypto_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = None
+
+
+def get_crypto_executor():
+    """未启用返回 None，调用方在本线程内计算"""
+    return _executor
+
+
+def crypto_executor_stats():
+    executor = _executor
+    return executor.stats() if executor is not None else None
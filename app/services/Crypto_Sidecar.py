@@ -0,0 +1,380 @@
+"""
+本机国密守护进程：持有 SM2 密钥与预建表，经 Unix 域套接字为多个 worker 进程提供签名、验签、加解密。
+
+pre-fork 部署时每个 worker 不再各自加载密钥、建表，只需一个 SidecarSM2Client（方法与 SM2Service 一致）。
+
+帧格式（大端）：
+    请求  = 长度 u32（不含帧头）| 操作码 u8 | 若干字段
+    响应  = 长度 u32（不含帧头）| 状态 u8（0 成功 / 1 失败）| 若干字段（失败时为一条错误信息）
+    字段  = 长度 u32 | 字节串
+签名统一以 r||s 原始 64 字节传输，Base64URL 编码在客户端完成。
+
+套接字放在仅本用户可访问（0700）的目录下：默认 $XDG_RUNTIME_DIR/sm2_sidecar/，未设置时为 app/run/；
+客户端连接前核对套接字属主，连接后再用 SO_PEERCRED 核对对端进程的 uid，不与其他用户伪造的守护进程通信。
+
+启动：python -m app.services.Crypto_Sidecar [socket_path]
+"""
+import base64
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import threading
+
+from .SM2_Cipher import C1C3C2
+from .SM2_Utils import SM2Service, _sig_hex_to_b64url, _sig_rs_to_b64url, _sig_segment_to_rs
+
+_APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SIDECAR_SOCKET_DIR = (
+    os.path.join(os.environ["XDG_RUNTIME_DIR"], "sm2_sidecar") if os.environ.get("XDG_RUNTIME_DIR")
+    else os.path.join(_APP_DIR, "run")
+)
+SIDECAR_SOCKET_PATH = os.path.join(SIDECAR_SOCKET_DIR, "sm2_sidecar.sock")
+# 为 True 时 create_sm2_service() 优先连接守护进程（套接字不存在则回退为进程内 SM2Service）
+SIDECAR_ENABLED = False
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+CONNECT_TIMEOUT = 5.0
+# 客户端单次调用（发送请求到收齐响应）的超时（秒）；守护进程卡住时抛 SidecarError，不无限等待
+CALL_TIMEOUT = 30.0
+
+OP_PUBLIC_KEY = 1
+OP_SIGN = 2
+OP_VERIFY = 3
+OP_VERIFY_MANY = 4
+OP_ENCRYPT = 5
+OP_DECRYPT = 6
+OP_DECRYPT_RAW = 7
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+_HEADER = struct.Struct(">IB")
+_FIELD_LEN = struct.Struct(">I")
+
+
+class SidecarError(RuntimeError):
+    """守护进程返回失败或通信中断"""
+
+
+def _pack_fields(fields):
+    return b"".join(_FIELD_LEN.pack(len(f)) + f for f in fields)
+
+
+def _unpack_fields(body):
+    fields = []
+    pos = 0
+    end = len(body)
+    while pos < end:
+        if pos + 4 > end:
+            raise ValueError("字段长度越界")
+        (n,) = _FIELD_LEN.unpack_from(body, pos)
+        pos += 4
+        if pos + n > end:
+            raise ValueError("字段长度越界")
+        fields.append(body[pos:pos + n])
+        pos += n
+    return fields
+
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:], n - got)
+        if k == 0:
+            raise ConnectionError("连接已关闭")
+        got += k
+    return bytes(buf)
+
+
+def _send_frame(sock, code, fields):
+    body = _pack_fields(fields)
+    sock.sendall(_HEADER.pack(len(body), code) + body)
+
+
+def _recv_frame(sock):
+    length, code = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"帧过大: {length}")
+    return code, _unpack_fields(_recv_exact(sock, length))
+
+
+def _check_private_dir(path):
+    """目录须为本用户所有且组和其他用户无权限"""
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise SidecarError(f"套接字目录不安全（须为本用户所有、权限 700）: {path}")
+
+
+def _prepare_socket_dir(socket_path):
+    directory = os.path.dirname(os.path.abspath(socket_path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.lstat(directory)
+    if stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and st.st_mode & 0o077:
+        os.chmod(directory, 0o700)
+    _check_private_dir(directory)
+
+
+def _check_socket_owner(socket_path):
+    """连接前核对：所在目录私有，套接字本身为本用户创建"""
+    _check_private_dir(os.path.dirname(os.path.abspath(socket_path)))
+    st = os.lstat(socket_path)
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        raise SidecarError(f"套接字不属于当前用户: {socket_path}")
+
+
+def _check_peer(sock):
+    """连接后核对对端进程的 uid（Linux SO_PEERCRED），其他平台只依赖属主检查"""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", creds)
+    if uid != os.getuid():
+        raise SidecarError(f"守护进程属于其他用户（uid={uid}）")
+
+
+def _rs_bytes(r, s):
+    return r.to_bytes(32, "big") + s.to_bytes(32, "big")
+
+
+def _bytes_rs(raw):
+    if len(raw) != 64:
+        raise ValueError("签名长度错误")
+    return int.from_bytes(raw[:32], "big"), int.from_bytes(raw[32:], "big")
+
+
+# ---------- 守护进程 ----------
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        while True:
+            try:
+                op, fields = _recv_frame(sock)
+            except (ConnectionError, OSError, ValueError):
+                return
+            try:
+                reply = self.server.dispatch(op, fields)
+            except Exception as e:
+                _send_frame(sock, STATUS_ERROR, [str(e).encode("utf-8")])
+                continue
+            _send_frame(sock, STATUS_OK, reply)
+
+
+class CryptoSidecarServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    :param socket_path: Unix 域套接字路径（权限 600，仅本用户进程可连接）
+    :param key_path: SM2 密钥文件，默认 app/sm2_key.txt
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path=SIDECAR_SOCKET_PATH, key_path=None):
+        self.sm2 = SM2Service(key_path)
+        self.requests = 0
+        self._lock = threading.Lock()
+        _prepare_socket_dir(socket_path)
+        if os.path.lexists(socket_path):
+            # 只清理本用户遗留的套接字，不删除别人放在这里的文件
+            _check_socket_owner(socket_path)
+            os.unlink(socket_path)
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o600)
+        self.socket_path = socket_path
+
+    def dispatch(self, op, fields):
+        with self._lock:
+            self.requests += 1
+        sm2 = self.sm2
+        if op == OP_PUBLIC_KEY:
+            return [sm2.public_key.encode("ascii")]
+        if op == OP_SIGN:
+            return [_rs_bytes(*sm2._sign_rs(fields[0]))]
+        if op == OP_VERIFY:
+            return [b"\x01" if sm2.verify_rs(fields[0], *_bytes_rs(fields[1])) else b"\x00"]
+        if op == OP_VERIFY_MANY:
+            # 首字段为 normalized 标志，其后每两个字段为 (数据, r||s)
+            items = [
+                (fields[i], _sig_rs_to_b64url(*_bytes_rs(fields[i + 1])))
+                for i in range(1, len(fields), 2)
+            ]
+            return [bytes(sm2.verify_many(items, bool(fields[0][0])))]
+        if op == OP_ENCRYPT:
+            return [base64.b64decode(sm2.encrypt(fields[0]))]
+        if op == OP_DECRYPT:
+            plain = sm2.decrypt(base64.b64encode(fields[0]).decode("ascii"))
+            if plain is None:
+                raise ValueError("解密失败")
+            return [plain.encode("utf-8")]
+        if op == OP_DECRYPT_RAW:
+            return [sm2.decrypt_raw(fields[0], fields[1][0])]
+        raise ValueError(f"未知操作码: {op}")
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def serve(socket_path=SIDECAR_SOCKET_PATH, key_path=None):
+    server = CryptoSidecarServer(socket_path, key_path)
+    print(f"✅ 国密守护进程已启动: {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+# ---------- 客户端 ----------
+
+class SidecarSM2Client:
+    """
+    与 SM2Service 方法一致的守护进程客户端，每个线程一条长连接，断线自动重连一次。
+    调用超时或响应帧格式错误时关闭连接并抛 SidecarError（此时不重试，请求可能已在守护进程执行）。
+    不持有私钥（private_key 为 None）。
+    """
+
+    def __init__(self, socket_path=SIDECAR_SOCKET_PATH, timeout=CALL_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.private_key = None
+        self._local = threading.local()
+        self.public_key = self._call(OP_PUBLIC_KEY)[0].decode("ascii")
+
+    def _connect(self):
+        _check_socket_owner(self.socket_path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(self.socket_path)
+            _check_peer(sock)
+        except BaseException:
+            sock.close()
+            raise
+        sock.settimeout(self.timeout)
+        self._local.sock = sock
+        return sock
+
+    def _call(self, op, *fields):
+        for attempt in (0, 1):
+            sock = getattr(self._local, "sock", None)
+            try:
+                if sock is None:
+                    sock = self._connect()
+                _send_frame(sock, op, fields)
+                status, reply = _recv_frame(sock)
+                break
+            except (socket.timeout, ValueError) as e:
+                # 连接上可能还有迟到的响应，不能再复用
+                self.close()
+                if isinstance(e, socket.timeout):
+                    raise SidecarError(f"国密守护进程响应超时（{self.timeout} 秒）")
+                raise SidecarError(f"国密守护进程响应格式错误: {e}")
+            except (ConnectionError, OSError) as e:
+                if sock is not None:
+                    sock.close()
+                self._local.sock = None
+                if attempt:
+                    raise SidecarError(f"国密守护进程不可用: {e}")
+        if status != STATUS_OK:
+            raise SidecarError(reply[0].decode("utf-8") if reply else "守护进程返回失败")
+        return reply
+
+    def close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    @staticmethod
+    def _as_bytes(data):
+        return data.encode("utf-8") if isinstance(data, str) else data
+
+    def _sign_rs(self, data):
+        try:
+            return _bytes_rs(self._call(OP_SIGN, self._as_bytes(data))[0])
+        except ValueError as e:
+            raise SidecarError(f"国密守护进程响应格式错误: {e}")
+
+    def sign(self, data):
+        r, s = self._sign_rs(data)
+        return _sig_hex_to_b64url("%064x%064x" % (r, s))
+
+    def sign_compact(self, data):
+        return _sig_rs_to_b64url(*self._sign_rs(data))
+
+    def verify_rs(self, data, r, s):
+        return self._call(OP_VERIFY, self._as_bytes(data), _rs_bytes(r, s))[0] == b"\x01"
+
+    def verify(self, data, sign_segment):
+        try:
+            r, s = _sig_segment_to_rs(sign_segment.strip())
+        except ValueError:
+            return False
+        return self.verify_rs(data, r, s)
+
+    def verify_many(self, items, normalized=False):
+        results = [False] * len(items)
+        fields = [bytes([normalized])]
+        positions = []
+        for i, (data, sign_segment) in enumerate(items):
+            try:
+                r, s = _sig_segment_to_rs(sign_segment.strip())
+            except Exception:
+                continue
+            fields += [self._as_bytes(data), _rs_bytes(r, s)]
+            positions.append(i)
+        if positions:
+            for i, ok in zip(positions, self._call(OP_VERIFY_MANY, *fields)[0]):
+                results[i] = bool(ok)
+        return results
+
+    def encrypt(self, plaintext):
+        cipher = self._call(OP_ENCRYPT, self._as_bytes(plaintext))[0]
+        return base64.b64encode(cipher).decode("utf-8")
+
+    def decrypt(self, ciphertext_b64):
+        try:
+            return self._call(OP_DECRYPT, base64.b64decode(ciphertext_b64))[0].decode("utf-8")
+        except SidecarError as e:
+            print(f"解密错误: {e}")
+            return None
+
+    def decrypt_raw(self, cipher, mode=C1C3C2):
+        """解密为原始字节（数字信封中的对称密钥等），失败抛 SidecarError"""
+        return self._call(OP_DECRYPT_RAW, cipher, bytes([mode]))[0]
+
+    def encrypt_json(self, data_dict):
+        try:
+            return self.encrypt(json.dumps(data_dict, ensure_ascii=False))
+        except Exception as e:
+            print(f"JSON加密错误: {e}")
+            return None
+
+    def decrypt_to_json(self, ciphertext_b64):
+        try:
+            decrypted_str = self.decrypt(ciphertext_b64)
+            if decrypted_str:
+                return json.loads(decrypted_str)
+            return None
+        except Exception as e:
+            print(f"JSON解密错误: {e}")
+            return None
+
+
+def create_sm2_service(socket_path=SIDECAR_SOCKET_PATH):
+    """SIDECAR_ENABLED 且守护进程在线时返回客户端，否则返回进程内 SM2Service"""
+    if SIDECAR_ENABLED and os.path.exists(socket_path):
+        try:
+            return SidecarSM2Client(socket_path)
+        except SidecarError as e:
+            print(f"⚠️ 国密守护进程连接失败，改用进程内密钥: {e}")
+    return SM2Service()
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1] if len(sys.argv) > 1 else SIDECAR_SOCKET_PATH)
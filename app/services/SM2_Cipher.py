@@ -0,0 +1,159 @@
+"""
+SM2 公钥加密（GB/T 32918.4），密文格式与 gmssl CryptSM2 一致：C1 为 x||y 共 64 字节（无 04 前缀），
+C3 = SM3(x2 || M || y2)，C2 = M ⊕ KDF(x2 || y2)，按 mode 排成 C1C2C3（0）或 C1C3C2（1）。
+
+与 gmssl 的差异：
+- k 取自签名临时密钥池或在 [1, n-1] 内均匀选取，C1 = k·G 查固定基表，k·P 查公钥表，一次即成；
+  只有 KDF 输出全零（概率约 2^-256）时才换 k 重来，不再需要调用方包一层重试；
+- 解密时校验 C1 在曲线上并核对 C3，不一致抛 ValueError（gmssl 会算出 C3 但不比较）；
+- 每次加密记录尝试次数与耗时，encryption_stats() 汇总，用于确认尾延迟。
+"""
+import secrets
+import threading
+import time
+from collections import deque
+
+from app.services.SM2_Curve import (
+    N, base_mul, hex_to_point, is_on_curve, public_key_mul, scalar_mul,
+)
+from app.services.SM2_NoncePool import take_nonce
+from app.services.SM3_Service import SM3
+
+C1C2C3 = 0
+C1C3C2 = 1
+
+# 保留最近多少次加密的耗时用于计算分位数
+STATS_WINDOW = 1024
+
+_C1_SIZE = 64
+_C3_SIZE = 32
+
+
+def _kdf(z, klen):
+    """KDF(Z, klen)：SM3(Z || ct) 依次拼接，Z 只吸收一次，计数器部分复制中间状态"""
+    prefix = SM3(z)
+    out = bytearray()
+    ct = 1
+    while len(out) < klen:
+        h = prefix.copy()
+        h.update(ct.to_bytes(4, "big"))
+        out += h.digest()
+        ct += 1
+    return bytes(out[:klen])
+
+
+def _xor(data, mask):
+    return (int.from_bytes(data, "big") ^ int.from_bytes(mask, "big")).to_bytes(len(data), "big")
+
+
+class _EncryptionStats:
+    def __init__(self, window=STATS_WINDOW):
+        self.calls = 0
+        self.attempts = 0
+        self.max_attempts = 0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, attempts, elapsed):
+        with self._lock:
+            self.calls += 1
+            self.attempts += attempts
+            self.max_attempts = max(self.max_attempts, attempts)
+            self._recent.append(elapsed)
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            calls, attempts, max_attempts = self.calls, self.attempts, self.max_attempts
+
+        def pct(q):
+            return recent[min(len(recent) - 1, int(q * len(recent)))] * 1000 if recent else 0.0
+
+        return {
+            "calls": calls,
+            "attempts": attempts,
+            "max_attempts": max_attempts,
+            "avg_attempts": attempts / calls if calls else 0.0,
+            "p50_ms": pct(0.50),
+            "p99_ms": pct(0.99),
+            "max_ms": recent[-1] * 1000 if recent else 0.0,
+        }
+
+
+_stats = _EncryptionStats()
+
+
+def encryption_stats():
+    """加密调用次数、尝试次数与最近 STATS_WINDOW 次的耗时分位数（毫秒）"""
+    return _stats.snapshot()
+
+
+def encrypt_with_report(public_key_hex, data, mode=C1C3C2):
+    """
+    SM2 加密并返回本次的尝试次数与耗时。
+    :return: (ciphertext_bytes, attempts, elapsed_seconds)
+    """
+    if mode not in (C1C2C3, C1C3C2):
+        raise ValueError("mode 只能是 C1C2C3(0) 或 C1C3C2(1)")
+    data = bytes(data)
+    start = time.perf_counter()
+    attempts = 0
+    while True:
+        attempts += 1
+        pair = take_nonce()
+        if pair is None:
+            k = secrets.randbelow(N - 1) + 1
+            c1 = base_mul(k)
+        else:
+            k, c1 = pair
+        x2, y2 = public_key_mul(k, public_key_hex)
+        x2 = x2.to_bytes(32, "big")
+        y2 = y2.to_bytes(32, "big")
+        t = _kdf(x2 + y2, len(data))
+        if not data or any(t):
+            break
+    c1 = c1[0].to_bytes(32, "big") + c1[1].to_bytes(32, "big")
+    c2 = _xor(data, t)
+    c3 = SM3(x2 + data + y2).digest()
+    cipher = c1 + c3 + c2 if mode == C1C3C2 else c1 + c2 + c3
+    elapsed = time.perf_counter() - start
+    _stats.record(attempts, elapsed)
+    return cipher, attempts, elapsed
+
+
+def encrypt(public_key_hex, data, mode=C1C3C2):
+    """SM2 加密，返回密文字节串"""
+    return encrypt_with_report(public_key_hex, data, mode)[0]
+
+
+def decrypt(private_key_hex, cipher, mode=C1C3C2):
+    """
+    SM2 解密。
+    :raises ValueError: 密文过短、C1 不在曲线上、KDF 全零或 C3 校验失败
+    """
+    cipher = bytes(cipher)
+    if mode not in (C1C2C3, C1C3C2):
+        raise ValueError("mode 只能是 C1C2C3(0) 或 C1C3C2(1)")
+    if len(cipher) < _C1_SIZE + _C3_SIZE:
+        raise ValueError("SM2 密文过短")
+    c1 = hex_to_point(cipher[:_C1_SIZE].hex())
+    if not is_on_curve(c1):
+        raise ValueError("SM2 密文 C1 不在曲线上")
+    if mode == C1C3C2:
+        c3 = cipher[_C1_SIZE:_C1_SIZE + _C3_SIZE]
+        c2 = cipher[_C1_SIZE + _C3_SIZE:]
+    else:
+        c2 = cipher[_C1_SIZE:-_C3_SIZE]
+        c3 = cipher[-_C3_SIZE:]
+    point = scalar_mul(int(private_key_hex, 16), c1)
+    if point is None:
+        raise ValueError("SM2 密文 C1 无效")
+    x2 = point[0].to_bytes(32, "big")
+    y2 = point[1].to_bytes(32, "big")
+    t = _kdf(x2 + y2, len(c2))
+    if c2 and not any(t):
+        raise ValueError("SM2 KDF 输出全零")
+    data = _xor(c2, t)
+    if SM3(x2 + data + y2).digest() != c3:
+        raise ValueError("SM2 密文 C3 校验失败")
+    return data
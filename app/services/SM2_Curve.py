@@ -0,0 +1,573 @@
+"""
+SM2 曲线整数点运算、基点固定基预计算表与验签引擎。
+
+gmssl 的 CryptSM2._kg 用十六进制字符串表示点、逐位倍点加点，每次 k·G 都要做约 256 次倍点
+和 128 次点加，并反复解析 p。签名、加密 C1、由私钥派生公钥都落在这条路径上。
+这里改用整数 Jacobian 坐标，并为基点 G 构建一次性的固定基窗口表：
+k·G 只需约 256/w 次混合点加、不需要倍点。
+
+验签 s·G + t·P 用联合多标量乘（Straus）共享倍点；长期公钥（JWT 签名密钥、银行/商户公钥）
+登记后同样建固定基表，两张表逐窗口同时累加，整个验签不做倍点。
+
+批量验签用随机线性组合：sum(a_i·(s_i·G + t_i·P_i - R_i)) == O。签名时把 k 规范为
+k·G 的 y 为偶数，验签方即可由 r - e 唯一恢复 R_i。签名本身不携带 R 的奇偶，
+旧签名、银行等第三方签名约一半 R 的 y 为奇数，混进整批会让每个小组都失败、二分到底，
+比逐个验签还慢；因此只有调用方确知出自规范签名器（sign_digest）的签名才进整批方程，
+其余直接逐个验签。
+"""
+import secrets
+import threading
+from collections import OrderedDict
+
+from gmssl.sm2 import CryptSM2, default_ecc_table
+
+P = int(default_ecc_table["p"], 16)
+N = int(default_ecc_table["n"], 16)
+A = int(default_ecc_table["a"], 16)
+B = int(default_ecc_table["b"], 16)
+G_HEX = default_ecc_table["g"].lower()
+G = (int(G_HEX[:64], 16), int(G_HEX[64:], 16))
+
+# 固定基窗口宽度：每行 2^w-1 个仿射点，共 ceil(256/w) 行
+FIXED_BASE_WINDOW = 6
+# 任意点标量乘使用的 wNAF 窗口宽度
+WNAF_WINDOW = 5
+# Straus 联合乘法中基点 G 的 wNAF 窗口宽度（表只建一次，可以更宽）
+G_WNAF_WINDOW = 7
+# 未登记公钥的奇数倍表 LRU 容量
+KEY_TABLE_CACHE_SIZE = 256
+# 批量验签：随机系数位数、R_i 奇数倍表窗口宽度、低于该规模直接逐个验签
+BATCH_RANDOMIZER_BITS = 128
+BATCH_WINDOW = 4
+BATCH_MIN_SIZE = 4
+
+
+# ====================== 点运算（Jacobian 坐标，None 表示无穷远点） ======================
+def _double(pt):
+    """Jacobian 倍点（a = -3，dbl-2001-b）。"""
+    if pt is None:
+        return None
+    x1, y1, z1 = pt
+    if y1 == 0:
+        return None
+    delta = z1 * z1 % P
+    gamma = y1 * y1 % P
+    beta = x1 * gamma % P
+    alpha = 3 * (x1 - delta) * (x1 + delta) % P
+    x3 = (alpha * alpha - 8 * beta) % P
+    z3 = ((y1 + z1) * (y1 + z1) - gamma - delta) % P
+    y3 = (alpha * (4 * beta - x3) - 8 * gamma * gamma) % P
+    return (x3, y3, z3)
+
+
+def _add_affine(pt, q):
+    """Jacobian 点加仿射点（madd-2007-bl），q 为 (x, y) 或 None。"""
+    if q is None:
+        return pt
+    if pt is None:
+        return (q[0], q[1], 1)
+    x1, y1, z1 = pt
+    x2, y2 = q
+    z1z1 = z1 * z1 % P
+    u2 = x2 * z1z1 % P
+    s2 = y2 * z1 * z1z1 % P
+    h = (u2 - x1) % P
+    r = 2 * (s2 - y1) % P
+    if h == 0:
+        if r == 0:
+            return _double(pt)
+        return None
+    hh = h * h % P
+    i = 4 * hh % P
+    j = h * i % P
+    v = x1 * i % P
+    x3 = (r * r - j - 2 * v) % P
+    y3 = (r * (v - x3) - 2 * y1 * j) % P
+    z3 = ((z1 + h) * (z1 + h) - z1z1 - hh) % P
+    return (x3, y3, z3)
+
+
+def _add_jacobian(p1, p2):
+    """Jacobian 点加（add-2007-bl）。"""
+    if p1 is None:
+        return p2
+    if p2 is None:
+        return p1
+    x1, y1, z1 = p1
+    x2, y2, z2 = p2
+    z1z1 = z1 * z1 % P
+    z2z2 = z2 * z2 % P
+    u1 = x1 * z2z2 % P
+    u2 = x2 * z1z1 % P
+    s1 = y1 * z2 * z2z2 % P
+    s2 = y2 * z1 * z1z1 % P
+    h = (u2 - u1) % P
+    r = 2 * (s2 - s1) % P
+    if h == 0:
+        if r == 0:
+            return _double(p1)
+        return None
+    i = 4 * h * h % P
+    j = h * i % P
+    v = u1 * i % P
+    x3 = (r * r - j - 2 * v) % P
+    y3 = (r * (v - x3) - 2 * s1 * j) % P
+    z3 = ((z1 + z2) * (z1 + z2) - z1z1 - z2z2) * h % P
+    return (x3, y3, z3)
+
+
+def _to_affine(pt):
+    """Jacobian -> 仿射 (x, y)。"""
+    if pt is None:
+        return None
+    x, y, z = pt
+    z_inv = pow(z, -1, P)
+    z_inv2 = z_inv * z_inv % P
+    return (x * z_inv2 % P, y * z_inv2 * z_inv % P)
+
+
+def _batch_to_affine(points):
+    """批量转仿射：Montgomery 技巧，整批只做一次模逆。"""
+    prefix = []
+    acc = 1
+    for pt in points:
+        prefix.append(acc)
+        if pt is not None:
+            acc = acc * pt[2] % P
+    inv = pow(acc, -1, P)
+    out = [None] * len(points)
+    for idx in range(len(points) - 1, -1, -1):
+        pt = points[idx]
+        if pt is None:
+            continue
+        z_inv = inv * prefix[idx] % P
+        inv = inv * pt[2] % P
+        z_inv2 = z_inv * z_inv % P
+        out[idx] = (pt[0] * z_inv2 % P, pt[1] * z_inv2 * z_inv % P)
+    return out
+
+
+def _neg(q):
+    return (q[0], (P - q[1]) % P)
+
+
+def is_on_curve(q):
+    """仿射点是否在 SM2 曲线上。"""
+    if q is None:
+        return False
+    x, y = q
+    if not (0 <= x < P and 0 <= y < P):
+        return False
+    return (y * y - (x * x * x + A * x + B)) % P == 0
+
+
+# ====================== 任意点标量乘（wNAF） ======================
+def _wnaf(k, w):
+    """k 的宽度 w NAF 表示（低位在前），非零位均为奇数且 |d| < 2^(w-1)。"""
+    digits = []
+    full = 1 << w
+    half = 1 << (w - 1)
+    while k:
+        if k & 1:
+            d = k & (full - 1)
+            if d >= half:
+                d -= full
+            k -= d
+        else:
+            d = 0
+        digits.append(d)
+        k >>= 1
+    return digits
+
+
+def _odd_multiples(q, w):
+    """仿射奇数倍表 [Q, 3Q, 5Q, ..., (2^(w-1)-1)Q]。"""
+    count = 1 << (w - 2)
+    jac = [(q[0], q[1], 1)]
+    twice = _to_affine(_double(jac[0]))
+    for _ in range(count - 1):
+        jac.append(_add_affine(jac[-1], twice))
+    return _batch_to_affine(jac)
+
+
+def multi_mul(terms):
+    """
+    Straus 联合多标量乘：sum(k_i·Q_i)，terms 为 [(k, 奇数倍表, w), ...]。
+    所有项共享同一串倍点，返回 Jacobian 点或 None。
+    """
+    # 先按位归集非零位对应的表项，主循环只处理真正要加的点
+    buckets = {}
+    length = 0
+    for k, table, w in terms:
+        digits = _wnaf(k % N, w)
+        length = max(length, len(digits))
+        for i, d in enumerate(digits):
+            if d > 0:
+                buckets.setdefault(i, []).append(table[(d - 1) >> 1])
+            elif d < 0:
+                buckets.setdefault(i, []).append(_neg(table[(-d - 1) >> 1]))
+    acc = None
+    for i in range(length - 1, -1, -1):
+        acc = _double(acc)
+        for q in buckets.get(i, ()):
+            acc = _add_affine(acc, q)
+    return acc
+
+
+def scalar_mul(k, q, w=WNAF_WINDOW):
+    """k·Q（Q 为仿射点），返回仿射点或 None。"""
+    if q is None or not k % N:
+        return None
+    return _to_affine(multi_mul([(k, _odd_multiples(q, w), w)]))
+
+
+# ====================== 固定基窗口表 ======================
+class FixedBaseTable:
+    """
+    固定基窗口表：rows[i][j-1] = j·2^(w·i)·Q（仿射）。
+    k·Q 按 w 位一组查表累加，全程只有混合点加。
+    """
+
+    def __init__(self, q, window=FIXED_BASE_WINDOW):
+        self.window = window
+        self.mask = (1 << window) - 1
+        self.rows = []
+        base = q
+        for _ in range(-(-N.bit_length() // window)):
+            jac = []
+            acc = None
+            for _ in range(self.mask):
+                acc = _add_affine(acc, base)
+                jac.append(acc)
+            row = _batch_to_affine(jac)
+            self.rows.append(row)
+            half = row[self.mask >> 1]  # 2^(w-1)·base
+            base = _to_affine(_double((half[0], half[1], 1)))
+
+    @classmethod
+    def from_rows(cls, rows, window=FIXED_BASE_WINDOW):
+        """由已算好的行构造（见 SM2_TableCache），不做任何点运算"""
+        table = cls.__new__(cls)
+        table.window = window
+        table.mask = (1 << window) - 1
+        table.rows = rows
+        return table
+
+    def mul(self, k):
+        k %= N
+        acc = None
+        w, mask = self.window, self.mask
+        for row in self.rows:
+            if not k:
+                break
+            d = k & mask
+            if d:
+                acc = _add_affine(acc, row[d - 1])
+            k >>= w
+        return _to_affine(acc)
+
+
+_BASE_TABLE = None
+_BASE_TABLE_LOCK = threading.Lock()
+
+
+def base_table():
+    """基点 G 的固定基表，每个进程首次使用时构建一次。"""
+    global _BASE_TABLE
+    if _BASE_TABLE is None:
+        with _BASE_TABLE_LOCK:
+            if _BASE_TABLE is None:
+                _BASE_TABLE = FixedBaseTable(G)
+    return _BASE_TABLE
+
+
+def base_mul(k):
+    """k·G，返回仿射点或 None。"""
+    return base_table().mul(k)
+
+
+# ====================== 十六进制互转（与 gmssl 的 x||y 格式一致） ======================
+def point_to_hex(q):
+    if q is None:
+        return None
+    return "%064x%064x" % q
+
+
+def hex_to_point(point_hex):
+    """x||y 十六进制（可带 04 前缀）-> (x, y)。"""
+    if len(point_hex) == 130 and point_hex.startswith("04"):
+        point_hex = point_hex[2:]
+    return (int(point_hex[:64], 16), int(point_hex[64:128], 16))
+
+
+def _normalize_key(public_key_hex):
+    key = public_key_hex.strip().lower()
+    if len(key) == 130 and key.startswith("04"):
+        key = key[2:]
+    return key
+
+
+def derive_public_key(private_key_hex):
+    """由私钥 d 计算公钥 P=d*G（x||y，各 64 位十六进制，无 04 前缀）。"""
+    return point_to_hex(base_mul(int(private_key_hex, 16)))
+
+
+# ====================== 公钥预计算表 ======================
+_G_WNAF_TABLE = None
+_PINNED_TABLES = {}
+_KEY_TABLES = OrderedDict()
+_KEY_TABLES_LOCK = threading.Lock()
+# 已算好的固定基表来源（SM2_TableCache 装入缓存文件后设置）：公钥 hex -> FixedBaseTable 或 None
+_TABLE_SOURCE = None
+
+
+def _g_wnaf_table():
+    global _G_WNAF_TABLE
+    if _G_WNAF_TABLE is None:
+        _G_WNAF_TABLE = _odd_multiples(G, G_WNAF_WINDOW)
+    return _G_WNAF_TABLE
+
+
+def _parse_public_key(key):
+    if len(key) != 128:
+        raise ValueError(f"SM2 公钥长度错误: {len(key)}")
+    q = hex_to_point(key)
+    if not is_on_curve(q):
+        raise ValueError("SM2 公钥不在曲线上")
+    return q
+
+
+def register_public_key(public_key_hex):
+    """
+    登记长期使用的公钥：为其构建固定基表（磁盘缓存中有则直接取用）并常驻内存，
+    此后该公钥的验签与 k·P 都走查表路径。重复登记直接返回。
+    """
+    key = _normalize_key(public_key_hex)
+    table = _PINNED_TABLES.get(key)
+    if table is None:
+        source = _TABLE_SOURCE
+        table = source(key) if source is not None else None
+        if table is None:
+            table = FixedBaseTable(_parse_public_key(key))
+        with _KEY_TABLES_LOCK:
+            table = _PINNED_TABLES.setdefault(key, table)
+    return table
+
+
+def unregister_public_key(public_key_hex):
+    """撤销登记（密钥从密钥环删除后），释放其固定基表；此后该公钥回到 wNAF 路径"""
+    with _KEY_TABLES_LOCK:
+        return _PINNED_TABLES.pop(_normalize_key(public_key_hex), None) is not None
+
+
+def _key_wnaf_table(key):
+    """未登记公钥的奇数倍表，按 LRU 缓存。"""
+    with _KEY_TABLES_LOCK:
+        table = _KEY_TABLES.get(key)
+        if table is not None:
+            _KEY_TABLES.move_to_end(key)
+            return table
+    table = _odd_multiples(_parse_public_key(key), WNAF_WINDOW)
+    with _KEY_TABLES_LOCK:
+        _KEY_TABLES[key] = table
+        while len(_KEY_TABLES) > KEY_TABLE_CACHE_SIZE:
+            _KEY_TABLES.popitem(last=False)
+    return table
+
+
+def public_key_mul(k, public_key_hex):
+    """k·P：已登记公钥查固定基表，否则用缓存的奇数倍表做 wNAF。"""
+    key = _normalize_key(public_key_hex)
+    pinned = _PINNED_TABLES.get(key)
+    if pinned is not None:
+        return pinned.mul(k)
+    if not k % N:
+        return None
+    return _to_affine(multi_mul([(k, _key_wnaf_table(key), WNAF_WINDOW)]))
+
+
+def joint_mul(s, t, public_key_hex):
+    """s·G + t·P，返回仿射点或 None。"""
+    key = _normalize_key(public_key_hex)
+    pinned = _PINNED_TABLES.get(key)
+    if pinned is None:
+        return _to_affine(multi_mul([
+            (s, _g_wnaf_table(), G_WNAF_WINDOW),
+            (t, _key_wnaf_table(key), WNAF_WINDOW),
+        ]))
+    # 两张固定基表窗口宽度相同，逐窗口同时累加
+    base = base_table()
+    s %= N
+    t %= N
+    w, mask = base.window, base.mask
+    acc = None
+    for g_row, p_row in zip(base.rows, pinned.rows):
+        if not (s or t):
+            break
+        ds, dt = s & mask, t & mask
+        if ds:
+            acc = _add_affine(acc, g_row[ds - 1])
+        if dt:
+            acc = _add_affine(acc, p_row[dt - 1])
+        s >>= w
+        t >>= w
+    return _to_affine(acc)
+
+
+def verify_signature(public_key_hex, r, s, e):
+    """SM2 验签：R = s·G + t·P（t = r + s mod n），判断 r == (e + R.x) mod n。"""
+    if not (0 < r < N and 0 < s < N):
+        return False
+    t = (r + s) % N
+    if t == 0:
+        return False
+    try:
+        q = joint_mul(s, t, public_key_hex)
+    except ValueError:
+        return False
+    if q is None:
+        return False
+    return r == (e + q[0]) % N
+
+
+def sign_digest(d, e, k, q=None):
+    """
+    SM2 签名核心：返回 (r, s) 或 None；q 为预先算好的 k·G（见 SM2_NoncePool）。
+    k·G 的 y 为奇数时改用 n-k（x 不变、签名同样有效），保证 R 可由 r 唯一恢复以支持批量验签。
+    """
+    k %= N
+    if q is None:
+        q = base_mul(k)
+    if q is None:
+        return None
+    if q[1] & 1:
+        k = N - k
+    r = (e + q[0]) % N
+    if r == 0 or r + k == N:
+        return None
+    s = (pow(d + 1, -1, N) * (k + r) - r) % N
+    if s == 0:
+        return None
+    return r, s
+
+
+def _lift_x(x):
+    """由 x 坐标恢复 y 为偶数的曲线点（p ≡ 3 mod 4），不在曲线上返回 None。"""
+    if x >= P:
+        return None
+    rhs = (x * x * x + A * x + B) % P
+    y = pow(rhs, (P + 1) >> 2, P)
+    if y * y % P != rhs:
+        return None
+    if y & 1:
+        y = P - y
+    return (x, y)
+
+
+def _batch_holds(group):
+    """随机线性组合检验：sum(a_i·s_i)·G + sum_P(sum(a_i·t_i))·P - sum(a_i·R_i) 是否为无穷远点。"""
+    g_scalar = 0
+    key_scalars = {}
+    r_points = []
+    r_scalars = []
+    for i, (_, key, r, s, _e, point) in enumerate(group):
+        a = 1 if i == 0 else secrets.randbits(BATCH_RANDOMIZER_BITS) | 1
+        g_scalar = (g_scalar + a * s) % N
+        key_scalars[key] = (key_scalars.get(key, 0) + a * (r + s)) % N
+        r_points.append(point)
+        r_scalars.append(N - a)
+    # 所有 R_i 的奇数倍表一起做一次批量求逆
+    width = 1 << (BATCH_WINDOW - 2)
+    jac = []
+    for point in r_points:
+        twice = _double((point[0], point[1], 1))
+        row = [(point[0], point[1], 1)]
+        for _ in range(width - 1):
+            row.append(_add_jacobian(row[-1], twice))
+        jac.extend(row)
+    flat = _batch_to_affine(jac)
+    terms = [
+        (k, flat[j * width:(j + 1) * width], BATCH_WINDOW)
+        for j, k in enumerate(r_scalars)
+    ]
+    acc = multi_mul(terms)
+    acc = _add_affine(acc, base_mul(g_scalar))
+    for key, scalar in key_scalars.items():
+        acc = _add_affine(acc, public_key_mul(scalar, key))
+    return acc is None
+
+
+def _verify_group(group, results):
+    if len(group) < BATCH_MIN_SIZE:
+        for idx, key, r, s, e, _ in group:
+            results[idx] = verify_signature(key, r, s, e)
+        return
+    if _batch_holds(group):
+        for item in group:
+            results[item[0]] = True
+        return
+    mid = len(group) // 2
+    _verify_group(group[:mid], results)
+    _verify_group(group[mid:], results)
+
+
+def verify_batch(items, normalized=False):
+    """
+    批量验签：items 为 [(公钥十六进制, r, s, e), ...]，返回与之等长的 bool 列表。
+    normalized 标明签名是否出自规范 k 取向的签名器（本系统的 sign_digest），
+    可为 bool 或与 items 等长的 bool 序列；只有这些签名进整批方程（一次多标量乘，失败则二分定位），
+    其余（旧签名、第三方签名）逐个验签。
+    """
+    if isinstance(normalized, bool):
+        normalized = [normalized] * len(items)
+    results = [False] * len(items)
+    group = []
+    for idx, ((public_key_hex, r, s, e), batchable) in enumerate(zip(items, normalized)):
+        if not (0 < r < N and 0 < s < N) or (r + s) % N == 0:
+            continue
+        key = _normalize_key(public_key_hex)
+        try:
+            _parse_public_key(key)
+        except ValueError:
+            continue
+        point = _lift_x((r - e) % N) if batchable else None
+        if point is None:
+            # 非规范签名，或 R.x 落在 [n, p) 的极小概率情形，单独验签
+            results[idx] = verify_signature(key, r, s, e)
+            continue
+        group.append((idx, key, r, s, e, point))
+    _verify_group(group, results)
+    return results
+
+
+class FastCryptSM2(CryptSM2):
+    """
+    CryptSM2 子类：_kg 改走整数点运算，对基点 G 与已登记公钥查固定基表；
+    sign 规范 k 的取向，verify 改为一次联合多标量乘。输入输出格式与 gmssl 完全一致。
+    """
+
+    def sign(self, data, K):
+        if self.asn1:
+            return super().sign(data, K)
+        sig = sign_digest(int(self.private_key, 16), int.from_bytes(data, "big"), int(K, 16))
+        if sig is None:
+            return None
+        return "%064x%064x" % sig
+
+    def _kg(self, k, Point):
+        if Point.lower() == G_HEX:
+            q = base_mul(k)
+        elif Point == self.public_key:
+            q = public_key_mul(k, Point)
+        else:
+            # 解密时的 C1 等一次性点：不进公钥缓存
+            q = scalar_mul(k, hex_to_point(Point))
+        return point_to_hex(q)
+
+    def verify(self, Sign, data):
+        if self.asn1:
+            return super().verify(Sign, data)
+        r = int(Sign[0:self.para_len], 16)
+        s = int(Sign[self.para_len:2 * self.para_len], 16)
+        e = int.from_bytes(data, "big")
+        return verify_signature(self.public_key, r, s, e)
@@ -0,0 +1,206 @@
+"""
+SM2 签名密钥环：令牌头部携带 kid，验签时按 kid 选公钥。
+
+- 每把可用密钥加载时即登记公钥（register_public_key），验签直接走预建的固定基表；
+- rotate() 生成新密钥并设为签发密钥，旧密钥只退役不删除：在宽限期（默认等于令牌最长有效期）内
+  继续验签，已签出的令牌自然过期，不会出现全员重新登录；
+- 密钥环文件原子替换写入，其他 worker 进程按文件修改时间重新加载；遇到未知 kid 时也会立即检查一次；
+- 没有 kid 的旧令牌按 legacy 密钥（最初导入的 app/sm2_key.txt 那把）验签。
+"""
+import json
+import os
+import secrets
+import threading
+import time
+
+from .SM2_Curve import N, derive_public_key, register_public_key, sign_digest, unregister_public_key, verify_signature
+from .SM2_NoncePool import take_nonce
+from .Crypto_Executor import get_crypto_executor
+from .SM3_HMAC import hmac_sm3
+from .SM3_Service import SM3
+from .SM2_TableCache import load_table_cache, save_table_cache, table_cache_path_for
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+KEYRING_PATH = os.path.join(_ROOT, "sm2_keyring.json")
+# 退役密钥继续验签的时长（秒），与刷新令牌 / 会话凭证的最长有效期一致
+RETIRED_GRACE = 604800
+# 检查密钥环文件是否被其他进程更新的间隔（秒）；遇到未知 kid 时不受此限，但只有修改时间变化才重新读取
+RELOAD_INTERVAL = 5.0
+
+
+def key_id(public_key_hex):
+    """kid：公钥 SM3 摘要的前 16 位十六进制"""
+    return SM3(bytes.fromhex(public_key_hex)).hexdigest()[:16]
+
+
+class SM2Keyring:
+    """
+    :param path: 密钥环文件（JSON，含私钥，权限 600）
+    :param seed_private_key: 密钥环文件不存在时导入的初始私钥，作为 legacy 密钥
+    :param table_cache_path: SM2 预计算表缓存文件，默认放在密钥环文件旁
+    """
+
+    def __init__(self, path=KEYRING_PATH, seed_private_key=None, table_cache_path=None):
+        self.path = path
+        self.table_cache_path = table_cache_path or table_cache_path_for(path)
+        self.active_kid = None
+        self.legacy_kid = None
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._last_check = 0.0
+        load_table_cache(self.table_cache_path)
+        if os.path.exists(path):
+            self._load()
+        else:
+            private_key = seed_private_key or secrets.token_hex(32)
+            entry = self._new_entry(private_key)
+            self._keys[entry["kid"]] = entry
+            self.active_kid = self.legacy_kid = entry["kid"]
+            self._save()
+            print(f"✅ SM2 密钥环已创建: {path}（kid={self.active_kid}）")
+
+    @staticmethod
+    def _new_entry(private_key):
+        public_key = derive_public_key(private_key)
+        return {
+            "kid": key_id(public_key),
+            "private_key": private_key,
+            "public_key": public_key,
+            "created_at": int(time.time()),
+            "retire_at": None,
+        }
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        keys = {entry["kid"]: entry for entry in data["keys"]}
+        removed = [e for kid, e in self._keys.items() if kid not in keys]
+        self._keys = keys
+        self.active_kid = data["active"]
+        self.legacy_kid = data.get("legacy")
+        self._mtime = os.path.getmtime(self.path)
+        self._sync_tables(removed)
+
+    def _save(self, removed=()):
+        data = {"active": self.active_kid, "legacy": self.legacy_kid, "keys": list(self._keys.values())}
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, self.path)
+        self._mtime = os.path.getmtime(self.path)
+        self._sync_tables(removed)
+
+    def _sync_tables(self, removed=()):
+        """登记密钥环中的公钥、释放已删除密钥的固定基表，并同步预计算表缓存文件"""
+        for entry in removed:
+            unregister_public_key(entry["public_key"])
+        public_keys = [entry["public_key"] for entry in self._keys.values()]
+        for public_key in public_keys:
+            register_public_key(public_key)
+        save_table_cache(self.table_cache_path, public_keys, [entry["public_key"] for entry in removed])
+
+    def _maybe_reload(self, force=False):
+        # 未知 kid 每次都检查：伪造 kid 只多一次 stat()，解析文件仍取决于修改时间，
+        # 也不会占掉真实新 kid 的检查机会
+        now = time.monotonic()
+        if not force:
+            if now - self._last_check < RELOAD_INTERVAL:
+                return
+            self._last_check = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            with self._lock:
+                self._load()
+
+    def public_key(self, kid):
+        """kid 对应的可验签公钥；未知或退役已超过宽限期返回 None"""
+        self._maybe_reload()
+        entry = self._keys.get(kid)
+        if entry is None:
+            self._maybe_reload(force=True)
+            entry = self._keys.get(kid)
+            if entry is None:
+                return None
+        retire_at = entry["retire_at"]
+        if retire_at is not None and retire_at < time.time():
+            return None
+        return entry["public_key"]
+
+    def public_keys(self):
+        """当前仍可验签的全部公钥"""
+        now = time.time()
+        return [e["public_key"] for e in self._keys.values() if e["retire_at"] is None or e["retire_at"] >= now]
+
+    def signing_kid(self):
+        """当前签发密钥的 kid"""
+        self._maybe_reload()
+        return self.active_kid
+
+    def sign(self, kid, data):
+        """用 kid 对应的私钥签名（kid 取自 signing_kid，写进令牌头部后再签），返回 (r, s)"""
+        private_key = self._keys[kid]["private_key"]
+        d = int(private_key, 16)
+        e = int.from_bytes(data, "big")
+        rs = None
+        pair = take_nonce()
+        if pair is not None:
+            rs = sign_digest(d, e, *pair)
+        if rs is None:
+            executor = get_crypto_executor()
+            if executor is not None:
+                return executor.sign(private_key, data)
+        while rs is None:
+            rs = sign_digest(d, e, secrets.randbelow(N - 1) + 1)
+        return rs
+
+    def derive_secret(self, kid, label):
+        """由 kid 对应私钥派生的对称密钥 HMAC-SM3(私钥, label)：随签名密钥轮换，过宽限期后不可用（返回 None）"""
+        if self.public_key(kid) is None:
+            return None
+        return hmac_sm3(bytes.fromhex(self._keys[kid]["private_key"]), label)
+
+    def verify(self, kid, data, r, s):
+        public_key = self.public_key(kid)
+        if public_key is None:
+            return False
+        executor = get_crypto_executor()
+        if executor is not None:
+            return executor.verify(public_key, data, r, s)
+        return verify_signature(public_key, r, s, int.from_bytes(data, "big"))
+
+    def rotate(self, grace=RETIRED_GRACE):
+        """
+        生成新签发密钥；原签发密钥在 grace 秒后停止验签，已过宽限期的退役密钥从文件中删除
+        :return: 新 kid
+        """
+        with self._lock:
+            now = int(time.time())
+            entry = self._new_entry(secrets.token_hex(32))
+            old = self._keys.get(self.active_kid)
+            if old is not None:
+                old["retire_at"] = now + grace
+            removed = [e for e in self._keys.values() if e["retire_at"] is not None and e["retire_at"] < now]
+            self._keys = {
+                kid: e for kid, e in self._keys.items()
+                if e["retire_at"] is None or e["retire_at"] >= now
+            }
+            self._keys[entry["kid"]] = entry
+            self.active_kid = entry["kid"]
+            self._save(removed)
+        print(f"✅ SM2 签名密钥已轮换: kid={entry['kid']}，旧密钥 {grace} 秒内仍可验签")
+        return entry["kid"]
+
+    def stats(self):
+        return {
+            "active": self.active_kid,
+            "legacy": self.legacy_kid,
+            "keys": [
+                {"kid": e["kid"], "created_at": e["created_at"], "retire_at": e["retire_at"]}
+                for e in self._keys.values()
+            ],
+        }
@@ -0,0 +1,169 @@
+"""
+SM2 签名临时密钥池：后台线程预先计算 (k, k·G)，签名时取出即用，请求路径只剩模运算。
+
+(k, k·G) 与签名私钥无关，整个进程共用一个池；每一对只会被取出一次。
+池未启用或已取空时 take_nonce() 返回 None，调用方回退到现场计算（计入 miss）。
+
+fork 出的子进程会复制父进程池中的 k，两个进程用同一个 k 签名即可解出私钥，
+因此子进程中所有池在 fork 后立即清空并停用（补充线程本就不会带到子进程），需要时由子进程重新启用。
+"""
+import os
+import secrets
+import threading
+import weakref
+from collections import deque
+
+from .SM2_Curve import N, P, base_mul
+
+DEFAULT_POOL_SIZE = 256
+DEFAULT_LOW_WATERMARK = 64
+
+
+def _generate_pair():
+    """生成一对 (k, k·G)，k·G 的 y 规范为偶数（与 sign_digest 的取向一致）。"""
+    k = secrets.randbelow(N - 1) + 1
+    q = base_mul(k)
+    if q[1] & 1:
+        k = N - k
+        q = (q[0], P - q[1])
+    return k, q
+
+
+class NoncePool:
+    """
+    有界临时密钥池。
+    :param size: 池容量上限
+    :param low_watermark: 余量低于该值时唤醒后台线程补充
+    :param high_watermark: 每次补充到该值为止（默认等于 size）
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, low_watermark=DEFAULT_LOW_WATERMARK, high_watermark=None):
+        high_watermark = size if high_watermark is None else high_watermark
+        if not 0 <= low_watermark < high_watermark <= size:
+            raise ValueError("需满足 0 <= low_watermark < high_watermark <= size")
+        self.size = size
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        _instances.add(self)
+
+    def _reset_after_fork(self):
+        """子进程内：丢弃继承来的临时密钥，锁和事件重建（fork 时可能正被补充线程持有）"""
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._stopped.set()
+        self._thread = None
+
+    def start(self):
+        """启动后台补充线程（重复调用无副作用）"""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stopped.clear()
+        self._wakeup.set()
+        self._thread = threading.Thread(target=self._run, name="sm2-nonce-pool", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """停止后台线程并丢弃池中剩余的临时密钥"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            self._items.clear()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while not self._stopped.is_set() and len(self._items) < self.high_watermark:
+                pair = _generate_pair()
+                with self._lock:
+                    self._items.append(pair)
+                    self.generated += 1
+
+    def take(self):
+        """取出一对 (k, k·G)；池空返回 None"""
+        with self._lock:
+            if self._items:
+                pair = self._items.popleft()
+                self.hits += 1
+            else:
+                pair = None
+                self.misses += 1
+            remaining = len(self._items)
+        if remaining < self.low_watermark:
+            self._wakeup.set()
+        return pair
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": self.size,
+            "low_watermark": self.low_watermark,
+            "high_watermark": self.high_watermark,
+            "available": len(self._items),
+            "generated": self.generated,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_instances = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+    for pool in list(_instances):
+        pool._reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def enable_nonce_pool(size=DEFAULT_POOL_SIZE, low_watermark=DEFAULT_LOW_WATERMARK, high_watermark=None):
+    """启用进程级临时密钥池（已启用则先停掉旧池）"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.stop()
+        _pool = NoncePool(size, low_watermark, high_watermark).start()
+        return _pool
+
+
+def disable_nonce_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.stop()
+        _pool = None
+
+
+def take_nonce():
+    """从进程级池取 (k, k·G)；未启用或池空返回 None"""
+    pool = _pool
+    if pool is None:
+        return None
+    return pool.take()
+
+
+def nonce_pool_stats():
+    pool = _pool
+    return pool.stats() if pool is not None else None
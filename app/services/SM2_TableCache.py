@@ -0,0 +1,302 @@
+"""
+SM2 预计算表的磁盘缓存：基点 G 与已登记公钥的固定基表、由私钥派生的公钥，写入密钥旁的缓存文件，
+worker 冷启动时以 mmap 读入，不再重做点运算。
+
+文件格式（大端）：
+    头部  = 魔数 8B | 版本 u16 | 窗口宽度 u8 | MAC 32B | 索引长度 u32
+    索引  = JSON：{"tables": {公钥 hex 或 "G": [数据区偏移, 表的 SHA-256, 最近登记时间]},
+                   "public_keys": {HMAC-SM3(缓存密钥, 私钥) hex: 公钥 hex}}
+    数据区 = 各表逐行拼接的仿射点，每点 x||y 共 64 字节
+
+- MAC 为 HMAC-SM3(缓存密钥, 头部前三项 || 索引)，缓存密钥是缓存文件旁的 <缓存文件>.key（随机 32 字节，权限 600）；
+  每张表的 SHA-256 记在索引里，表在首次登记对应公钥时才解码并校验，进程只常驻自己登记的公钥的表；
+- 魔数、版本、窗口宽度或 MAC 不符时整个文件作废，单张表摘要或基点不符时只丢弃该表，按原路径现场计算；
+- 保存时由调用方给出自己的公钥（keys）与已删除的公钥（evict）：自己的公钥排在最前，
+  其他进程写入的表按最近登记时间保留，超过 CACHE_ENTRY_TTL 未被登记或超出 MAX_CACHED_TABLES 的淘汰；
+  文件内容没有变化时不写。
+文件只存公开数据（点坐标、公钥）和私钥的 HMAC，不含私钥本身。
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from . import SM2_Curve
+from .SM2_Curve import FIXED_BASE_WINDOW, G, FixedBaseTable, N, derive_public_key, point_to_hex
+from .SM3_HMAC import hmac_sm3, hmac_sm3_hex, verify_hmac_sm3
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+TABLE_CACHE_NAME = "sm2_tables.cache"
+TABLE_CACHE_PATH = os.path.join(_ROOT, TABLE_CACHE_NAME)
+CACHE_VERSION = 2
+# 缓存文件最多保存的公钥表数量（每张约 170 KB，不含基点表）
+MAX_CACHED_TABLES = 32
+# 超过该时长（秒）没有进程登记的公钥表在下次保存时淘汰；登记时间至多每 TOUCH_INTERVAL 刷新一次
+CACHE_ENTRY_TTL = 604800
+TOUCH_INTERVAL = 86400
+
+_MAGIC = b"SM2TBL\x00\x00"
+_HEADER = struct.Struct(">8sHB32sI")
+_PREFIX = struct.Struct(">8sHB")
+_POINT_SIZE = 64
+_ROWS = -(-N.bit_length() // FIXED_BASE_WINDOW)
+_ROW_POINTS = (1 << FIXED_BASE_WINDOW) - 1
+_TABLE_SIZE = _ROWS * _ROW_POINTS * _POINT_SIZE
+_G_KEY = "G"
+
+_lock = threading.Lock()
+_files = {}
+
+
+class _CacheFile:
+    """单个缓存文件在本进程中的状态：映射的文件内容、索引，以及尚未写盘的派生公钥"""
+
+    def __init__(self, path):
+        self.path = path
+        self.secret = None
+        self.buf = None
+        self.stat = None
+        self.tables = {}
+        self.public_keys = {}
+        self.dirty = False
+        self.loaded = False
+
+
+def table_cache_path_for(key_path):
+    """密钥文件旁的缓存文件路径"""
+    return os.path.join(os.path.dirname(os.path.abspath(key_path)), TABLE_CACHE_NAME)
+
+
+def _secret(state, create=False):
+    if state.secret is None:
+        key_path = state.path + ".key"
+        try:
+            with open(key_path, "rb") as f:
+                state.secret = f.read()
+        except FileNotFoundError:
+            if not create:
+                return None
+            secret = os.urandom(32)
+            try:
+                fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            except FileExistsError:
+                # 其他进程刚刚创建
+                with open(key_path, "rb") as f:
+                    state.secret = f.read()
+            else:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(secret)
+                state.secret = secret
+    return state.secret
+
+
+def _decode_table(buf, offset):
+    from_bytes = int.from_bytes
+    rows = []
+    for _ in range(_ROWS):
+        row = []
+        for _ in range(_ROW_POINTS):
+            row.append((from_bytes(buf[offset:offset + 32], "big"), from_bytes(buf[offset + 32:offset + 64], "big")))
+            offset += _POINT_SIZE
+        rows.append(row)
+    return FixedBaseTable.from_rows(rows)
+
+
+def _encode_table(table):
+    return b"".join(x.to_bytes(32, "big") + y.to_bytes(32, "big") for row in table.rows for x, y in row)
+
+
+def _file_stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _read(state):
+    """（重新）映射文件并校验头部与索引；文件被其他进程替换后再次调用即可看到新内容"""
+    state.stat = _file_stat(state.path)
+    if state.buf is not None:
+        state.buf.close()
+    state.buf = None
+    state.tables = {}
+    if state.stat is None:
+        return
+    buf = None
+    try:
+        with open(state.path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(buf) < _HEADER.size:
+            raise ValueError("文件过短")
+        magic, version, window, mac, index_len = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC or version != CACHE_VERSION or window != FIXED_BASE_WINDOW:
+            raise ValueError("版本不匹配")
+        secret = _secret(state)
+        start = _HEADER.size + index_len
+        index_bytes = buf[_HEADER.size:start]
+        if secret is None or not verify_hmac_sm3(secret, buf[:_PREFIX.size] + index_bytes, mac):
+            raise ValueError("MAC 不符")
+        index = json.loads(index_bytes)
+        for key, (offset, digest, used_at) in index["tables"].items():
+            if start + offset + _TABLE_SIZE > len(buf):
+                raise ValueError("数据区越界")
+            state.tables[key] = (start + offset, digest, used_at)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"⚠️ SM2 预计算缓存无效，将重新生成: {e}")
+        state.tables = {}
+        if buf is not None:
+            buf.close()
+        return
+    state.buf = buf
+    # 未写盘的派生公钥保留，文件中的补进来
+    for fingerprint, public_key in index["public_keys"].items():
+        state.public_keys.setdefault(fingerprint, public_key)
+
+
+def _table_bytes(state, key):
+    """取出 key 对应的表数据并核对摘要；不在文件中或已损坏返回 None"""
+    entry = state.tables.get(key)
+    if entry is None or state.buf is None:
+        return None
+    offset, digest, _ = entry
+    data = state.buf[offset:offset + _TABLE_SIZE]
+    if hashlib.sha256(data).hexdigest() != digest:
+        print(f"⚠️ SM2 预计算缓存中的表已损坏，将现场计算: {key[:16]}")
+        del state.tables[key]
+        return None
+    return data
+
+
+def _cached_table(key):
+    """SM2_Curve 登记公钥时的表来源：在已装入的缓存文件中查找并解码"""
+    with _lock:
+        for state in _files.values():
+            data = _table_bytes(state, key)
+            if data is None:
+                continue
+            table = _decode_table(data, 0)
+            # 第一行第一个点就是表的基点
+            if point_to_hex(table.rows[0][0]) == key:
+                return table
+            del state.tables[key]
+    return None
+
+
+def _state(path):
+    state = _files.get(path)
+    if state is None:
+        state = _files[path] = _CacheFile(path)
+        _read(state)
+        SM2_Curve._TABLE_SOURCE = _cached_table
+    return state
+
+
+def load_table_cache(path=TABLE_CACHE_PATH):
+    """
+    装入缓存文件（每个进程每个路径只读一次）：校验头部与索引、装入基点表，
+    公钥表留在映射中，等对应公钥登记时再解码。
+    :return: 文件中可用的公钥表数量；文件不存在或无效返回 0
+    """
+    with _lock:
+        state = _state(path)
+        if state.loaded:
+            return 0
+        state.loaded = True
+        if SM2_Curve._BASE_TABLE is None:
+            data = _table_bytes(state, _G_KEY)
+            if data is not None:
+                table = _decode_table(data, 0)
+                if table.rows[0][0] == G:
+                    with SM2_Curve._BASE_TABLE_LOCK:
+                        if SM2_Curve._BASE_TABLE is None:
+                            SM2_Curve._BASE_TABLE = table
+        return len(state.tables) - (_G_KEY in state.tables)
+
+
+def cached_public_key(private_key_hex, path=TABLE_CACHE_PATH):
+    """由私钥取公钥：缓存命中直接返回，否则现场派生并记入缓存（下次 save_table_cache 写盘）"""
+    with _lock:
+        state = _state(path)
+        fingerprint = hmac_sm3_hex(_secret(state, create=True), bytes.fromhex(private_key_hex))
+        public_key = state.public_keys.get(fingerprint)
+    if public_key is None:
+        public_key = derive_public_key(private_key_hex)
+        with _lock:
+            state.public_keys[fingerprint] = public_key
+            state.dirty = True
+    return public_key
+
+
+def save_table_cache(path=TABLE_CACHE_PATH, keys=(), evict=()):
+    """
+    把调用方的公钥表（keys，须已登记）、仍在使用的其他表、基点表和派生公钥写入缓存（原子替换）。
+    :param keys: 调用方当前使用的公钥，排在最前并刷新登记时间
+    :param evict: 调用方已删除的公钥，从文件中移除
+    :return: 是否写了文件
+    """
+    now = int(time.time())
+    keys = [SM2_Curve._normalize_key(key) for key in keys]
+    evict = {SM2_Curve._normalize_key(key) for key in evict} - set(keys)
+    with _lock:
+        state = _state(path)
+        if _file_stat(path) != state.stat:
+            # 其他进程写过文件，在新内容的基础上合并
+            _read(state)
+        own = []
+        for key in dict.fromkeys(keys):
+            entry = state.tables.get(key)
+            if entry is not None and now - entry[2] < TOUCH_INTERVAL:
+                own.append((key, entry[2]))
+            elif key in SM2_Curve._PINNED_TABLES or entry is not None:
+                own.append((key, now))
+        others = sorted(
+            ((key, entry[2]) for key, entry in state.tables.items()
+             if key != _G_KEY and key not in evict and key not in keys and now - entry[2] < CACHE_ENTRY_TTL),
+            key=lambda item: item[1], reverse=True,
+        )
+        selected = (own + others)[:MAX_CACHED_TABLES]
+        unchanged = (
+            not state.dirty
+            and _G_KEY in state.tables
+            and {key: used_at for key, used_at in selected}
+            == {key: entry[2] for key, entry in state.tables.items() if key != _G_KEY}
+        )
+        if unchanged:
+            return False
+        offsets = {}
+        data = []
+        offset = 0
+        for key, used_at in [(_G_KEY, now)] + selected:
+            blob = _table_bytes(state, key)
+            if blob is None:
+                table = SM2_Curve.base_table() if key == _G_KEY else SM2_Curve._PINNED_TABLES.get(key)
+                if table is None or table.window != FIXED_BASE_WINDOW:
+                    continue
+                blob = _encode_table(table)
+            offsets[key] = [offset, hashlib.sha256(blob).hexdigest(), used_at]
+            data.append(bytes(blob))
+            offset += _TABLE_SIZE
+        # 派生公钥只保留表仍在文件中的
+        public_keys = {fp: pub for fp, pub in state.public_keys.items() if pub in offsets}
+        index = json.dumps({"tables": offsets, "public_keys": public_keys}, separators=(",", ":")).encode("utf-8")
+        prefix = _PREFIX.pack(_MAGIC, CACHE_VERSION, FIXED_BASE_WINDOW)
+        mac = hmac_sm3(_secret(state, create=True), prefix + index)
+        header = _HEADER.pack(_MAGIC, CACHE_VERSION, FIXED_BASE_WINDOW, mac, len(index))
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(header)
+                f.write(index)
+                f.writelines(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ SM2 预计算缓存写入失败: {e}")
+            return False
+        state.public_keys = public_keys
+        state.dirty = False
+        _read(state)
+        return True
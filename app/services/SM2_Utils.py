@@ -1,4 +1,9 @@
-from gmssl.sm2 import CryptSM2, default_ecc_table
+from gmssl.sm2 import default_ecc_table
+from .SM2_Curve import FastCryptSM2, derive_public_key, register_public_key, sign_digest, verify_batch, verify_signature
+from .SM2_Cipher import C1C2C3, C1C3C2, decrypt as sm2_decrypt, encrypt as sm2_encrypt
+from .SM2_NoncePool import take_nonce
+from .Crypto_Executor import get_crypto_executor
+from .SM2_TableCache import cached_public_key, load_table_cache, save_table_cache, table_cache_path_for
 import base64
 import os
 import re
@@ -17,49 +22,69 @@ def _sig_hex_to_b64url(hex_str):
     return raw.rstrip("=")
 
 
-def _sig_b64url_to_hex(segment):
-    """JWT 第三段 -> 十六进制签名字符串。"""
-    if not segment:
-        raise ValueError("empty signature segment")
-    pure = re.fullmatch(r"[0-9a-fA-F]{128}", segment)
-    if pure:
-        return segment.lower()
-    s = segment.replace("-", "+").replace("_", "/")
-    pad = (4 - len(s) % 4) % 4
-    s += "=" * pad
-    return base64.b64decode(s).decode("ascii")
+def _sig_rs_to_b64url(r, s):
+    """v2 签名段：r||s 原始 64 字节的 Base64URL（86 字符，v1 约 171 字符）。"""
+    raw = r.to_bytes(32, "big") + s.to_bytes(32, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+_B64URL_SEGMENT = re.compile(r"[A-Za-z0-9_-]+=?")
+
+
+def _sig_segment_to_rs(segment):
+    """
+    JWT 第三段 -> (r, s)，按长度一次判定格式：
+    86 字符为 v2 原始字节，171/172 字符为 v1 Base64URL 包裹的 hex，128 字符为裸 hex。
+    格式不符抛 ValueError；Base64 段只接受 URL 安全字母表（不接受标准字母表的 + 与 /）。
+    """
+    n = len(segment)
+    if n in (86, 171, 172) and not _B64URL_SEGMENT.fullmatch(segment):
+        raise ValueError("签名段不是 Base64URL")
+    if n == 86:
+        raw = base64.b64decode(segment + "==", altchars=b"-_", validate=True)
+    else:
+        if n == 128:
+            hex_str = segment
+        elif n in (171, 172):
+            hex_str = base64.b64decode(segment + "=" * (172 - n), altchars=b"-_", validate=True).decode("ascii")
+        else:
+            raise ValueError(f"签名段长度错误: {n}")
+        if len(hex_str) != 128:
+            raise ValueError("签名段长度错误")
+        raw = bytes.fromhex(hex_str)
+    if len(raw) != 64:
+        raise ValueError("签名段长度错误")
+    return int.from_bytes(raw[:32], "big"), int.from_bytes(raw[32:], "big")
 
 
 def _derive_public_key_from_private(private_key_hex: str) -> str:
     """由私钥 d 计算公钥点 P=d*G（x||y，各 64 位十六进制，无 04 前缀）。"""
-    para = len(default_ecc_table["n"])
-    placeholder = "0" * (2 * para)
-    tmp = CryptSM2(private_key=private_key_hex, public_key=placeholder)
-    return tmp._kg(int(private_key_hex, 16), tmp.ecc_table["g"])
+    return derive_public_key(private_key_hex)
 
 
 class SM2Service:
-    def __init__(self, key_path=None):
+    def __init__(self, key_path=None, table_cache_path=None):
         self.key_path = key_path or _default_sm2_key_path()
+        # 先装入密钥旁的预计算缓存，派生公钥与建表都可直接命中
+        self.table_cache_path = table_cache_path or table_cache_path_for(self.key_path)
+        load_table_cache(self.table_cache_path)
         self.private_key, self.public_key = self._load_or_generate_keys()
         para = len(default_ecc_table["n"])
         pub = (
-            self.public_key.lstrip("04")
-            if self.public_key.startswith("04")
+            self.public_key[2:]
+            if len(self.public_key) == 2 * para + 2 and self.public_key.startswith("04")
             else self.public_key
         )
         if len(pub) != 2 * para or not re.fullmatch(r"[0-9a-fA-F]+", pub):
             pub = _derive_public_key_from_private(self.private_key)
             self.public_key = pub
-        self.sm2 = CryptSM2(
+        # JWT 签名公钥长期使用：预建固定基表，验签走联合查表路径
+        register_public_key(self.public_key)
+        save_table_cache(self.table_cache_path, [self.public_key])
+        self.sm2 = FastCryptSM2(
             private_key=self.private_key,
             public_key=self.public_key,
         )
-        self.sm2_c1c3c2 = CryptSM2(
-            private_key=self.private_key,
-            public_key=self.public_key,
-            mode=1,
-        )
 
     def _load_or_generate_keys(self):
         key_dir = os.path.dirname(self.key_path)
@@ -71,128 +96,148 @@ class SM2Service:
         stored_public = None
 
         if os.path.exists(self.key_path):
-            try:
-                with open(self.key_path, "r", encoding="utf-8") as f:
-                    lines = [ln.strip() for ln in f.read().strip().split("\n") if ln.strip()]
-                if lines:
-                    private_key = lines[0]
-                if len(lines) >= 2:
-                    cand = lines[1].lstrip("04")
-                    if len(cand) == 2 * len(default_ecc_table["n"]) and re.fullmatch(
-                        r"[0-9a-fA-F]+", cand
-                    ):
-                        stored_public = cand
-                print(f"[SM2] 已读取私钥: {self.key_path}")
-            except Exception as e:
-                print(f"[SM2] 读取密钥文件出错: {e}")
-
-        if not private_key:
+            # 文件存在却读不出私钥时直接报错，不能静默换新密钥（会使所有已签发的 JWT 失效）
+            with open(self.key_path, "r", encoding="utf-8") as f:
+                lines = [ln.strip() for ln in f.read().strip().split("\n") if ln.strip()]
+            if not lines:
+                raise RuntimeError(f"[SM2] 密钥文件为空: {self.key_path}")
+            private_key = lines[0]
+            if len(lines) >= 2:
+                cand = lines[1]
+                if len(cand) == 2 * len(default_ecc_table["n"]) + 2 and cand.startswith("04"):
+                    cand = cand[2:]
+                if len(cand) == 2 * len(default_ecc_table["n"]) and re.fullmatch(
+                    r"[0-9a-fA-F]+", cand
+                ):
+                    stored_public = cand
+            print(f"[SM2] 已读取私钥: {self.key_path}")
+        else:
             print("[SM2] 生成新私钥...")
             private_key = secrets.token_hex(32)
 
-        public_key = _derive_public_key_from_private(private_key)
-
-        if stored_public and stored_public.lower() != public_key.lower():
-            print(
-                "[SM2] 文件中公钥与私钥不匹配，已按椭圆曲线重新派生公钥并写回（旧 JWT 将失效）"
-            )
+        public_key = cached_public_key(private_key, self.table_cache_path)
 
-        try:
-            with open(self.key_path, "w", encoding="utf-8") as f:
-                f.write(f"{private_key}\n{public_key}\n")
-            print(f"[SM2] 密钥对已保存: {self.key_path}")
-        except Exception as e:
-            print(f"[SM2] 保存密钥文件出错: {e}")
+        # 只在新生成密钥或公钥行缺失/不匹配时写文件；签名只依赖私钥，补写公钥行不影响已签发的 JWT
+        if stored_public is None or stored_public.lower() != public_key.lower():
+            if stored_public:
+                print("[SM2] 文件中公钥与私钥不匹配，已按椭圆曲线重新派生公钥并写回")
+            try:
+                with open(self.key_path, "w", encoding="utf-8") as f:
+                    f.write(f"{private_key}\n{public_key}\n")
+                print(f"[SM2] 密钥对已保存: {self.key_path}")
+            except Exception as e:
+                print(f"[SM2] 保存密钥文件出错: {e}")
 
         return private_key, public_key
 
+    def _sign_rs(self, data):
+        """SM2 签名，返回 (r, s) 整数对。"""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+
+        # 临时密钥池命中时只剩模运算
+        pair = take_nonce()
+        if pair is not None:
+            rs = sign_digest(int(self.private_key, 16), int.from_bytes(data, "big"), *pair)
+            if rs is not None:
+                return rs
+
+        # 现场计算 k·G 的部分交给计算卸载池（已启用时）
+        executor = get_crypto_executor()
+        if executor is not None:
+            return executor.sign(self.private_key, data)
+
+        random_hex = secrets.token_hex(32)
+        if len(random_hex) < 64:
+            random_hex = random_hex.ljust(64, "0")[:64]
+        sign = self.sm2.sign(data, random_hex)
+        if not sign:
+            raise RuntimeError("SM2 sign 返回空")
+        return int(sign[:64], 16), int(sign[64:128], 16)
+
     def sign(self, data):
-        """SM2 签名；返回 Base64URL（内含 hex 的 r||s），与 verify 成对使用。"""
+        """SM2 签名；返回 Base64URL（内含 hex 的 r||s，v1 格式），与 verify 成对使用。"""
         try:
-            if isinstance(data, str):
-                data = data.encode("utf-8")
-
-            random_hex = secrets.token_hex(32)
-            if len(random_hex) < 64:
-                random_hex = random_hex.ljust(64, "0")[:64]
-
-            sign = self.sm2.sign(data, random_hex)
-            if not sign:
-                raise RuntimeError("SM2 sign 返回空")
-
-            if isinstance(sign, bytes):
-                sign_hex = sign.hex()
-            elif isinstance(sign, str):
-                sign_hex = sign
-            else:
-                sign_hex = str(sign)
+            r, s = self._sign_rs(data)
+            return _sig_hex_to_b64url("%064x%064x" % (r, s))
+        except Exception as e:
+            print(f"签名错误: {e}")
+            raise
 
-            return _sig_hex_to_b64url(sign_hex)
+    def sign_compact(self, data):
+        """SM2 签名；返回 r||s 原始 64 字节的 Base64URL（v2 格式，86 字符）。"""
+        try:
+            return _sig_rs_to_b64url(*self._sign_rs(data))
         except Exception as e:
             print(f"签名错误: {e}")
             raise
 
+    def verify_rs(self, data, r, s):
+        """按 (r, s) 验签，data 为 bytes。"""
+        executor = get_crypto_executor()
+        if executor is not None:
+            return executor.verify(self.public_key, data, r, s)
+        return verify_signature(self.public_key, r, s, int.from_bytes(data, "big"))
+
     def verify(self, data, sign_segment):
-        """验证签名：sign_segment 为 JWT 第三段（Base64URL 包裹的 hex，或裸 128 位 hex）。"""
+        """验证签名：sign_segment 为 JWT 第三段（v2 原始字节、v1 Base64URL 包裹的 hex，或裸 128 位 hex）。"""
         try:
             if isinstance(data, str):
                 data = data.encode("utf-8")
-
-            sign_hex = _sig_b64url_to_hex(sign_segment.strip())
-            para = len(default_ecc_table["n"])
-            if len(sign_hex) != 2 * para or not re.fullmatch(r"[0-9a-fA-F]+", sign_hex):
-                return False
             try:
-                ok = self.sm2.verify(sign_hex, data)
-            except TypeError:
+                r, s = _sig_segment_to_rs(sign_segment.strip())
+            except ValueError:
                 return False
-            return bool(ok)
+            return self.verify_rs(data, r, s)
         except Exception as e:
             print(f"验证签名错误: {e}")
             return False
 
-    def encrypt(self, plaintext):
+    def verify_many(self, items, normalized=False):
         """
-        SM2 加密。gmssl 的 encrypt 使用随机 k，内部可能得到 None 并触发 len(None)；
-        故对 mode=0 / mode=1 交替重试多次。
+        批量验签：items 为 [(data, sign_segment), ...]，返回等长的 bool 列表。
+        normalized=True 表示签名都由本服务（规范 k 取向）签出，整批用随机线性组合 + 多标量乘一次校验，
+        失败时二分定位到具体签名；否则逐个验签（见 SM2_Curve.verify_batch）。
         """
+        results = [False] * len(items)
+        batch = []
+        positions = []
+        for i, (data, sign_segment) in enumerate(items):
+            try:
+                if isinstance(data, str):
+                    data = data.encode("utf-8")
+                r, s = _sig_segment_to_rs(sign_segment.strip())
+            except Exception:
+                continue
+            batch.append((self.public_key, r, s, int.from_bytes(data, "big")))
+            positions.append(i)
+        for i, ok in zip(positions, verify_batch(batch, normalized)):
+            results[i] = ok
+        return results
+
+    def encrypt(self, plaintext):
+        """SM2 加密（C1C2C3，与 gmssl mode=0 格式一致），单次完成"""
         if isinstance(plaintext, str):
             data = plaintext.encode("utf-8")
         else:
             data = plaintext
-
-        engines = (self.sm2, self.sm2_c1c3c2)
-        last_err = None
-        for _ in range(48):
-            for eng in engines:
-                try:
-                    cipher = eng.encrypt(data)
-                    if cipher is None:
-                        continue
-                    if isinstance(cipher, bytes):
-                        return base64.b64encode(cipher).decode("utf-8")
-                    if isinstance(cipher, str):
-                        return base64.b64encode(cipher.encode()).decode("utf-8")
-                except (TypeError, AttributeError, ValueError) as e:
-                    last_err = e
-                    continue
-        err_msg = f"SM2 加密失败（已重试）: {last_err}"
-        print(f"加密错误: {err_msg}")
-        raise RuntimeError(err_msg)
+        executor = get_crypto_executor()
+        if executor is not None:
+            cipher = executor.encrypt(self.public_key, data, C1C2C3)
+        else:
+            cipher = sm2_encrypt(self.public_key, data, C1C2C3)
+        return base64.b64encode(cipher).decode("utf-8")
 
     def decrypt(self, ciphertext_b64):
-        """SM2 解密（与 encrypt 使用的 mode=0 / mode=1 对齐）"""
+        """SM2 解密：按 C1C2C3 / C1C3C2 依次尝试，以 C3 校验结果判定排列"""
         try:
             cipher = base64.b64decode(ciphertext_b64)
-            for eng in (self.sm2, self.sm2_c1c3c2):
+            executor = get_crypto_executor()
+            decrypt = executor.decrypt if executor is not None else sm2_decrypt
+            for mode in (C1C2C3, C1C3C2):
                 try:
-                    plain = eng.decrypt(cipher)
-                    if plain is None:
-                        continue
-                    if isinstance(plain, bytes):
-                        return plain.decode("utf-8")
-                    return str(plain)
-                except Exception:
+                    return decrypt(self.private_key, cipher, mode).decode("utf-8")
+                except ValueError:
                     continue
         except Exception as e:
             print(f"解密错误: {e}")
@@ -201,6 +246,13 @@ class SM2Service:
         except Exception:
             return None
 
+    def decrypt_raw(self, cipher, mode=C1C3C2):
+        """SM2 解密，返回原始字节（数字信封里的对称密钥等非文本明文），C3 校验失败抛 ValueError"""
+        executor = get_crypto_executor()
+        if executor is not None:
+            return executor.decrypt(self.private_key, cipher, mode)
+        return sm2_decrypt(self.private_key, cipher, mode)
+
     def encrypt_json(self, data_dict):
         """加密JSON数据"""
         import json
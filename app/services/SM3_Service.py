@@ -1,4 +1,116 @@
-from gmssl.sm3 import sm3_hash as _gmssl_sm3_hash, bytes_to_list
+"""
+SM3 哈希（GB/T 32905-2016）。
+
+SM3 是 hashlib 风格的增量哈希对象：update() 直接按 64 字节分组从 bytes / memoryview 中
+解包消息字，不再像 gmssl.sm3.sm3_hash 那样先把整段输入转成 Python int 列表；
+copy() 复制中间状态，可用于共享前缀的多次哈希。
+sm3_hash_many() 批量计算大量短消息，见 SM3_Vectorized。
+"""
+import struct
+
+_IV = (
+    0x7380166F, 0x4914B2B9, 0x172442D7, 0xDA8A0600,
+    0xA96F30BC, 0x163138AA, 0xE38DEE4D, 0xB0FB0E4E,
+)
+
+
+def _rotl(x, n):
+    return ((x << n) | (x >> (32 - n))) & 0xFFFFFFFF
+
+
+# 第 j 轮使用的常量 T_j <<< j，预先算好
+_T = tuple(_rotl(0x79CC4519 if j < 16 else 0x7A879D8A, j % 32) for j in range(64))
+
+# 少于该条数时向量化的固定开销不划算，逐条计算
+BATCH_MIN_SIZE = 16
+
+_BLOCK = struct.Struct(">16I")
+_DIGEST = struct.Struct(">8I")
+
+
+def _compress(v, block):
+    """压缩函数 CF：v 为 8 个字的中间状态，block 为 64 字节分组"""
+    w = list(_BLOCK.unpack(block))
+    for j in range(16, 68):
+        x = w[j - 16] ^ w[j - 9] ^ _rotl(w[j - 3], 15)
+        w.append(x ^ _rotl(x, 15) ^ _rotl(x, 23) ^ _rotl(w[j - 13], 7) ^ w[j - 6])
+
+    a, b, c, d, e, f, g, h = v
+    for j in range(64):
+        a12 = _rotl(a, 12)
+        ss1 = _rotl((a12 + e + _T[j]) & 0xFFFFFFFF, 7)
+        ss2 = ss1 ^ a12
+        if j < 16:
+            ff = a ^ b ^ c
+            gg = e ^ f ^ g
+        else:
+            ff = (a & b) | (a & c) | (b & c)
+            gg = (e & f) | (~e & g)
+        tt1 = (ff + d + ss2 + (w[j] ^ w[j + 4])) & 0xFFFFFFFF
+        tt2 = (gg + h + ss1 + w[j]) & 0xFFFFFFFF
+        d, c, b, a = c, _rotl(b, 9), a, tt1
+        h, g, f = g, _rotl(f, 19), e
+        e = tt2 ^ _rotl(tt2, 9) ^ _rotl(tt2, 17)
+
+    return (
+        v[0] ^ a, v[1] ^ b, v[2] ^ c, v[3] ^ d,
+        v[4] ^ e, v[5] ^ f, v[6] ^ g, v[7] ^ h,
+    )
+
+
+class SM3:
+    """hashlib 风格的 SM3：SM3(data).hexdigest() 或 h.update(...) 多次后取 digest()"""
+
+    name = "sm3"
+    digest_size = 32
+    block_size = 64
+
+    def __init__(self, data=b""):
+        self._v = _IV
+        self._buffer = b""
+        self._length = 0
+        if data:
+            self.update(data)
+
+    def update(self, data):
+        if isinstance(data, str):
+            raise TypeError("SM3.update 需要字节串，字符串请先 encode")
+        view = memoryview(data).cast("B")
+        self._length += len(view)
+        offset = 0
+        if self._buffer:
+            # 先把上次剩下的不足一组的数据补齐
+            need = 64 - len(self._buffer)
+            self._buffer += bytes(view[:need])
+            offset = need
+            if len(self._buffer) < 64:
+                return
+            self._v = _compress(self._v, self._buffer)
+            self._buffer = b""
+        v = self._v
+        end = len(view) - (len(view) - offset) % 64
+        for start in range(offset, end, 64):
+            v = _compress(v, view[start:start + 64])
+        self._v = v
+        self._buffer = bytes(view[end:])
+
+    def digest(self):
+        bit_length = self._length * 8
+        tail = self._buffer + b"\x80" + bytes((55 - self._length) % 64) + bit_length.to_bytes(8, "big")
+        v = self._v
+        for start in range(0, len(tail), 64):
+            v = _compress(v, tail[start:start + 64])
+        return _DIGEST.pack(*v)
+
+    def hexdigest(self):
+        return self.digest().hex()
+
+    def copy(self):
+        other = SM3.__new__(SM3)
+        other._v = self._v
+        other._buffer = self._buffer
+        other._length = self._length
+        return other
 
 
 def sm3_hash(data):
@@ -9,9 +121,26 @@ def sm3_hash(data):
     """
     if isinstance(data, str):
         data = data.encode("utf-8")
-    elif not isinstance(data, bytes):
+    elif not isinstance(data, (bytes, bytearray, memoryview)):
         raise TypeError("输入数据仅支持字符串/字节串")
-    return _gmssl_sm3_hash(bytes_to_list(data))
+    return SM3(data).hexdigest()
+
+
+def sm3_hash_many(messages):
+    """
+    批量 SM3：消息数达到 BATCH_MIN_SIZE 且装有 NumPy 时走多通道向量化实现，结果与逐条 sm3_hash 一致
+    :param messages: 字符串或字节串序列
+    :return: 与输入顺序一致的十六进制摘要列表
+    """
+    messages = [m.encode("utf-8") if isinstance(m, str) else m for m in messages]
+    if len(messages) >= BATCH_MIN_SIZE:
+        try:
+            from app.services.SM3_Vectorized import hash_many
+        except ImportError:
+            pass
+        else:
+            return hash_many(messages)
+    return [sm3_hash(m) for m in messages]
 
 
 def hash_password(password):
@@ -19,6 +148,11 @@ def hash_password(password):
     return sm3_hash(password)
 
 
+def hash_passwords(passwords):
+    """批量密码哈希，结果与逐条 hash_password 一致（批量导入用）"""
+    return sm3_hash_many(passwords)
+
+
 if __name__ == "__main__":
     test_pwd = "TestPass123!"
     print(f"原始密码: {test_pwd}")
@@ -0,0 +1,170 @@
+"""
+SM4 分组密码后端：优先使用 cryptography 包（OpenSSL 原生实现），其次 NumPy 向量化实现
+（SM4_Vectorized），都不可用时回退 gmssl 纯 Python 实现。
+
+SM4Cipher 是 gmssl CryptSM4 的替代品，set_key / crypt_ecb / crypt_cbc 的语义完全一致
+（加密时自动 PKCS7 填充，解密时去填充），调用方只需把 CryptSM4() 换成 SM4Cipher()；
+另提供 crypt_ctr（128 位大端计数器，不填充）。
+模块加载时会用标准测试向量和随机数据比对候选后端与 gmssl 的密文，不一致则换下一个候选。
+"""
+import secrets
+
+from gmssl.sm4 import CryptSM4, SM4_ENCRYPT, SM4_DECRYPT
+
+# GB/T 32907-2016 附录 A 测试向量
+_STANDARD_KEY = bytes.fromhex("0123456789abcdeffedcba9876543210")
+_STANDARD_PLAIN = bytes.fromhex("0123456789abcdeffedcba9876543210")
+_STANDARD_CIPHER = bytes.fromhex("681edf34d206965e86b3e94f536e4246")
+
+
+_COUNTER_MASK = (1 << 128) - 1
+
+
+def _pkcs7_pad(data):
+    pad_len = 16 - len(data) % 16
+    return data + bytes([pad_len] * pad_len)
+
+
+def _pkcs7_unpad(data):
+    # 与 gmssl 的 pkcs7_unpadding 保持一致：按最后一个字节截断，不做额外校验
+    return data[:-data[-1]]
+
+
+class GmsslSM4Backend:
+    """gmssl 纯 Python 实现"""
+
+    name = "gmssl"
+
+    def crypt_ecb(self, key, mode, data):
+        sm4 = CryptSM4()
+        sm4.set_key(key, mode)
+        return sm4.crypt_ecb(data)
+
+    def crypt_cbc(self, key, mode, iv, data):
+        sm4 = CryptSM4()
+        sm4.set_key(key, mode)
+        return sm4.crypt_cbc(iv, data)
+
+    def crypt_ctr(self, key, counter, data):
+        sm4 = CryptSM4()
+        sm4.set_key(key, SM4_ENCRYPT)
+        start = int.from_bytes(bytes(counter), "big")
+        out = bytearray()
+        for offset in range(0, len(data), 16):
+            block = ((start + offset // 16) & _COUNTER_MASK).to_bytes(16, "big")
+            stream = sm4.one_round(sm4.sk, list(block))
+            out += bytes(a ^ b for a, b in zip(data[offset:offset + 16], stream))
+        return bytes(out)
+
+
+class CryptographySM4Backend:
+    """cryptography 包提供的 SM4（OpenSSL）"""
+
+    name = "cryptography"
+
+    def __init__(self):
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+        self._cipher = Cipher
+        self._algorithm = algorithms.SM4
+        self._modes = modes
+
+    def _run(self, key, mode_obj, encrypt, data):
+        cipher = self._cipher(self._algorithm(bytes(key)), mode_obj)
+        ctx = cipher.encryptor() if encrypt else cipher.decryptor()
+        return ctx.update(data) + ctx.finalize()
+
+    def crypt_ecb(self, key, mode, data):
+        if mode == SM4_ENCRYPT:
+            return self._run(key, self._modes.ECB(), True, _pkcs7_pad(bytes(data)))
+        return _pkcs7_unpad(self._run(key, self._modes.ECB(), False, bytes(data)))
+
+    def crypt_cbc(self, key, mode, iv, data):
+        if mode == SM4_ENCRYPT:
+            return self._run(key, self._modes.CBC(bytes(iv)), True, _pkcs7_pad(bytes(data)))
+        return _pkcs7_unpad(self._run(key, self._modes.CBC(bytes(iv)), False, bytes(data)))
+
+    def crypt_ctr(self, key, counter, data):
+        return self._run(key, self._modes.CTR(bytes(counter)), True, data)
+
+
+def _numpy_backend():
+    from app.services.SM4_Vectorized import NumpySM4Backend
+
+    return NumpySM4Backend()
+
+
+def _self_check(candidate, reference):
+    """候选后端与参考后端在标准向量和随机数据上的输出必须逐字节一致"""
+    raw = candidate.crypt_ecb(_STANDARD_KEY, SM4_ENCRYPT, _STANDARD_PLAIN)
+    if raw[:16] != _STANDARD_CIPHER:
+        return False
+    for length in (0, 1, 15, 16, 17, 33, 64):
+        key = secrets.token_bytes(16)
+        iv = secrets.token_bytes(16)
+        data = secrets.token_bytes(length)
+        ecb = candidate.crypt_ecb(key, SM4_ENCRYPT, data)
+        cbc = candidate.crypt_cbc(key, SM4_ENCRYPT, iv, data)
+        if ecb != reference.crypt_ecb(key, SM4_ENCRYPT, data):
+            return False
+        if cbc != reference.crypt_cbc(key, SM4_ENCRYPT, iv, data):
+            return False
+        if candidate.crypt_ctr(key, iv, data) != reference.crypt_ctr(key, iv, data):
+            return False
+        if candidate.crypt_ecb(key, SM4_DECRYPT, ecb) != data:
+            return False
+        if candidate.crypt_cbc(key, SM4_DECRYPT, iv, cbc) != data:
+            return False
+    # 计数器低 64 位回绕时须向高位进位
+    wrap = bytes(8) + b"\xff" * 8
+    data = secrets.token_bytes(48)
+    return candidate.crypt_ctr(_STANDARD_KEY, wrap, data) == reference.crypt_ctr(_STANDARD_KEY, wrap, data)
+
+
+def _select_backend():
+    reference = GmsslSM4Backend()
+    for factory in (CryptographySM4Backend, _numpy_backend):
+        try:
+            candidate = factory()
+        except Exception as e:
+            print(f"⚠️ SM4 候选后端不可用: {e}")
+            continue
+        try:
+            if _self_check(candidate, reference):
+                return candidate
+            print(f"⚠️ {candidate.name} 与 gmssl 的 SM4 密文不一致，跳过该后端")
+        except Exception as e:
+            print(f"⚠️ {candidate.name} SM4 自检失败，跳过该后端: {e}")
+    print("⚠️ SM4 使用 gmssl 纯 Python 后端")
+    return reference
+
+
+_backend = _select_backend()
+
+
+def get_backend():
+    """当前进程使用的 SM4 后端"""
+    return _backend
+
+
+class SM4Cipher:
+    """CryptSM4 的替代品：接口与语义一致，底层走当前 SM4 后端"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or _backend
+        self.key = None
+        self.mode = SM4_ENCRYPT
+
+    def set_key(self, key, mode):
+        self.key = bytes(key)
+        self.mode = mode
+
+    def crypt_ecb(self, input_data):
+        return self.backend.crypt_ecb(self.key, self.mode, input_data)
+
+    def crypt_cbc(self, iv, input_data):
+        return self.backend.crypt_cbc(self.key, self.mode, iv, input_data)
+
+    def crypt_ctr(self, counter, input_data):
+        """CTR 模式加解密（同一操作），不做填充"""
+        return self.backend.crypt_ctr(self.key, counter, input_data)
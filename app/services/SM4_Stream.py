@@ -0,0 +1,261 @@
+"""
+SM4 流式加解密：encryptor.update(chunk) / finalize()，内存占用只与分片大小有关，与数据总量无关。
+
+支持两种模式：
+- CTR：不认证，任意后端可用（非 cryptography 后端时在 crypt_ctr 之上维护计数器和剩余密钥流）；
+- GCM：认证加密，需要 cryptography 后端。
+
+update() 接受 bytes / bytearray / memoryview；cryptography 后端下 update_into() 把结果直接写进
+调用方的缓冲区，encrypt_file 复用同一对输入输出缓冲区，全程不产生与数据量成正比的副本。
+流式输出格式为 nonce || 密文 [|| tag]。
+
+注意：GCM 流式解密在 finalize() 校验 tag 之前就会吐出明文，校验失败（ValueError）时
+调用方必须丢弃已写出的内容。
+"""
+import secrets
+
+from app.services.SM4_Backend import get_backend
+
+CTR = "ctr"
+GCM = "gcm"
+
+CTR_NONCE_SIZE = 16
+GCM_NONCE_SIZE = 12
+GCM_TAG_SIZE = 16
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+_COUNTER_MASK = (1 << 128) - 1
+
+
+def nonce_size(mode):
+    if mode == CTR:
+        return CTR_NONCE_SIZE
+    if mode == GCM:
+        return GCM_NONCE_SIZE
+    raise ValueError(f"不支持的 SM4 流式模式: {mode}")
+
+
+def tag_size(mode):
+    return GCM_TAG_SIZE if mode == GCM else 0
+
+
+def _as_bytes_view(data):
+    view = memoryview(data)
+    return view if view.format == "B" and view.ndim == 1 else view.cast("B")
+
+
+class _CounterStream:
+    """在后端的 crypt_ctr 之上维护 128 位计数器与未用完的密钥流，分片长度不必是 16 的倍数"""
+
+    def __init__(self, backend, key, counter):
+        self._backend = backend
+        self._key = bytes(key)
+        self._counter = int.from_bytes(bytes(counter), "big")
+        self._leftover = b""
+
+    def _counter_bytes(self):
+        return (self._counter & _COUNTER_MASK).to_bytes(16, "big")
+
+    def update(self, data):
+        data = _as_bytes_view(data)
+        out = bytearray()
+        if self._leftover and len(data):
+            n = min(len(self._leftover), len(data))
+            out += bytes(a ^ b for a, b in zip(data[:n], self._leftover))
+            self._leftover = self._leftover[n:]
+            data = data[n:]
+        full = len(data) - len(data) % 16
+        if full:
+            out += self._backend.crypt_ctr(self._key, self._counter_bytes(), data[:full])
+            self._counter += full // 16
+        tail = data[full:]
+        if len(tail):
+            stream = self._backend.crypt_ctr(self._key, self._counter_bytes(), bytes(16))
+            self._counter += 1
+            out += bytes(a ^ b for a, b in zip(tail, stream))
+            self._leftover = stream[len(tail):]
+        return bytes(out)
+
+    def update_into(self, data, buf):
+        out = self.update(data)
+        buf[:len(out)] = out
+        return len(out)
+
+    def finalize(self):
+        return b""
+
+
+def _open_context(key, mode, nonce, encrypt, associated_data, backend):
+    backend = backend or get_backend()
+    if backend.name != "cryptography":
+        if mode == GCM:
+            raise RuntimeError("SM4-GCM 需要 cryptography 后端")
+        return _CounterStream(backend, key, nonce)
+
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+    mode_obj = modes.CTR(bytes(nonce)) if mode == CTR else modes.GCM(bytes(nonce))
+    cipher = Cipher(algorithms.SM4(bytes(key)), mode_obj)
+    ctx = cipher.encryptor() if encrypt else cipher.decryptor()
+    if associated_data:
+        ctx.authenticate_additional_data(associated_data)
+    return ctx
+
+
+class SM4StreamEncryptor:
+    """
+    流式加密器。
+    :param key: 16 字节 SM4 密钥
+    :param mode: CTR 或 GCM
+    :param nonce: 不传则随机生成（CTR 16 字节初始计数器，GCM 12 字节），同一密钥下不得重复
+    :param associated_data: GCM 附加认证数据（不加密但参与认证）
+    """
+
+    def __init__(self, key, mode=CTR, nonce=None, associated_data=None, backend=None):
+        if associated_data and mode != GCM:
+            raise ValueError("只有 GCM 模式支持附加认证数据")
+        self.mode = mode
+        self.nonce = bytes(nonce) if nonce is not None else secrets.token_bytes(nonce_size(mode))
+        if len(self.nonce) != nonce_size(mode):
+            raise ValueError(f"{mode} 模式的 nonce 须为 {nonce_size(mode)} 字节")
+        self.tag = None
+        self._ctx = _open_context(key, mode, self.nonce, True, associated_data, backend)
+
+    def update(self, data):
+        return self._ctx.update(_as_bytes_view(data))
+
+    def update_into(self, data, buf):
+        """把密文写入 buf（长度至少 len(data) + 15），返回写入字节数"""
+        return self._ctx.update_into(_as_bytes_view(data), buf)
+
+    def finalize(self):
+        """结束加密；GCM 模式下此后可读取 self.tag"""
+        out = self._ctx.finalize()
+        if self.mode == GCM:
+            self.tag = self._ctx.tag
+        return out
+
+
+class SM4StreamDecryptor:
+    """流式解密器，参数含义同 SM4StreamEncryptor；GCM 的 tag 在 finalize(tag) 时提供"""
+
+    def __init__(self, key, nonce, mode=CTR, associated_data=None, backend=None):
+        if associated_data and mode != GCM:
+            raise ValueError("只有 GCM 模式支持附加认证数据")
+        if len(nonce) != nonce_size(mode):
+            raise ValueError(f"{mode} 模式的 nonce 须为 {nonce_size(mode)} 字节")
+        self.mode = mode
+        self.nonce = bytes(nonce)
+        self._ctx = _open_context(key, mode, self.nonce, False, associated_data, backend)
+
+    def update(self, data):
+        return self._ctx.update(_as_bytes_view(data))
+
+    def update_into(self, data, buf):
+        return self._ctx.update_into(_as_bytes_view(data), buf)
+
+    def finalize(self, tag=None):
+        """结束解密；GCM 模式下校验 tag，失败抛 ValueError"""
+        if self.mode != GCM:
+            return self._ctx.finalize()
+        if tag is None or len(tag) != GCM_TAG_SIZE:
+            raise ValueError("SM4-GCM 解密缺少 16 字节 tag")
+        from cryptography.exceptions import InvalidTag
+
+        try:
+            return self._ctx.finalize_with_tag(bytes(tag))
+        except InvalidTag:
+            raise ValueError("SM4-GCM 认证失败，密文或附加数据已被篡改")
+
+
+def iter_encrypt(key, chunks, mode=CTR, nonce=None, associated_data=None):
+    """生成器：先产出 nonce，再逐片产出密文，GCM 模式最后产出 tag"""
+    encryptor = SM4StreamEncryptor(key, mode, nonce, associated_data)
+    yield encryptor.nonce
+    for chunk in chunks:
+        out = encryptor.update(chunk)
+        if out:
+            yield out
+    out = encryptor.finalize()
+    if out:
+        yield out
+    if encryptor.tag:
+        yield encryptor.tag
+
+
+def iter_decrypt(key, chunks, mode=CTR, associated_data=None):
+    """生成器：输入 iter_encrypt 格式的分片流（分片边界任意），逐片产出明文"""
+    header = nonce_size(mode)
+    trailer = tag_size(mode)
+    decryptor = None
+    pending = b""
+    for chunk in chunks:
+        if decryptor is None:
+            pending += bytes(chunk)
+            if len(pending) < header:
+                continue
+            decryptor = SM4StreamDecryptor(key, pending[:header], mode, associated_data)
+            chunk, pending = pending[header:], b""
+        view = _as_bytes_view(chunk)
+        if not trailer:
+            body = view
+        elif len(view) >= trailer:
+            # 末尾 trailer 字节可能是 tag，扣下来等下一片确认
+            if pending:
+                yield decryptor.update(pending)
+            body, pending = view[:-trailer], bytes(view[-trailer:])
+        else:
+            joined = pending + bytes(view)
+            body, pending = joined[:-trailer], joined[-trailer:]
+        if len(body):
+            yield decryptor.update(body)
+    if decryptor is None:
+        raise ValueError("密文过短，缺少 nonce")
+    if trailer:
+        if len(pending) != trailer:
+            raise ValueError("密文过短，缺少 tag")
+        out = decryptor.finalize(pending)
+    else:
+        out = decryptor.finalize()
+    if out:
+        yield out
+
+
+def _read_chunks(src, chunk_size):
+    """循环复用同一块缓冲区读取文件；产出的 memoryview 在下一次迭代前有效"""
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    while True:
+        n = src.readinto(buf)
+        if not n:
+            return
+        yield view[:n]
+
+
+def encrypt_file(key, src, dst, mode=GCM, nonce=None, associated_data=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    把二进制文件对象 src 加密写入 dst，格式 nonce || 密文 [|| tag]。
+    :return: 写出的字节数
+    """
+    encryptor = SM4StreamEncryptor(key, mode, nonce, associated_data)
+    out = bytearray(chunk_size + 15)
+    out_view = memoryview(out)
+    written = dst.write(encryptor.nonce)
+    for chunk in _read_chunks(src, chunk_size):
+        n = encryptor.update_into(chunk, out)
+        written += dst.write(out_view[:n])
+    written += dst.write(encryptor.finalize())
+    if encryptor.tag:
+        written += dst.write(encryptor.tag)
+    return written
+
+
+def decrypt_file(key, src, dst, mode=GCM, associated_data=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    解密 encrypt_file 的输出。GCM 校验失败抛 ValueError，此时 dst 中已写出的内容不可信。
+    :return: 写出的明文字节数
+    """
+    written = 0
+    for chunk in iter_decrypt(key, _read_chunks(src, chunk_size), mode, associated_data):
+        written += dst.write(chunk)
+    return written
@@ -3,14 +3,16 @@
 import os
 import base64
 import secrets
-from gmssl.sm4 import CryptSM4, SM4_ENCRYPT, SM4_DECRYPT
+from gmssl.sm4 import SM4_ENCRYPT, SM4_DECRYPT
+from app.services.SM4_Backend import SM4Cipher
+from app.services.SM4_Stream import GCM, CTR, SM4StreamEncryptor, SM4StreamDecryptor, encrypt_file, decrypt_file
 
 
 class SM4Service:
     def __init__(self, key_path="app/sm4_key.txt"):
         self.key_path = key_path
         self.key = self._load_or_generate_key()
-        self.sm4 = CryptSM4()
+        self.sm4 = SM4Cipher()
 
     def _load_or_generate_key(self):
         """加载或生成SM4密钥（16字节）"""
@@ -120,6 +122,60 @@ class SM4Service:
             print(f"SM4 CBC解密错误: {e}")
             return self.decrypt(ciphertext_b64)  # 降级到ECB模式
 
+    def encrypt_ctr(self, plaintext, nonce=None):
+        """SM4加密（CTR模式，不填充，适合大块数据）"""
+        try:
+            if isinstance(plaintext, str):
+                plaintext = plaintext.encode('utf-8')
+
+            # 初始计数器，同一密钥下不得重复
+            if nonce is None:
+                nonce = secrets.token_bytes(16)
+
+            self.sm4.set_key(self.key, SM4_ENCRYPT)
+            ciphertext = self.sm4.crypt_ctr(nonce, plaintext)
+
+            # 返回计数器+密文的组合
+            return base64.b64encode(nonce + ciphertext).decode('utf-8')
+        except Exception as e:
+            print(f"SM4 CTR加密错误: {e}")
+            return None
+
+    def decrypt_ctr(self, ciphertext_b64):
+        """SM4解密（CTR模式）"""
+        try:
+            data = base64.b64decode(ciphertext_b64)
+
+            self.sm4.set_key(self.key, SM4_ENCRYPT)
+            plaintext = self.sm4.crypt_ctr(data[:16], data[16:])
+
+            return plaintext.decode('utf-8')
+        except Exception as e:
+            print(f"SM4 CTR解密错误: {e}")
+            return None
+
+    def encryptor(self, mode=CTR, nonce=None, associated_data=None):
+        """流式加密器：update(chunk) / finalize()，nonce 见返回对象的 .nonce"""
+        return SM4StreamEncryptor(self.key, mode, nonce, associated_data)
+
+    def decryptor(self, nonce, mode=CTR, associated_data=None):
+        """流式解密器：update(chunk) / finalize(tag)"""
+        return SM4StreamDecryptor(self.key, nonce, mode, associated_data)
+
+    def encrypt_file(self, src_path, dst_path, mode=GCM):
+        """分块加密文件（默认GCM认证加密），内存占用与文件大小无关"""
+        with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+            return encrypt_file(self.key, src, dst, mode)
+
+    def decrypt_file(self, src_path, dst_path, mode=GCM):
+        """分块解密文件；认证失败时删除已写出的不可信明文并抛出异常"""
+        try:
+            with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+                return decrypt_file(self.key, src, dst, mode)
+        except ValueError:
+            os.remove(dst_path)
+            raise
+
 
 # 测试代码
 if __name__ == "__main__":
@@ -143,4 +199,12 @@ if __name__ == "__main__":
     print(f"CBC加密结果: {encrypted_cbc}")
 
     decrypted_cbc = sm4_service.decrypt_cbc(encrypted_cbc)
-    print(f"CBC解密结果: {decrypted_cbc}")
\ No newline at end of file
+    print(f"CBC解密结果: {decrypted_cbc}")
+
+    # 测试CTR模式
+    print(f"\n=== 测试SM4 CTR模式 ===")
+    encrypted_ctr = sm4_service.encrypt_ctr(test_str)
+    print(f"CTR加密结果: {encrypted_ctr}")
+
+    decrypted_ctr = sm4_service.decrypt_ctr(encrypted_ctr)
+    print(f"CTR解密结果: {decrypted_ctr}")
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""
+NumPy 向量化 SM4：把成千上万个相互独立的分组排成 uint32 数组，32 轮轮函数一次作用于整批。
+
+轮函数 T = L∘τ 是线性变换 L 套在逐字节 S 盒上，可预先合成 4 张 256 项的 T 表，
+每轮只需 4 次查表和 3 次异或。适用于 ECB、CTR 以及 CBC 解密这类分组之间无依赖的模式；
+CBC 加密本身是串行的，交给 gmssl 逐块处理。
+"""
+import numpy as np
+from gmssl.sm4 import CryptSM4, SM4_BOXES_TABLE, SM4_ENCRYPT, SM4_DECRYPT
+
+
+def _rotl(x, n):
+    return ((x << n) | (x >> (32 - n))) & 0xffffffff
+
+
+def _build_t_tables():
+    tables = []
+    for shift in (24, 16, 8, 0):
+        row = []
+        for a in range(256):
+            b = SM4_BOXES_TABLE[a] << shift
+            row.append(b ^ _rotl(b, 2) ^ _rotl(b, 10) ^ _rotl(b, 18) ^ _rotl(b, 24))
+        tables.append(np.array(row, dtype=np.uint32))
+    return tables
+
+
+_T0, _T1, _T2, _T3 = _build_t_tables()
+
+
+def round_keys(key, mode=SM4_ENCRYPT):
+    """复用 gmssl 的密钥扩展，返回 32 个轮密钥（解密时已逆序）"""
+    sm4 = CryptSM4()
+    sm4.set_key(bytes(key), mode)
+    return [int(k) & 0xffffffff for k in sm4.sk]
+
+
+def crypt_blocks(sk, data):
+    """
+    对整批分组做 32 轮变换（不填充）。
+    :param sk: round_keys() 的结果，决定加密还是解密
+    :param data: bytes / memoryview，长度须为 16 的倍数
+    :return: bytes
+    """
+    words = np.frombuffer(data, dtype=">u4").astype(np.uint32).reshape(-1, 4)
+    x0, x1, x2, x3 = (words[:, i].copy() for i in range(4))
+    mask = np.uint32(0xff)
+    for rk in sk:
+        t = x1 ^ x2 ^ x3 ^ np.uint32(rk)
+        t = (_T0[t >> 24] ^ _T1[(t >> 16) & mask]
+             ^ _T2[(t >> 8) & mask] ^ _T3[t & mask])
+        x0, x1, x2, x3 = x1, x2, x3, x0 ^ t
+    out = np.stack((x3, x2, x1, x0), axis=1).astype(">u4")
+    return out.tobytes()
+
+
+def ctr_keystream(sk, counter, nblocks):
+    """从 128 位大端计数器 counter 起连续生成 nblocks 个分组的密钥流"""
+    counter = bytes(counter)
+    hi = int.from_bytes(counter[:8], "big")
+    lo = int.from_bytes(counter[8:], "big")
+    steps = np.arange(nblocks, dtype=np.uint64)
+    lo_words = np.uint64(lo) + steps
+    hi_words = np.uint64(hi) + (lo_words < np.uint64(lo)).astype(np.uint64)
+    blocks = np.stack((hi_words, lo_words), axis=1).astype(">u8")
+    return crypt_blocks(sk, blocks.tobytes())
+
+
+def xor_bytes(data, stream):
+    a = np.frombuffer(data, dtype=np.uint8)
+    b = np.frombuffer(stream, dtype=np.uint8, count=len(a))
+    return np.bitwise_xor(a, b).tobytes()
+
+
+def _pkcs7_pad(data):
+    pad_len = 16 - len(data) % 16
+    return bytes(data) + bytes([pad_len] * pad_len)
+
+
+class NumpySM4Backend:
+    """NumPy 向量化后端，接口与 SM4_Backend 中其余后端一致"""
+
+    name = "numpy"
+
+    def crypt_ecb(self, key, mode, data):
+        if mode == SM4_ENCRYPT:
+            return crypt_blocks(round_keys(key, SM4_ENCRYPT), _pkcs7_pad(data))
+        plain = crypt_blocks(round_keys(key, SM4_DECRYPT), data)
+        return plain[:-plain[-1]]
+
+    def crypt_cbc(self, key, mode, iv, data):
+        if mode == SM4_ENCRYPT:
+            sm4 = CryptSM4()
+            sm4.set_key(key, mode)
+            return sm4.crypt_cbc(iv, data)
+        data = bytes(data)
+        plain = crypt_blocks(round_keys(key, SM4_DECRYPT), data)
+        plain = xor_bytes(plain, bytes(iv) + data[:-16])
+        return plain[:-plain[-1]]
+
+    def crypt_ctr(self, key, counter, data):
+        nblocks = -(-len(data) // 16)
+        if not nblocks:
+            return b""
+        stream = ctr_keystream(round_keys(key, SM4_ENCRYPT), counter, nblocks)
+        return xor_bytes(data, stream)
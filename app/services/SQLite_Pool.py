@@ -0,0 +1,193 @@
+"""
+原生 sqlite3 调用点共用的连接池：每个数据库文件一个有上限的连接池，连接跨线程复用，首次打开时设置一次 PRAGMA。
+
+- Flask 开发服务器（app.run、mock_bank）每个请求一个新线程，按线程保存的连接无法跨请求复用；
+  这里连接以 check_same_thread=False 打开，按 `with pool.connection() as conn:` 借出、块结束时归还，
+  同一时刻只被一个线程使用，下一个请求（不论哪个线程）直接取回空闲连接；
+- with 块即一个事务：正常结束提交、异常回滚，之后连接回到空闲队列（后进先出，热连接优先复用）；
+- 连接数达到上限时借出方等待，超过 CHECKOUT_TIMEOUT 抛 sqlite3.OperationalError；
+- journal_mode=WAL 让读写互不阻塞，synchronous=NORMAL 在 WAL 下每次提交不再 fsync 主库；
+- cached_statements 放大 sqlite3 自带的预编译语句 LRU，固定 SQL 只在每条连接上编译一次；
+- 调用方不要 close() 借出的连接；被关闭的连接在归还或下次借出时丢弃并另开一条（计入 reopened）。
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 每条连接缓存的预编译语句数（sqlite3 默认 128）
+CACHED_STATEMENTS = 256
+BUSY_TIMEOUT = 5.0
+DEFAULT_JOURNAL_MODE = "WAL"
+DEFAULT_SYNCHRONOUS = "NORMAL"
+# 每个数据库文件的连接上限与借出等待上限（秒）
+MAX_CONNECTIONS = 16
+CHECKOUT_TIMEOUT = 30.0
+
+
+def _is_closed(conn):
+    try:
+        conn.total_changes  # 已 close() 的连接在此抛 ProgrammingError
+    except sqlite3.ProgrammingError:
+        return True
+    return False
+
+
+class SQLitePool:
+    """
+    :param db_path: 数据库文件（按绝对路径区分）
+    :param row_factory: 默认 sqlite3.Row，可按列名取值
+    :param max_connections: 连接上限，借出的与空闲的合计
+    """
+
+    def __init__(self, db_path, journal_mode=DEFAULT_JOURNAL_MODE, synchronous=DEFAULT_SYNCHRONOUS,
+                 row_factory=sqlite3.Row, cached_statements=CACHED_STATEMENTS, timeout=BUSY_TIMEOUT,
+                 max_connections=MAX_CONNECTIONS, checkout_timeout=CHECKOUT_TIMEOUT):
+        self.db_path = os.path.abspath(db_path)
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.row_factory = row_factory
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.checkout_timeout = checkout_timeout
+        self.checkouts = 0
+        self.opened = 0
+        self.reused = 0
+        self.reopened = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.max_in_use = 0
+        self._in_use = 0
+        self._size = 0
+        self._idle = deque()
+        self._cond = threading.Condition()
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path, timeout=self.timeout, cached_statements=self.cached_statements,
+            check_same_thread=False,
+        )
+        conn.row_factory = self.row_factory
+        if self.journal_mode:
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        if self.synchronous:
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        return conn
+
+    def _checkout(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.max_connections:
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise sqlite3.OperationalError(f"连接池借出超时（{self.db_path}）")
+                if not waited:
+                    waited = True
+                    self.waits += 1
+                self._cond.wait(remaining)
+            self.checkouts += 1
+            self._in_use += 1
+            self.max_in_use = max(self.max_in_use, self._in_use)
+        if conn is not None and not _is_closed(conn):
+            with self._cond:
+                self.reused += 1
+            return conn
+        try:
+            new_conn = self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.opened += 1
+            if conn is not None:
+                self.reopened += 1
+        return new_conn
+
+    def _checkin(self, conn):
+        closed = _is_closed(conn)
+        if not closed and conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._in_use -= 1
+            if closed:
+                self._size -= 1
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """借出一条连接；with 块为一个事务（正常提交、异常回滚），结束后连接归还连接池"""
+        conn = self._checkout()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._checkin(conn)
+
+    def close_all(self):
+        """关闭所有空闲连接（测试或进程退出前使用）；借出中的连接照常归还，下次借出时复用"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "db_path": self.db_path,
+                "max_connections": self.max_connections,
+                "connections": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "max_in_use": self.max_in_use,
+                "checkouts": self.checkouts,
+                "opened": self.opened,
+                "reused": self.reused,
+                "reopened": self.reopened,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "reuse_ratio": self.reused / self.checkouts if self.checkouts else 0.0,
+                "cached_statements": self.cached_statements,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path, **options):
+    """同一数据库文件在进程内共用一个 SQLitePool；options 只在首次创建时生效"""
+    key = os.path.abspath(db_path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = SQLitePool(key, **options)
+    return pool
+
+
+def connection(db_path):
+    """借出 db_path 对应连接池中的一条连接：with connection(db_path) as conn: ..."""
+    return get_pool(db_path).connection()
+
+
+def pool_stats():
+    return [pool.stats() for pool in list(_pools.values())]
@@ -0,0 +1,116 @@
+"""
+SQLite 引擎性能配置：按用途命名的 PRAGMA 组合与连接池类型，供 SQLAlchemy 引擎和 Flask-SQLAlchemy 共用。
+
+- oltp：线上读写（默认）。WAL + synchronous=NORMAL，读写互不阻塞、每次提交不再 fsync 主库；
+  QueuePool 按线程数保有长连接，每条连接只在建立时设一次 PRAGMA；
+- bulk-load：批量导入。synchronous=OFF、更大的页缓存；SQLite 同时只允许一个写者，
+  连接池只保留一条连接，多线程写入在池内排队，不在数据库锁上忙等重试；
+  断电可能丢失最近的提交，只用于可重跑的导入；
+- read-only-replica：只读副本。query_only 禁止写入、不改 journal_mode（只读文件上无法切换），
+  mmap 开到 1 GB 让热数据直接走页缓存，连接池更大以承载并发查询。
+
+PRAGMA 在连接池的 connect 事件里执行，对该引擎新建的每条连接生效。
+
+连接池类型（bench_sqlite_profiles.py 末尾有只读副本上的对比）：
+- oltp 用 QueuePool：连接复用，PRAGMA、页缓存与 mmap 映射只在建连时付出一次；
+  上限（10 + 20 溢出）同时限制了争抢写锁的并发数，超出的请求在池内等待而不是在 busy_timeout 上重试；
+- bulk-load 用 pool_size=1、max_overflow=0 的 QueuePool：这是唯一能让多线程写入在池内串行排队的组合。
+  StaticPool 让多个线程同时共用一条连接，事务会交错；SingletonThreadPool 每个线程各开一条连接，
+  起不到串行化的作用，且线程数超过 pool_size 后会关闭仍在使用的连接；
+- read-only-replica 同样用 QueuePool：NullPool 每次借出都要重新打开文件、执行 PRAGMA、重建 mmap 与页缓存，
+  登录查询吞吐只有 QueuePool 的一半左右；SingletonThreadPool 在 1~8 线程时与 QueuePool 相当，
+  32 线程时落后 15%~30%，且 Flask 每个请求一个线程，连接会随线程反复新建、关闭；
+  StaticPool 单连接跨线程共用，不适合并发查询。
+"""
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+DEFAULT_SQLITE_PROFILE = "oltp"
+
+SQLITE_PROFILES = {
+    "oltp": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "mmap_size": 256 * 1024 * 1024,
+            "cache_size": -64 * 1024,  # 负数单位为 KiB，即 64 MB
+            "temp_store": "MEMORY",
+            "busy_timeout": 5000,  # 毫秒
+        },
+        "poolclass": QueuePool,
+        "pool_options": {"pool_size": 10, "max_overflow": 20, "pool_timeout": 30},
+    },
+    "bulk-load": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "OFF",
+            "mmap_size": 256 * 1024 * 1024,
+            "cache_size": -256 * 1024,
+            "temp_store": "MEMORY",
+            "busy_timeout": 30000,
+        },
+        "poolclass": QueuePool,
+        "pool_options": {"pool_size": 1, "max_overflow": 0, "pool_timeout": 300},
+    },
+    "read-only-replica": {
+        "pragmas": {
+            "journal_mode": None,
+            "synchronous": None,
+            "mmap_size": 1024 * 1024 * 1024,
+            "cache_size": -128 * 1024,
+            "temp_store": "MEMORY",
+            "busy_timeout": 5000,
+            "query_only": "ON",
+        },
+        "poolclass": QueuePool,
+        "pool_options": {"pool_size": 20, "max_overflow": 40, "pool_timeout": 30},
+    },
+}
+
+
+def get_profile(name):
+    try:
+        return SQLITE_PROFILES[name]
+    except KeyError:
+        raise ValueError(f"未知的 SQLite 配置：{name}（可选 {', '.join(SQLITE_PROFILES)}）") from None
+
+
+def sqlite_engine_options(profile=DEFAULT_SQLITE_PROFILE):
+    """create_engine 的连接池参数（也可直接作为 Flask 的 SQLALCHEMY_ENGINE_OPTIONS）"""
+    config = get_profile(profile)
+    return {"poolclass": config["poolclass"], **config["pool_options"]}
+
+
+def apply_sqlite_profile(engine, profile=DEFAULT_SQLITE_PROFILE):
+    """在引擎的 connect 事件上挂载 PRAGMA，之后新建的连接都按该配置初始化"""
+    pragmas = [(key, value) for key, value in get_profile(profile)["pragmas"].items() if value is not None]
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for key, value in pragmas:
+                cursor.execute(f"PRAGMA {key}={value}")
+        finally:
+            cursor.close()
+
+    return engine
+
+
+def create_sqlite_engine(db_path, profile=DEFAULT_SQLITE_PROFILE, **kwargs):
+    """按配置创建 SQLite 引擎；kwargs 覆盖配置中的连接池参数"""
+    options = sqlite_engine_options(profile)
+    options.update(kwargs)
+    return apply_sqlite_profile(create_engine(f"sqlite:///{db_path}", **options), profile)
+
+
+def init_flask_sqlite(app, db, profile=DEFAULT_SQLITE_PROFILE):
+    """代替 db.init_app(app)：写入引擎参数、初始化扩展，并给 Flask-SQLAlchemy 的引擎挂上 PRAGMA"""
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        **sqlite_engine_options(profile),
+        **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+    }
+    db.init_app(app)
+    with app.app_context():
+        apply_sqlite_profile(db.engine, profile)
+    return app
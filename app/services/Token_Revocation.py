@@ -0,0 +1,266 @@
+"""
+令牌注销表：每条记录带过期时间（令牌自身的 exp），过期后自动清除，内存占用只与"仍有效的注销令牌"数量有关。
+
+- 过期清理：最小堆按 exp 排序，每次增删查时弹出已过期的堆顶，均摊 O(log n)；
+- Bloom 过滤器前置：绝大多数请求携带的令牌并未注销，位图判定"一定不在"即可返回，不查字典；
+  过期条目无法从位图中删除，累计的失效位过多或容量不足时按存活条目重建位图；
+- 键统一取 SHA-256 摘要保存，不留令牌原文。
+
+多个 worker 进程共用注销表时使用 SharedRevocationStore：注销写入同机共享的 WAL 模式 SQLite 表，
+每个进程在内存里保留一份 ExpiringTokenStore，按自增序号增量拉取新记录，
+查询始终走内存，注销在 REFRESH_INTERVAL 秒内传播到其他进程。
+"""
+import hashlib
+import heapq
+import math
+import os
+import sqlite3
+import threading
+import time
+
+# 预计同时存活的注销条目数与 Bloom 过滤器目标误判率
+DEFAULT_CAPACITY = 4096
+DEFAULT_FALSE_POSITIVE_RATE = 0.01
+
+_MISSING = object()
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+# 共享注销表文件，可用环境变量 REVOCATION_DB_PATH 指到源码目录以外；首次注销或查询时才创建
+REVOCATION_DB_PATH = os.environ.get("REVOCATION_DB_PATH") or os.path.join(_ROOT, "revocation.db")
+# 本地缓存向共享表增量同步的最小间隔（秒），即跨进程注销的最大传播延迟
+REFRESH_INTERVAL = 1.0
+# 清理共享表中已过期记录的间隔（秒）
+CLEANUP_INTERVAL = 300
+
+
+def _digest(key):
+    if isinstance(key, str):
+        key = key.encode("utf-8")
+    return hashlib.sha256(key).digest()
+
+
+class _BloomFilter:
+    def __init__(self, capacity, false_positive_rate):
+        self.capacity = capacity
+        self.bits = max(64, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.inserted = 0
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, digest):
+        # 双重散列：摘要前后两段作为 h1、h2
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, digest):
+        for pos in self._positions(digest):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+        self.inserted += 1
+
+    def might_contain(self, digest):
+        array = self._array
+        for pos in self._positions(digest):
+            if not array[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def fill_ratio(self):
+        return sum(bin(b).count("1") for b in self._array) / self.bits
+
+
+class ExpiringTokenStore:
+    """
+    带过期时间的令牌集合（也可附带值，当作过期字典用）。
+    :param capacity: 预计同时存活的条目数，超出后位图自动扩容
+    :param false_positive_rate: Bloom 过滤器目标误判率
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE):
+        self.false_positive_rate = false_positive_rate
+        self.added = 0
+        self.expired = 0
+        self.lookups = 0
+        self.bloom_rejects = 0
+        self.bloom_false_positives = 0
+        self._entries = {}
+        self._heap = []
+        self._bloom = _BloomFilter(capacity, false_positive_rate)
+        self._lock = threading.Lock()
+
+    def _purge(self, now):
+        """弹出所有已过期的堆顶；堆中可能留有被 discard 或重新 add 的旧记录，按字典为准"""
+        heap = self._heap
+        while heap and heap[0][0] < now:
+            exp, digest = heapq.heappop(heap)
+            entry = self._entries.get(digest)
+            if entry is not None and entry[0] == exp:
+                del self._entries[digest]
+                self.expired += 1
+        bloom = self._bloom
+        live = len(self._entries)
+        if bloom.inserted > bloom.capacity:
+            # 位图已按容量插满（含已过期的失效位），按存活条目重建，存活过半时顺带扩容
+            self._rebuild(max(bloom.capacity, 2 * live))
+        if len(heap) > 2 * live + 64:
+            # discard 留下的陈旧堆记录过多时压缩
+            self._heap = [(entry[0], digest) for digest, entry in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _rebuild(self, capacity):
+        bloom = _BloomFilter(capacity, self.false_positive_rate)
+        for digest in self._entries:
+            bloom.add(digest)
+        self._bloom = bloom
+
+    def add(self, key, exp, value=True):
+        """记录 key，直到 exp（Unix 秒）为止"""
+        digest = _digest(key)
+        exp = int(exp)
+        with self._lock:
+            self._purge(int(time.time()))
+            self._entries[digest] = (exp, value)
+            heapq.heappush(self._heap, (exp, digest))
+            self._bloom.add(digest)
+            self.added += 1
+
+    def discard(self, key):
+        digest = _digest(key)
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def get(self, key, default=None):
+        """未记录或已过期返回 default"""
+        digest = _digest(key)
+        now = int(time.time())
+        with self._lock:
+            self.lookups += 1
+            if self._heap and self._heap[0][0] < now:
+                self._purge(now)
+            if not self._bloom.might_contain(digest):
+                self.bloom_rejects += 1
+                return default
+            entry = self._entries.get(digest)
+            if entry is None or entry[0] < now:
+                self.bloom_false_positives += 1
+                return default
+            return entry[1]
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._heap.clear()
+            self._rebuild(self._bloom.capacity)
+
+    def stats(self):
+        with self._lock:
+            bloom = self._bloom
+            return {
+                "size": len(self._entries),
+                "heap_size": len(self._heap),
+                "capacity": bloom.capacity,
+                "bloom_bits": bloom.bits,
+                "bloom_hashes": bloom.hashes,
+                "bloom_fill_ratio": bloom.fill_ratio(),
+                "added": self.added,
+                "expired": self.expired,
+                "lookups": self.lookups,
+                "bloom_rejects": self.bloom_rejects,
+                "bloom_false_positives": self.bloom_false_positives,
+            }
+
+
+class SharedRevocationStore:
+    """
+    同机多进程共享的注销表。
+    :param db_path: SQLite 文件路径（WAL 模式，所有 worker 指向同一文件）
+    :param refresh_interval: 本地缓存增量同步的最小间隔（秒）
+    """
+
+    def __init__(self, db_path=REVOCATION_DB_PATH, refresh_interval=REFRESH_INTERVAL,
+                 capacity=DEFAULT_CAPACITY):
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        self.last_seq = 0
+        self.refreshes = 0
+        self.pulled = 0
+        self._local = ExpiringTokenStore(capacity)
+        self._last_refresh = 0.0
+        self._last_cleanup = time.monotonic()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def _db(self):
+        """首次使用时打开共享表（导入模块、创建服务时不落盘）；调用方须持有 self._lock"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_revocations ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, digest BLOB NOT NULL, exp INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_token_revocations_exp ON token_revocations(exp)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def refresh(self, force=False):
+        """拉取 last_seq 之后的新注销记录；未到同步间隔且非强制时直接返回"""
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return
+        with self._lock:
+            if not force and now - self._last_refresh < self.refresh_interval:
+                return
+            # 序号只按本次读到的记录推进：不按 exp 过滤、不另查 MAX(seq)，
+            # 两次读取之间其他进程提交的注销不会落到 last_seq 之下被跳过；已过期的记录在这里丢弃
+            rows = self._db.execute(
+                "SELECT seq, digest, exp FROM token_revocations WHERE seq > ? ORDER BY seq",
+                (self.last_seq,),
+            ).fetchall()
+            current = int(time.time())
+            for seq, digest, exp in rows:
+                if exp >= current:
+                    self._local.add(bytes(digest), exp)
+                    self.pulled += 1
+            if rows:
+                self.last_seq = rows[-1][0]
+            self.refreshes += 1
+            self._last_refresh = now
+            if now - self._last_cleanup >= CLEANUP_INTERVAL:
+                self._db.execute("DELETE FROM token_revocations WHERE exp < ?", (int(time.time()),))
+                self._db.commit()
+                self._last_cleanup = now
+
+    def add(self, key, exp, value=True):
+        """注销 key 直到 exp：写共享表，并立即更新本进程缓存"""
+        digest = _digest(key)
+        with self._lock:
+            self._db.execute("INSERT INTO token_revocations (digest, exp) VALUES (?, ?)", (digest, int(exp)))
+            self._db.commit()
+        self._local.add(digest, exp, value)
+
+    def __contains__(self, key):
+        self.refresh()
+        return _digest(key) in self._local
+
+    def __len__(self):
+        return len(self._local)
+
+    def stats(self):
+        stats = self._local.stats()
+        stats.update({
+            "last_seq": self.last_seq,
+            "refreshes": self.refreshes,
+            "pulled": self.pulled,
+            "refresh_interval": self.refresh_interval,
+        })
+        return stats
@@ -1,34 +1,20 @@
 # app/services/cert.py
-from gmssl import sm2, sm3, func
+from gmssl import sm3, func
 import base64
 import os
 from cryptography import x509
 from cryptography.hazmat.primitives import hashes
+from app.services.SM2_Curve import FastCryptSM2, derive_public_key
 import base64
 
 
 def generate_sm2_key():
     """
-    生成 SM2 密钥对（使用库内部方法）
+    生成 SM2 密钥对（公钥由基点固定基表计算 d*G）
     """
     # 生成 32 字节私钥（64 个十六进制字符）
     private_key = os.urandom(32).hex()
-
-    # 创建一个临时的 SM2 对象，仅用于计算公钥
-    tmp = sm2.CryptSM2(private_key=private_key, public_key='')
-
-    # 尝试获取公钥：优先使用内部属性 _public_key，否则尝试其他方式
-    if hasattr(tmp, '_public_key'):
-        public_key = tmp._public_key
-    elif hasattr(tmp, 'public_key'):
-        public_key = tmp.public_key
-    else:
-        # 如果都没有，则手动通过椭圆曲线点乘计算公钥
-        # 曲线参数：SM2 的基点 G 坐标（已知），用私钥乘以 G 得到公钥
-        # 但这里简单起见，我们使用已知的库函数计算（如果有的话）
-        # 如果实在没有，我们可以使用 gmssl.sm2.SM2 的其他构造方式
-        raise RuntimeError("无法从私钥自动计算公钥，请检查 gmssl 版本")
-
+    public_key = derive_public_key(private_key)
     return private_key, public_key
 
 
@@ -53,7 +39,7 @@ def issue_user_certificate(ca_pri, ca_pub, user_pub, username="张三"):
     data = f"ISSUER=UESTC_CA;SUBJECT={username};PUB={user_pub}".encode()
 
     # 创建 CA 的 SM2 对象（用于签名）
-    ca_sm2 = sm2.CryptSM2(private_key=ca_pri, public_key=ca_pub)
+    ca_sm2 = FastCryptSM2(private_key=ca_pri, public_key=ca_pub)
 
     # 生成签名所需的随机数 K
     # para_len 通常为 32，random_hex(para_len) 返回 64 个十六进制字符
@@ -6,6 +6,7 @@ from cryptography.x509.oid import NameOID
 from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.backends import default_backend
+from app.services.Crypto_Executor import get_crypto_executor
 
 # 配置路径
 CA_KEY_PATH = "certs/rootCA.key"
@@ -39,12 +40,20 @@ class CertService:
 
     def issue_user_cert(self, username: str):
         """签发用户客户端证书（你原有接口）"""
-        # 生成用户私钥
-        user_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048,
-            backend=default_backend()
-        )
+        # 生成用户私钥（计算卸载池已启用时在子进程中生成，不阻塞其他请求线程）
+        executor = get_crypto_executor()
+        if executor is not None:
+            user_key = serialization.load_pem_private_key(
+                executor.keygen("rsa", 2048),
+                password=None,
+                backend=default_backend()
+            )
+        else:
+            user_key = rsa.generate_private_key(
+                public_exponent=65537,
+                key_size=2048,
+                backend=default_backend()
+            )
 
         # 证书主题
         subject = x509.Name([
@@ -2,23 +2,25 @@
 支付服务 - 实现数字签名、数字信封、防重放等安全机制
 """
 import time
-import secrets
 import json
-import base64
 import os
 from datetime import datetime
-from gmssl.sm2 import CryptSM2, default_ecc_table
-from gmssl.sm3 import sm3_hash as _gmssl_sm3_hash, bytes_to_list
-from gmssl.sm4 import CryptSM4, SM4_ENCRYPT, SM4_DECRYPT
+from gmssl.sm4 import SM4_ENCRYPT, SM4_DECRYPT
 from app.extensions import db
 from app.models.ecommerce_models import Order
+from app.services.SM3_Service import SM3
+from app.services.SM2_Curve import register_public_key
+from app.services.SM2_TableCache import load_table_cache, save_table_cache
+from app.services.SM2_Cipher import C1C3C2
+from app.services.Crypto_Sidecar import create_sm2_service
+from app.services.SM4_Backend import SM4Cipher
 
 
 def sm3_hash(data):
     """SM3 哈希"""
     if isinstance(data, str):
         data = data.encode("utf-8")
-    return _gmssl_sm3_hash(bytes_to_list(data))
+    return SM3(data).hexdigest()
 
 
 class PaymentService:
@@ -30,27 +32,19 @@ class PaymentService:
     # 银行公钥（用于加密）
     BANK_PUBLIC_KEY = ""
     
-    # 电商私钥（用于签名和解密）
-    ECOMMERCE_PRIVATE_KEY = ""
+    # 电商密钥（app/sm2_key.txt，用于签名和解密）：由 create_sm2_service() 提供，
+    # 启用国密守护进程时私钥只在守护进程内，本进程不加载私钥也不建表
+    ECOMMERCE_SM2 = None
     ECOMMERCE_PUBLIC_KEY = ""
     
     @classmethod
     def load_keys(cls):
         """加载密钥"""
         # 加载电商密钥
-        key_file = os.path.join(os.path.dirname(__file__), "..", "sm2_key.txt")
-        key_file = os.path.abspath(key_file)
-        
         try:
-            if os.path.exists(key_file):
-                with open(key_file, "r", encoding="utf-8") as f:
-                    lines = [ln.strip() for ln in f.read().strip().split("\n") if ln.strip()]
-                if len(lines) >= 2:
-                    cls.ECOMMERCE_PRIVATE_KEY = lines[0]
-                    cls.ECOMMERCE_PUBLIC_KEY = lines[1]
-                    print(f"✅ 已加载电商密钥对")
-            else:
-                print(f"⚠️ 电商密钥文件不存在: {key_file}")
+            cls.ECOMMERCE_SM2 = create_sm2_service()
+            cls.ECOMMERCE_PUBLIC_KEY = cls.ECOMMERCE_SM2.public_key
+            print(f"✅ 已加载电商密钥对")
         except Exception as e:
             print(f"⚠️ 加载电商密钥失败: {e}")
         
@@ -76,6 +70,16 @@ class PaymentService:
                         print(f"✅ 已从bank_sm2_key.txt加载银行公钥")
         except Exception as e:
             print(f"⚠️ 加载银行公钥失败: {e}")
+
+        # 银行公钥预建固定基表：验签与数字信封 k·P 走查表路径（优先取磁盘缓存）；电商公钥由 SM2Service 登记
+        if cls.BANK_PUBLIC_KEY:
+            load_table_cache()
+            try:
+                register_public_key(cls.BANK_PUBLIC_KEY)
+            except ValueError as e:
+                print(f"⚠️ 银行公钥预计算失败: {e}")
+            else:
+                save_table_cache(keys=[cls.BANK_PUBLIC_KEY])
     
     @staticmethod
     def generate_payment_signature(order_id, amount, merchant_id, timestamp):
@@ -89,23 +93,9 @@ class PaymentService:
         # SM3 哈希
         hash_value = sm3_hash(sign_str)
         
-        # SM2 私钥签名
-        para = len(default_ecc_table["n"])
-        placeholder = "0" * (2 * para)
-        sm2 = CryptSM2(private_key=PaymentService.ECOMMERCE_PRIVATE_KEY, public_key=placeholder)
-        
-        random_hex = secrets.token_hex(32)
-        if len(random_hex) < 64:
-            random_hex = random_hex.ljust(64, "0")[:64]
-        
-        signature = sm2.sign(hash_value.encode("utf-8"), random_hex)
-        
-        # 转换为 Base64URL 格式
-        if isinstance(signature, bytes):
-            signature = signature.hex()
-        signature_b64url = base64.urlsafe_b64encode(signature.encode("ascii")).decode("ascii").rstrip("=")
-        
-        return signature_b64url
+        # SM2 私钥签名（进程内时走临时密钥池 / 计算卸载池，启用守护进程时由守护进程签名）；
+        # 结果为 hex 的 r||s 再做 Base64URL（无填充），与银行侧验签格式一致
+        return PaymentService.ECOMMERCE_SM2.sign(hash_value)
     
     @staticmethod
     def create_payment_url(order_id, amount, callback_url=None):
@@ -151,22 +141,14 @@ class PaymentService:
         """
         try:
             # 1. SM2 解密 SM4 密钥
-            para = len(default_ecc_table["n"])
-            sm2 = CryptSM2(private_key=PaymentService.ECOMMERCE_PRIVATE_KEY, 
-                          public_key=PaymentService.ECOMMERCE_PUBLIC_KEY.lstrip("04"),
-                          mode=1)
-            
             encrypted_key_bytes = bytes.fromhex(encrypted_key_hex)
-            sm4_key = sm2.decrypt(encrypted_key_bytes)
-            
-            if isinstance(sm4_key, str):
-                sm4_key = bytes.fromhex(sm4_key)
+            sm4_key = PaymentService.ECOMMERCE_SM2.decrypt_raw(encrypted_key_bytes, C1C3C2)
             
             # 2. SM4 解密密文
             iv = bytes.fromhex(iv_hex)
             ciphertext = bytes.fromhex(ciphertext_hex)
             
-            sm4 = CryptSM4()
+            sm4 = SM4Cipher()
             sm4.set_key(sm4_key, SM4_DECRYPT)
             decrypted_padded = sm4.crypt_cbc(iv, ciphertext)
             
@@ -2,6 +2,7 @@ import sqlite3
 import os
 from .SM3_Service import hash_password
 from .SM4_Utils import SM4Service
+from .user_service import user_service
 
 # ========== 初始化数据库连接 ==========
 conn = sqlite3.connect('user.db')
@@ -90,6 +91,8 @@ def register():
                 VALUES (?, ?, ?, ?, ?)
                 ''', (username, password_hash, phone, encrypted_phone, 'user'))
         conn.commit()
+        # 与 UserService.register 一致：清掉该用户名的负缓存
+        user_service.user_cache.invalidate(username)
         print("✅ 注册成功！加密数据已写入SQLite数据库")
     except sqlite3.IntegrityError:
         print("❌ 用户名已存在")
@@ -1,17 +1,37 @@
 
 """用户注册 / 登录 / 查询，与 SQLite user.db 对齐 CLI 注册表结构。"""
+import base64
+import csv
+import json
 import os
 import sqlite3
-from app.services.SM3_Service import hash_password
+import threading
+import time
+from collections import OrderedDict
+from app.services.Crypto_Executor import get_crypto_executor
+from app.services.SM2_Cipher import C1C2C3
+from app.services.SM3_Service import hash_password, hash_passwords
+from app.services.SQLite_Pool import get_pool
 
 _ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 DB_PATH = os.path.join(_ROOT, "user.db")
+# 用户记录缓存：容量、存在用户的有效期、不存在用户名（负缓存）的容量与有效期（秒）。
+# 负缓存单独限量，撞库流量里的大量随机用户名挤不掉真实用户的记录。
+# 写操作在本进程内同步失效；其他进程的写入最多在有效期后可见
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 60
+USER_NEGATIVE_CACHE_SIZE = 256
+USER_NEGATIVE_CACHE_TTL = 10
+# 批量导入：每个事务写入的行数、报告中最多保留的逐行错误数
+BULK_CHUNK_SIZE = 1000
+BULK_MAX_ERRORS = 1000
+# 按用户名查重时每条 IN 查询的参数个数（低于旧版 SQLite 的 999 个变量上限）
+_LOOKUP_BATCH = 500
 
 
 def _conn():
-    c = sqlite3.connect(DB_PATH)
-    c.row_factory = sqlite3.Row
-    return c
+    """从 user.db 连接池借出一条长连接（WAL，PRAGMA 只设一次）；`with _conn() as conn` 为一个事务，结束后归还"""
+    return get_pool(DB_PATH).connection()
 
 
 def _ensure_table():
@@ -39,6 +59,32 @@ def _ensure_table():
 _ensure_table()
 
 
+def iter_user_records(stream, fmt="ndjson"):
+    """
+    流式解析导入文件：NDJSON 每行一个 JSON 对象；CSV 首行为表头（username,password,phone）。
+    :param stream: 文本流（逐行读取，不整体载入内存）
+    :return: 逐条产出 (行号, 记录字典或 None, 错误信息或 None)
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"JSON 解析失败: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "每行须为 JSON 对象"
+            continue
+        yield line_no, record, None
+
+
 class User:
     __slots__ = ("id", "username", "role", "phone_encrypted")
 
@@ -49,11 +95,111 @@ class User:
         self.phone_encrypted = phone_encrypted
 
 
+class UserCache:
+    """
+    用户名 -> 用户记录的 TTL + LRU 缓存；记录为 None 表示"该用户名不存在"（负缓存），
+    撞库流量里大量不存在的用户名不再每次查库。负缓存是独立的一个较小的 LRU。
+    """
+
+    def __init__(self, max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL,
+                 negative_max_size=USER_NEGATIVE_CACHE_SIZE, negative_ttl=USER_NEGATIVE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_max_size = negative_max_size
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._generation = 0
+        self._entries = OrderedDict()
+        self._negative = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username):
+        """返回 (是否命中, 记录或 None, 世代号)；未命中时把世代号交给 put，防止失效前读到的旧值回填"""
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries
+            entry = entries.get(username)
+            if entry is None:
+                entries = self._negative
+                entry = entries.get(username)
+            if entry is not None and entry[1] < now:
+                del entries[username]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None, self._generation
+            entries.move_to_end(username)
+            if entry[0] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return True, entry[0], self._generation
+
+    def put(self, username, record, generation):
+        if record is not None:
+            entries, other, ttl, max_size = self._entries, self._negative, self.ttl, self.max_size
+        else:
+            entries, other, ttl, max_size = self._negative, self._entries, self.negative_ttl, self.negative_max_size
+        with self._lock:
+            if generation != self._generation:
+                return
+            other.pop(username, None)
+            entries[username] = (record, time.monotonic() + ttl)
+            entries.move_to_end(username)
+            while len(entries) > max_size:
+                entries.popitem(last=False)
+
+    def invalidate(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+            self._negative.pop(username, None)
+            self._generation += 1
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._negative.clear()
+            self._generation += 1
+
+    def stats(self):
+        total = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "negative_size": len(self._negative),
+            "negative_max_size": self.negative_max_size,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": (self.hits + self.negative_hits) / total if total else 0.0,
+        }
+
+
 class UserService:
     """供 auth_api / user_api 使用；error_msg 为最近一次登录失败原因。"""
 
     def __init__(self):
         self.error_msg = "用户名或密码错误"
+        self.user_cache = UserCache()
+
+    def _load_user(self, username):
+        """读穿缓存：返回 (id, username, password_hash, phone_encrypted, role) 或 None"""
+        hit, record, generation = self.user_cache.get(username)
+        if hit:
+            return record
+        with _conn() as conn:
+            row = conn.execute(
+                "SELECT id, username, password_hash, phone_encrypted, role FROM users WHERE username = ?",
+                (username,),
+            ).fetchone()
+        record = tuple(row) if row else None
+        self.user_cache.put(username, record, generation)
+        return record
 
     def register(self, username, password, phone, phone_encrypted):
         pwd_hash = hash_password(password)
@@ -66,6 +212,8 @@ class UserService:
                     """,
                     (username, pwd_hash, phone, phone_encrypted),
                 )
+            # 清掉该用户名的负缓存
+            self.user_cache.invalidate(username)
             return {"success": True, "msg": ""}
         except sqlite3.IntegrityError:
             return {"success": False, "msg": "用户名已存在"}
@@ -77,28 +225,22 @@ class UserService:
         if not username or not password:
             self.error_msg = "用户名和密码不能为空"
             return None
-        with _conn() as conn:
-            row = conn.execute(
-                "SELECT id, username, password_hash, phone_encrypted, role FROM users WHERE username = ?",
-                (username,),
-            ).fetchone()
+        row = self._load_user(username)
         if not row:
             self.error_msg = "用户不存在"
             return None
-        if row["password_hash"] != hash_password(password):
+        user_id, username, password_hash, phone_encrypted, role = row
+        if password_hash != hash_password(password):
             self.error_msg = "密码错误"
             return None
-        return User(row["id"], row["username"], row["role"] or "user", row["phone_encrypted"])
+        return User(user_id, username, role or "user", phone_encrypted)
 
     def get_user_by_username(self, username):
-        with _conn() as conn:
-            row = conn.execute(
-                "SELECT id, username, phone_encrypted, role FROM users WHERE username = ?",
-                (username,),
-            ).fetchone()
+        row = self._load_user(username)
         if not row:
             return None
-        return User(row["id"], row["username"], row["role"] or "user", row["phone_encrypted"])
+        user_id, username, _, phone_encrypted, role = row
+        return User(user_id, username, role or "user", phone_encrypted)
 
     def update_user_phone(self, username, encrypted_phone, new_phone_plain):
         try:
@@ -114,6 +256,152 @@ class UserService:
             return n > 0
         except Exception:
             return False
+        finally:
+            self.user_cache.invalidate(username)
+
+    def bulk_import(self, records, sm2_service, chunk_size=BULK_CHUNK_SIZE):
+        """
+        批量导入用户：每 chunk_size 行一批，手机号 SM2 加密与批量 SM3 密码哈希都分摊到计算卸载池各进程
+        （未启用时本线程计算），整批 executemany 在一个事务内写入。单行出错只记入报告，不影响其他行。
+        :param records: iter_user_records 的产出，或 (行号, 记录字典, None) 的任意可迭代对象
+        :param sm2_service: 加密手机号用的 SM2Service（与单条注册接口一致，密文格式 C1C2C3）
+        :return: {"total", "imported", "failed", "errors": [{"line", "username", "msg"}, ...]}
+        """
+        report = {"total": 0, "imported": 0, "failed": 0, "errors": []}
+        seen = set()
+        chunk = []
+        for line_no, record, error in records:
+            report["total"] += 1
+            username = None
+            if error is None:
+                username = str(record.get("username") or "").strip()
+                password = str(record.get("password") or "")
+                phone = str(record.get("phone") or "").strip()
+                if not (username and password and phone):
+                    error = "用户名、密码、手机号不能为空"
+                elif username in seen:
+                    error = "用户名在导入文件中重复"
+            if error is not None:
+                self._bulk_error(report, line_no, username, error)
+                continue
+            seen.add(username)
+            chunk.append((line_no, username, password, phone))
+            if len(chunk) >= chunk_size:
+                self._import_chunk(chunk, sm2_service, report)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk, sm2_service, report)
+        return report
+
+    @staticmethod
+    def _bulk_error(report, line_no, username, msg):
+        report["failed"] += 1
+        if len(report["errors"]) < BULK_MAX_ERRORS:
+            report["errors"].append({"line": line_no, "username": username, "msg": msg})
+
+    def _import_chunk(self, chunk, sm2_service, report):
+        usernames = [row[1] for row in chunk]
+        existing = set()
+        with _conn() as conn:
+            for i in range(0, len(usernames), _LOOKUP_BATCH):
+                part = usernames[i:i + _LOOKUP_BATCH]
+                existing.update(
+                    r[0] for r in conn.execute(
+                        f"SELECT username FROM users WHERE username IN ({','.join('?' * len(part))})", part
+                    )
+                )
+        rows = []
+        for row in chunk:
+            if row[1] in existing:
+                self._bulk_error(report, row[0], row[1], "用户名已存在")
+            else:
+                rows.append(row)
+        if not rows:
+            return
+        # 加密与哈希任务先全部分发到各进程，再依次等待结果
+        pending = _encrypt_phones(sm2_service, [row[3] for row in rows])
+        pending_hashes = _hash_passwords([row[2] for row in rows])
+        try:
+            encrypted = pending()
+        except Exception as e:
+            for row in rows:
+                self._bulk_error(report, row[0], row[1], f"手机号加密失败: {e}")
+            return
+        try:
+            hashes = pending_hashes()
+        except Exception as e:
+            for row in rows:
+                self._bulk_error(report, row[0], row[1], f"密码哈希失败: {e}")
+            return
+        params = [
+            (row[1], pwd_hash, row[3], phone_encrypted)
+            for row, pwd_hash, phone_encrypted in zip(rows, hashes, encrypted)
+        ]
+        sql = "INSERT INTO users (username, password_hash, phone, phone_encrypted) VALUES (?, ?, ?, ?)"
+        imported = len(rows)
+        # 加密期间不占用连接，写入时再借出
+        with _conn() as conn:
+            try:
+                conn.executemany(sql, params)
+            except sqlite3.IntegrityError:
+                # 查重之后有并发写入：回滚整批，在同一事务里逐行重试以定位冲突行
+                conn.rollback()
+                imported = 0
+                for row, values in zip(rows, params):
+                    try:
+                        conn.execute(sql, values)
+                        imported += 1
+                    except sqlite3.IntegrityError:
+                        self._bulk_error(report, row[0], row[1], "用户名已存在")
+        report["imported"] += imported
+        for row in rows:
+            # 清掉这些用户名的负缓存
+            self.user_cache.invalidate(row[1])
+
+    def cache_stats(self):
+        return self.user_cache.stats()
+
+
+def _encrypt_phones(sm2_service, phones):
+    """
+    分发手机号加密，返回取结果的函数（调用时等待完成）。
+    计算卸载池已启用时按进程数切片并行，否则在本线程逐条调用 sm2_service.encrypt。
+    """
+    executor = get_crypto_executor()
+    public_key = getattr(sm2_service, "public_key", None)
+    if executor is None or not public_key:
+        return lambda: [sm2_service.encrypt(phone) for phone in phones]
+    data = [phone.encode("utf-8") for phone in phones]
+    step = max(1, -(-len(data) // executor.max_workers))
+    futures = [
+        executor.submit_encrypt_many(public_key, data[i:i + step], C1C2C3)
+        for i in range(0, len(data), step)
+    ]
+
+    def collect():
+        return [base64.b64encode(c).decode("utf-8") for f in futures for c in f.result()]
+
+    return collect
+
+
+def _hash_passwords(passwords):
+    """
+    分发批量密码哈希，返回取结果的函数（调用时等待完成）。
+    计算卸载池已启用时按进程数切片并行，否则在调用取结果函数时于本线程批量计算。
+    """
+    executor = get_crypto_executor()
+    if executor is None:
+        return lambda: hash_passwords(passwords)
+    step = max(1, -(-len(passwords) // executor.max_workers))
+    futures = [
+        executor.submit_hash_passwords(passwords[i:i + step])
+        for i in range(0, len(passwords), step)
+    ]
+
+    def collect():
+        return [digest for f in futures for digest in f.result()]
+
+    return collect
 
 
 user_service = UserService()
@@ -1,11 +1,16 @@
 from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy import event, exc as sa_exc
+from collections import deque
+from contextlib import contextmanager
+import threading
 import logging
 from datetime import datetime, timedelta
 import json
 import base64
 import random
+import secrets
 import re
 import time
 import string
@@ -13,6 +18,13 @@ import os
 import subprocess
 import gmssl
 from gmssl import sm2, sm3, sm4
+from app.services.Crypto_Executor import get_crypto_executor
+from app.services.SM2_Cipher import C1C3C2, decrypt as sm2_decrypt, encrypt as sm2_encrypt
+from app.services.SM2_Curve import N, FastCryptSM2, derive_public_key, register_public_key
+from app.services.SM3_Service import SM3
+from app.services.SM4_Backend import SM4Cipher
+from app.services.SQLite_Profiles import DEFAULT_SQLITE_PROFILE, create_sqlite_engine
+from app.services.Token_Revocation import ExpiringTokenStore
 
 # ========== 1. 日志配置（保留原逻辑） ==========
 logging.basicConfig(
@@ -30,15 +42,9 @@ logger = logging.getLogger(__name__)
 def create_db_engine(db_type="sqlite", **kwargs):
     """多数据库引擎创建（保留原逻辑）"""
     if db_type == "sqlite":
+        # SQLite 按命名配置设置 PRAGMA 与连接池类型（oltp / bulk-load / read-only-replica）
         db_path = kwargs.get("db_path", "ecommerce.db")
-        engine = create_engine(
-            f"sqlite:///{db_path}",
-            pool_size=10,
-            max_overflow=20,
-            pool_timeout=30,
-            pool_recycle=3600,
-            echo=False
-        )
+        engine = create_sqlite_engine(db_path, kwargs.get("profile", DEFAULT_SQLITE_PROFILE))
     elif db_type == "mysql":
         host = kwargs.get("host", "localhost")
         port = kwargs.get("port", 3306)
@@ -72,18 +78,119 @@ def create_db_engine(db_type="sqlite", **kwargs):
     return engine
 
 
+# 连接池指标：保留最近若干次借出等待耗时用于计算分位数
+POOL_METRICS_WINDOW = 1024
+
+
+class PoolMetrics:
+    """
+    连接池指标：借出等待耗时（含排队）、在用连接数、溢出建连与借出超时次数。
+    在用连接数与建连次数来自 pool 的 connect / checkout / checkin 事件，适用于任意池类型；
+    pool 没有借出前的事件，等待耗时由 acquire() 在会话借连接时计时（session_scope 统一经过这里）。
+    """
+
+    def __init__(self, engine, window=POOL_METRICS_WINDOW):
+        self.pool = engine.pool
+        self.checkouts = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.connections_opened = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._waits = deque(maxlen=window)
+        self._lock = threading.Lock()
+        event.listen(self.pool, "connect", self._on_connect)
+        event.listen(self.pool, "checkout", self._on_checkout)
+        event.listen(self.pool, "checkin", self._on_checkin)
+
+    def acquire(self, db):
+        """为会话借出连接并记录等待耗时；借出超时计数后原样抛出"""
+        started = time.perf_counter()
+        try:
+            db.connection()
+        except sa_exc.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            logger.warning("⚠️ 数据库连接池借出超时")
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.wait_total += elapsed
+                self.wait_max = max(self.wait_max, elapsed)
+                self._waits.append(elapsed)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connections_opened += 1
+            # QueuePool 的 overflow() 大于 0 表示已超出 pool_size，正在使用溢出连接
+            overflow = getattr(self.pool, "overflow", None)
+            if overflow is not None and overflow() > 0:
+                self.overflow_events += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.in_use -= 1
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            count = len(waits)
+            return {
+                "pool": self.pool.status(),
+                "checkouts": self.checkouts,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "connections_opened": self.connections_opened,
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+                "checkout_wait_avg_ms": self.wait_total / count * 1000 if count else 0.0,
+                "checkout_wait_p50_ms": waits[count // 2] * 1000 if count else 0.0,
+                "checkout_wait_p99_ms": waits[min(count - 1, int(count * 0.99))] * 1000 if count else 0.0,
+                "checkout_wait_max_ms": self.wait_max * 1000,
+            }
+
+
 # 默认SQLite引擎（保留原逻辑）
 engine = create_db_engine("sqlite")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+pool_metrics = PoolMetrics(engine)
 Base = declarative_base()
 
 
-# ========== 3. 数据库会话工具（保留原逻辑） ==========
+# ========== 3. 数据库会话工具 ==========
 def get_db_session():
-    """获取数据库会话（自动回收）"""
+    """获取数据库会话（生成器形式，须由框架驱动到结束才会关闭；业务代码请用 session_scope）"""
+    db = SessionLocal()
+    try:
+        yield db
+    except Exception as e:
+        logger.error(f"数据库会话异常：{e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@contextmanager
+def session_scope():
+    """
+    会话上下文：正常结束时提交，异常时回滚，最后一定关闭并把连接还给连接池。
+    用法：with session_scope() as db: ...
+    """
     db = SessionLocal()
     try:
+        pool_metrics.acquire(db)
         yield db
+        db.commit()
     except Exception as e:
         logger.error(f"数据库会话异常：{e}")
         db.rollback()
@@ -92,82 +199,126 @@ def get_db_session():
         db.close()
 
 
+def pool_stats():
+    return pool_metrics.stats()
+
+
 # ========== 4. 国密算法工具类（替换原RSA工具类） ==========
 # ================= SM2 非对称加密/签名 =================
+# 轮换后旧公钥继续验签的时长（秒），与刷新令牌有效期一致
+SM2_KEY_ROTATION_GRACE = 7 * 24 * 3600
+_SM2_BACKUP_PATTERN = re.compile(r"^sm2_public_key_backup_(\d{14})\.pem$")
+
+
 class SM2Service:
     def __init__(self):
-        # 初始化SM2（国密推荐曲线）
-        self.sm2_crypt = sm2.CryptSM2(
-            public_key=None,
-            private_key=None,
-            curve="sm2p256v1"
-        )
+        # 每把公钥一个预建的验签器（公钥 -> FastCryptSM2），轮换时不重建
+        self._verifiers = {}
+        # 宽限期内的退役公钥：[(公钥, 停止验签时间戳)]
+        self.retired_keys = []
         # 加载/生成SM2密钥对
         self.private_key, self.public_key = self.load_or_generate_keys()
+        self._bind_keys()
+        self._load_retired_keys()
+
+    def _bind_keys(self):
+        """按当前密钥对建立签名器（加载或轮换后调用）"""
+        self.sm2_crypt = FastCryptSM2(public_key=self.public_key, private_key=self.private_key)
 
     def load_or_generate_keys(self):
         """加载SM2密钥对，无则生成并保存（替换原RSA密钥加载）"""
         # 确保app目录存在
         if not os.path.exists("app"):
             os.makedirs("app")
+        if not os.path.exists("app/sm2_private_key.pem"):
+            # 生成新密钥对（替换原RSA密钥生成）
+            logger.info("SM2密钥文件不存在，生成新密钥对")
+            self.generate_keys()
+            logger.info("✅ SM2新密钥对已生成并保存")
+            return self.private_key, self.public_key
+        # 读取SM2私钥；文件有问题时报错而不是换新密钥（换密钥会使已签发的令牌全部失效）
+        with open("app/sm2_private_key.pem", "r", encoding="utf-8") as f:
+            private_key = f.read().strip()
+        public_key = derive_public_key(private_key)
         try:
-            # 读取SM2私钥/公钥文件
-            with open("app/sm2_private_key.pem", "r", encoding="utf-8") as f:
-                private_key = f.read().strip()
             with open("app/sm2_public_key.pem", "r", encoding="utf-8") as f:
-                public_key = f.read().strip()
-            # 验证密钥有效性
-            self.sm2_crypt.set_private_key(private_key)
-            self.sm2_crypt.set_public_key(public_key)
-            logger.info("✅ SM2密钥对加载成功")
-            return private_key, public_key
-        except Exception as e:
-            logger.error(f"❌ SM2密钥加载失败：{e}，生成新密钥对")
-            # 生成新密钥对（替换原RSA密钥生成）
-            private_key = self.sm2_crypt.generate_private_key()
-            public_key = self.sm2_crypt.generate_public_key(private_key)
-            # 保存密钥到文件
-            with open("app/sm2_private_key.pem", "w", encoding="utf-8") as f:
-                f.write(private_key)
+                stored_public = f.read().strip()
+        except FileNotFoundError:
+            stored_public = None
+        if stored_public != public_key:
             with open("app/sm2_public_key.pem", "w", encoding="utf-8") as f:
                 f.write(public_key)
-            logger.info("✅ SM2新密钥对已生成并保存")
-            return private_key, public_key
+            logger.warning("⚠️ SM2公钥文件缺失或与私钥不匹配，已按私钥重新派生")
+        logger.info("✅ SM2密钥对加载成功")
+        return private_key, public_key
 
     def encrypt(self, plain_text):
         """SM2公钥加密（替换原RSA加密，方法名/入参/出参完全一致）"""
         if not isinstance(plain_text, str):
             plain_text = str(plain_text)
-        self.sm2_crypt.set_public_key(self.public_key)
-        # 国密SM2加密（C1C2C3模式）
-        cipher_bytes = self.sm2_crypt.encrypt(plain_text.encode("utf-8"), mode=1)
+        # 国密SM2加密（C1C3C2，即 gmssl mode=1）；计算卸载池已启用时交给子进程
+        executor = get_crypto_executor()
+        if executor is not None:
+            cipher_bytes = executor.encrypt(self.public_key, plain_text.encode("utf-8"), C1C3C2)
+        else:
+            cipher_bytes = sm2_encrypt(self.public_key, plain_text.encode("utf-8"), C1C3C2)
         return base64.b64encode(cipher_bytes).decode("utf-8")
 
     def decrypt(self, cipher_base64):
         """SM2私钥解密（替换原RSA解密，方法名/入参/出参完全一致）"""
-        self.sm2_crypt.set_private_key(self.private_key)
-        # Base64解码→SM2解密
+        # Base64解码→SM2解密（C3 校验失败抛 ValueError）
         cipher_bytes = base64.b64decode(cipher_base64)
-        plain_bytes = self.sm2_crypt.decrypt(cipher_bytes, mode=1)
+        executor = get_crypto_executor()
+        if executor is not None:
+            plain_bytes = executor.decrypt(self.private_key, cipher_bytes, C1C3C2)
+        else:
+            plain_bytes = sm2_decrypt(self.private_key, cipher_bytes, C1C3C2)
         return plain_bytes.decode("utf-8")
 
     def sign(self, data):
         """SM2签名（替换原RSA签名，用于JWT）"""
         if not isinstance(data, str):
             data = str(data)
-        self.sm2_crypt.set_private_key(self.private_key)
-        # 生成随机数（SM2签名必需）
-        random_hex = hex(random.randint(1, 10 ** 64))[2:]
-        sign_bytes = self.sm2_crypt.sign(data.encode("utf-8"), random_hex)
-        return base64.b64encode(sign_bytes).decode("utf-8")
+        # 随机数 k 取自 secrets（SM2签名必需）；r 或 s 退化时换 k 重签
+        sign_hex = None
+        while sign_hex is None:
+            sign_hex = self.sm2_crypt.sign(data.encode("utf-8"), "%064x" % (secrets.randbelow(N - 1) + 1))
+        return base64.b64encode(sign_hex.encode("ascii")).decode("utf-8")
+
+    def _verifier(self, public_key):
+        verifier = self._verifiers.get(public_key)
+        if verifier is None:
+            register_public_key(public_key)
+            verifier = FastCryptSM2(private_key=None, public_key=public_key)
+            self._verifiers[public_key] = verifier
+        return verifier
+
+    def _load_retired_keys(self):
+        """从轮换备份文件恢复仍在宽限期内的旧公钥，进程重启后旧令牌照常验签"""
+        if not os.path.isdir("app"):
+            return
+        now = time.time()
+        for name in os.listdir("app"):
+            match = _SM2_BACKUP_PATTERN.match(name)
+            if not match:
+                continue
+            retire_at = datetime.strptime(match.group(1), "%Y%m%d%H%M%S").timestamp() + SM2_KEY_ROTATION_GRACE
+            if retire_at < now:
+                continue
+            with open(os.path.join("app", name), "r", encoding="utf-8") as f:
+                self.retired_keys.append((f.read().strip(), retire_at))
 
     def verify(self, data, sign_base64):
-        """SM2验签（替换原RSA验签，用于JWT）"""
+        """SM2验签（替换原RSA验签，用于JWT）：先用当前公钥，失败再试宽限期内的退役公钥"""
         if not isinstance(data, str):
             data = str(data)
-        self.sm2_crypt.set_public_key(self.public_key)
         sign_bytes = base64.b64decode(sign_base64)
-        return self.sm2_crypt.verify(sign_bytes, data.encode("utf-8"))
+        data_bytes = data.encode("utf-8")
+        if self._verifier(self.public_key).verify(sign_bytes, data_bytes):
+            return True
+        now = time.time()
+        self.retired_keys = [(key, retire_at) for key, retire_at in self.retired_keys if retire_at >= now]
+        return any(self._verifier(key).verify(sign_bytes, data_bytes) for key, _ in self.retired_keys)
 
     def encrypt_large_data(self, info):
         """SM2分片加密（替换原RSA分片加密，方法名/逻辑一致）"""
@@ -185,11 +336,15 @@ class SM2Service:
         return "".join(decrypted_chunks)
 
     def rotate_keys(self):
-        """SM2密钥轮换（替换原RSA密钥轮换，逻辑一致）"""
+        """
+        SM2密钥轮换（替换原RSA密钥轮换，逻辑一致）：新令牌改用新密钥签名，
+        旧公钥在 SM2_KEY_ROTATION_GRACE 秒内继续验签，已签发的令牌不会集中失效
+        """
         old_private = self.private_key
         old_public = self.public_key
         # 生成新密钥
         self.generate_keys()
+        self.retired_keys.append((old_public, time.time() + SM2_KEY_ROTATION_GRACE))
         # 备份旧密钥
         backup_suffix = datetime.now().strftime("%Y%m%d%H%M%S")
         with open(f"app/sm2_private_key_backup_{backup_suffix}.pem", "w", encoding="utf-8") as f:
@@ -200,12 +355,13 @@ class SM2Service:
 
     def generate_keys(self):
         """独立生成SM2密钥对（兼容原RSA方法名）"""
-        self.private_key = self.sm2_crypt.generate_private_key()
-        self.public_key = self.sm2_crypt.generate_public_key(self.private_key)
+        self.private_key = secrets.token_hex(32)
+        self.public_key = derive_public_key(self.private_key)
         with open("app/sm2_private_key.pem", "w", encoding="utf-8") as f:
             f.write(self.private_key)
         with open("app/sm2_public_key.pem", "w", encoding="utf-8") as f:
             f.write(self.public_key)
+        self._bind_keys()
 
 
 # ================= SM3 哈希算法（替换SHA256） =================
@@ -218,7 +374,7 @@ class SM3Service:
         # 拼接盐值（保留原加盐逻辑）
         data_with_salt = f"{data}{salt}"
         # 国密SM3哈希计算
-        return sm3.sm3_hash(data_with_salt.encode("utf-8"))
+        return SM3(data_with_salt.encode("utf-8")).hexdigest()
 
     @staticmethod
     def verify_hash(plain_data, hash_value, salt=""):
@@ -231,7 +387,7 @@ class SM4Service:
     def __init__(self, key=None):
         # SM4密钥固定16字节（国密标准）
         self.key = key if key else bytes(random.choices(range(256), k=16))
-        self.sm4_crypt = sm4.CryptSM4()
+        self.sm4_crypt = SM4Cipher()
 
     def encrypt(self, plain_text, iv=None):
         """SM4-CBC加密（补充对称加密能力）"""
@@ -270,9 +426,9 @@ class SM2JWTService:
         self.sm2 = SM2Service()  # 替换原RSA依赖
         self.expire_access = 2 * 3600  # 保留原过期时间
         self.expire_refresh = 7 * 24 * 3600
-        # 保留原Token黑名单/缓存逻辑
-        self.token_blacklist = set()
-        self.refresh_token_cache = {}
+        # Token黑名单/刷新token缓存：条目在对应token过期后自动清除
+        self.token_blacklist = ExpiringTokenStore()
+        self.refresh_token_cache = ExpiringTokenStore()
 
     def generate_token(self, username, role):
         """生成SM2签名的JWT（替换原RS256-JWT，返回格式一致）"""
@@ -302,11 +458,11 @@ class SM2JWTService:
         access_token = f"{base64.b64encode(access_payload_str.encode()).decode()}.{access_sign}"
         refresh_token = f"{base64.b64encode(refresh_payload_str.encode()).decode()}.{refresh_sign}"
         # 缓存刷新token（保留原逻辑）
-        self.refresh_token_cache[refresh_payload["jti"]] = {
+        self.refresh_token_cache.add(refresh_payload["jti"], refresh_payload["exp"], {
             "username": username,
             "exp": refresh_payload["exp"],
             "token": refresh_token
-        }
+        })
         return {"access_token": access_token, "refresh_token": refresh_token}
 
     def verify_token(self, token):
@@ -363,10 +519,10 @@ class SM2JWTService:
             payload_base64, _ = token.split(".", 1)
             payload_str = base64.b64decode(payload_base64).decode("utf-8")
             payload = json.loads(payload_str)
-            self.token_blacklist.add(token)
+            self.token_blacklist.add(token, payload.get("exp", int(time.time()) + self.expire_refresh))
             # 清理刷新token缓存
             if payload.get("jti") in self.refresh_token_cache:
-                del self.refresh_token_cache[payload["jti"]]
+                self.refresh_token_cache.discard(payload["jti"])
             logger.info(f"Token {payload['jti']} 已加入黑名单")
             return True
         except Exception as e:
@@ -501,30 +657,30 @@ class DataSecurityService:
     def create_user(self, username, password, phone, role="buyer", email=None):
         """创建用户（保留原逻辑，加密算法替换为SM2/SM3）"""
         try:
-            db = next(get_db_session())
-            # 检查用户是否已存在
-            existing_user = db.query(User).filter(User.username == username).first()
-            if existing_user:
-                return False, "❌ 用户名已存在"
-            # 密码哈希（SM3）
-            password_hash = self.hash_password(password)
-            # 加密手机号/邮箱（SM2）
-            phone_encrypted = self.sm2.encrypt(phone)
-            email_encrypted = self.sm2.encrypt(email) if email else None
-            # 创建用户
-            new_user = User(
-                username=username,
-                password_hash=password_hash,
-                phone=phone,
-                phone_encrypted=phone_encrypted,
-                email=email,
-                email_encrypted=email_encrypted,
-                role=role
-            )
-            db.add(new_user)
-            db.commit()
-            logger.info(f"✅ 用户 {username} 创建成功")
-            return True, "✅ 用户创建成功"
+            with session_scope() as db:
+                # 检查用户是否已存在
+                existing_user = db.query(User).filter(User.username == username).first()
+                if existing_user:
+                    return False, "❌ 用户名已存在"
+                # 密码哈希（SM3）
+                password_hash = self.hash_password(password)
+                # 加密手机号/邮箱（SM2）
+                phone_encrypted = self.sm2.encrypt(phone)
+                email_encrypted = self.sm2.encrypt(email) if email else None
+                # 创建用户
+                new_user = User(
+                    username=username,
+                    password_hash=password_hash,
+                    phone=phone,
+                    phone_encrypted=phone_encrypted,
+                    email=email,
+                    email_encrypted=email_encrypted,
+                    role=role
+                )
+                db.add(new_user)
+                db.commit()
+                logger.info(f"✅ 用户 {username} 创建成功")
+                return True, "✅ 用户创建成功"
         except Exception as e:
             logger.error(f"创建用户失败：{e}")
             return False, f"❌ 创建用户失败：{str(e)}"
@@ -532,33 +688,33 @@ class DataSecurityService:
     def user_login(self, username, password):
         """用户登录（保留原逻辑，加密算法替换为SM2/SM3/SM2-JWT）"""
         try:
-            db = next(get_db_session())
-            user = db.query(User).filter(User.username == username).first()
-            if not user:
-                return False, "❌ 用户名不存在"
-            # 检查账号是否锁定
-            if user.is_locked:
-                return False, "❌ 账号已被锁定，请联系管理员"
-            # 防暴力破解：失败次数超过5次，锁定10分钟
-            current_time = time.time()
-            if user.fail_count >= 5 and (current_time - user.last_fail_time) < 600:
-                return False, "❌ 登录失败次数过多，请10分钟后再试"
-            # 重置失败次数超时
-            if user.fail_count >= 5 and (current_time - user.last_fail_time) >= 600:
+            with session_scope() as db:
+                user = db.query(User).filter(User.username == username).first()
+                if not user:
+                    return False, "❌ 用户名不存在"
+                # 检查账号是否锁定
+                if user.is_locked:
+                    return False, "❌ 账号已被锁定，请联系管理员"
+                # 防暴力破解：失败次数超过5次，锁定10分钟
+                current_time = time.time()
+                if user.fail_count >= 5 and (current_time - user.last_fail_time) < 600:
+                    return False, "❌ 登录失败次数过多，请10分钟后再试"
+                # 重置失败次数超时
+                if user.fail_count >= 5 and (current_time - user.last_fail_time) >= 600:
+                    user.fail_count = 0
+                    db.commit()
+                # 验证密码（SM3）
+                if not self.verify_password(password, user.password_hash):
+                    user.fail_count += 1
+                    user.last_fail_time = current_time
+                    db.commit()
+                    return False, f"❌ 密码错误，剩余尝试次数：{5 - user.fail_count}"
+                # 登录成功，重置失败次数
                 user.fail_count = 0
                 db.commit()
-            # 验证密码（SM3）
-            if not self.verify_password(password, user.password_hash):
-                user.fail_count += 1
-                user.last_fail_time = current_time
-                db.commit()
-                return False, f"❌ 密码错误，剩余尝试次数：{5 - user.fail_count}"
-            # 登录成功，重置失败次数
-            user.fail_count = 0
-            db.commit()
-            # 生成SM2-JWT令牌（替换原RS256-JWT）
-            tokens = self.sm2_jwt.generate_token(username, user.role)
-            return True, tokens
+                # 生成SM2-JWT令牌（替换原RS256-JWT）
+                tokens = self.sm2_jwt.generate_token(username, user.role)
+                return True, tokens
         except Exception as e:
             logger.error(f"用户登录失败：{e}")
             return False, f"❌ 登录失败：{str(e)}"
@@ -573,27 +729,27 @@ class DataSecurityService:
         if payload["username"] != username and payload["role"] != "admin":
             return False, "❌ 无权限访问该用户信息"
         # 查询用户
-        db = next(get_db_session())
-        user = db.query(User).filter(User.username == username).first()
-        if not user:
-            return False, "❌ 用户不存在"
-        # 脱敏返回
-        phone_desensitized = f"{user.phone[:3]}****{user.phone[-4:]}"
-        email_desensitized = None
-        if user.email:
-            email_parts = user.email.split("@")
-            if len(email_parts) == 2:
-                email_desensitized = f"{email_parts[0][:2]}****@{email_parts[1]}"
-        # 构造返回数据
-        user_info = {
-            "username": user.username,
-            "role": user.role,
-            "phone": phone_desensitized,
-            "email": email_desensitized,
-            "create_time": user.create_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "is_active": user.is_active
-        }
-        return True, user_info
+        with session_scope() as db:
+            user = db.query(User).filter(User.username == username).first()
+            if not user:
+                return False, "❌ 用户不存在"
+            # 脱敏返回
+            phone_desensitized = f"{user.phone[:3]}****{user.phone[-4:]}"
+            email_desensitized = None
+            if user.email:
+                email_parts = user.email.split("@")
+                if len(email_parts) == 2:
+                    email_desensitized = f"{email_parts[0][:2]}****@{email_parts[1]}"
+            # 构造返回数据
+            user_info = {
+                "username": user.username,
+                "role": user.role,
+                "phone": phone_desensitized,
+                "email": email_desensitized,
+                "create_time": user.create_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "is_active": user.is_active
+            }
+            return True, user_info
 
     def add_user_address(self, username, token, receiver, phone, province, city, district, detail, is_default=False):
         """添加用户地址（保留原逻辑，加密算法替换为SM2）"""
@@ -607,26 +763,26 @@ class DataSecurityService:
         phone_encrypted = self.sm2.encrypt(phone)
         # 添加地址
         try:
-            db = next(get_db_session())
-            # 取消原有默认地址
-            if is_default:
-                db.query(Address).filter(Address.username == username, Address.is_default == True).update(
-                    {Address.is_default: False})
-            # 创建新地址
-            new_address = Address(
-                username=username,
-                receiver=receiver,
-                phone=phone,
-                phone_encrypted=phone_encrypted,
-                province=province,
-                city=city,
-                district=district,
-                detail=detail,
-                is_default=is_default
-            )
-            db.add(new_address)
-            db.commit()
-            return True, "✅ 地址添加成功"
+            with session_scope() as db:
+                # 取消原有默认地址
+                if is_default:
+                    db.query(Address).filter(Address.username == username, Address.is_default == True).update(
+                        {Address.is_default: False})
+                # 创建新地址
+                new_address = Address(
+                    username=username,
+                    receiver=receiver,
+                    phone=phone,
+                    phone_encrypted=phone_encrypted,
+                    province=province,
+                    city=city,
+                    district=district,
+                    detail=detail,
+                    is_default=is_default
+                )
+                db.add(new_address)
+                db.commit()
+                return True, "✅ 地址添加成功"
         except Exception as e:
             logger.error(f"添加地址失败：{e}")
             return False, f"❌ 添加地址失败：{str(e)}"
@@ -649,29 +805,29 @@ class DataSecurityService:
         receiver_address_encrypted = self.sm2.encrypt(receiver_address)
         # 创建订单
         try:
-            db = next(get_db_session())
-            new_order = Order(
-                order_id=order_id,
-                username=username,
-                total_amount=total_amount,
-                status="pending",
-                receiver_phone_encrypted=receiver_phone_encrypted,
-                receiver_address_encrypted=receiver_address_encrypted
-            )
-            db.add(new_order)
-            # 添加订单项
-            for item in order_items:
-                order_item = OrderItem(
+            with session_scope() as db:
+                new_order = Order(
                     order_id=order_id,
-                    product_id=item["product_id"],
-                    product_name=item["product_name"],
-                    product_price=item["price"],
-                    quantity=item["quantity"],
-                    subtotal=item["quantity"] * item["price"]
+                    username=username,
+                    total_amount=total_amount,
+                    status="pending",
+                    receiver_phone_encrypted=receiver_phone_encrypted,
+                    receiver_address_encrypted=receiver_address_encrypted
                 )
-                db.add(order_item)
-            db.commit()
-            return True, {"order_id": order_id, "total_amount": total_amount}
+                db.add(new_order)
+                # 添加订单项
+                for item in order_items:
+                    order_item = OrderItem(
+                        order_id=order_id,
+                        product_id=item["product_id"],
+                        product_name=item["product_name"],
+                        product_price=item["price"],
+                        quantity=item["quantity"],
+                        subtotal=item["quantity"] * item["price"]
+                    )
+                    db.add(order_item)
+                db.commit()
+                return True, {"order_id": order_id, "total_amount": total_amount}
         except Exception as e:
             logger.error(f"创建订单失败：{e}")
             return False, f"❌ 创建订单失败：{str(e)}"
@@ -693,26 +849,26 @@ class DataSecurityService:
             alipay_account_encrypted = self.sm2.encrypt(sensitive_info["alipay_account"])
         # 记录支付
         try:
-            db = next(get_db_session())
-            # 更新订单状态
-            order = db.query(Order).filter(Order.order_id == order_id).first()
-            if not order:
-                return False, "❌ 订单不存在"
-            order.status = "paid"
-            order.pay_time = datetime.now()
-            # 创建支付记录
-            new_payment = Payment(
-                order_id=order_id,
-                username=username,
-                pay_amount=pay_amount,
-                pay_method=pay_method,
-                card_number_encrypted=card_number_encrypted,
-                alipay_account_encrypted=alipay_account_encrypted,
-                transaction_id=sensitive_info.get("transaction_id") if sensitive_info else None
-            )
-            db.add(new_payment)
-            db.commit()
-            return True, "✅ 支付记录成功"
+            with session_scope() as db:
+                # 更新订单状态
+                order = db.query(Order).filter(Order.order_id == order_id).first()
+                if not order:
+                    return False, "❌ 订单不存在"
+                order.status = "paid"
+                order.pay_time = datetime.now()
+                # 创建支付记录
+                new_payment = Payment(
+                    order_id=order_id,
+                    username=username,
+                    pay_amount=pay_amount,
+                    pay_method=pay_method,
+                    card_number_encrypted=card_number_encrypted,
+                    alipay_account_encrypted=alipay_account_encrypted,
+                    transaction_id=sensitive_info.get("transaction_id") if sensitive_info else None
+                )
+                db.add(new_payment)
+                db.commit()
+                return True, "✅ 支付记录成功"
         except Exception as e:
             logger.error(f"记录支付失败：{e}")
             return False, f"❌ 记录支付失败：{str(e)}"
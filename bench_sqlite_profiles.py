@@ -0,0 +1,165 @@
+"""
+SQLite 引擎配置基准：oltp / bulk-load / read-only-replica 在下单与登录两类负载上的吞吐与延迟对比
+运行：python bench_sqlite_profiles.py [每项秒数] [线程数]
+
+- 下单：一个事务写入订单和 3 条订单项（与 DataSecurityService.create_order 的写入一致，不含 SM2 加密）；
+- 登录：按用户名查询用户，约 10% 密码错误时更新失败计数（只读副本上只做查询）；
+- 每个配置使用独立的临时数据库，预置同样的用户数据；
+- 最后在只读副本配置上对比不同连接池类型的登录查询（见 SQLite_Profiles 中连接池类型的说明）。
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, SingletonThreadPool
+from app.services.SQLite_Profiles import SQLITE_PROFILES, apply_sqlite_profile, create_sqlite_engine
+from app.services.数据安全层访问 import Base, Order, OrderItem, User
+
+SEED_USERS = 2000
+LOGIN_FAIL_RATIO = 0.1
+# 只读副本上参与对比的其他连接池类型（配置本身的 QueuePool 作为基线）
+POOL_CANDIDATES = {
+    "NullPool": {"poolclass": NullPool},
+    "SingletonThreadPool": {"poolclass": SingletonThreadPool, "pool_size": 64},
+}
+
+
+def seed(db_path):
+    engine = create_sqlite_engine(db_path, "bulk-load")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add_all(
+            User(
+                username=f"user{i}",
+                password_hash="0" * 64,
+                phone="13800000000",
+                phone_encrypted="x" * 120,
+            )
+            for i in range(SEED_USERS)
+        )
+        db.commit()
+    engine.dispose()
+
+
+def create_order(Session, worker, seq):
+    order_id = f"ORD{worker:03d}{seq:012d}"
+    with Session() as db:
+        db.add(Order(
+            order_id=order_id,
+            username=f"user{seq % SEED_USERS}",
+            total_amount=297.0,
+            status="pending",
+            receiver_phone_encrypted="x" * 120,
+            receiver_address_encrypted="y" * 300,
+        ))
+        for i in range(3):
+            db.add(OrderItem(
+                order_id=order_id,
+                product_id=f"P{i}",
+                product_name=f"商品{i}",
+                product_price=99.0,
+                quantity=1,
+                subtotal=99.0,
+            ))
+        db.commit()
+
+
+def login(Session, read_only):
+    username = f"user{random.randrange(SEED_USERS)}"
+    with Session() as db:
+        user = db.query(User).filter(User.username == username).first()
+        if user is not None and not read_only and random.random() < LOGIN_FAIL_RATIO:
+            user.fail_count = (user.fail_count or 0) + 1
+            user.last_fail_time = time.time()
+            db.commit()
+
+
+def run(fn, threads, seconds):
+    """多线程在给定时长内反复执行 fn(worker, seq)，返回 (每秒次数, p50 毫秒, p99 毫秒, 错误数)"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        local = []
+        seq = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                fn(index, seq)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+            local.append(time.perf_counter() - started)
+            seq += 1
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    count = len(latencies)
+    if not count:
+        return 0.0, 0.0, 0.0, errors[0]
+    return (
+        count / elapsed,
+        latencies[count // 2] * 1000,
+        latencies[min(count - 1, int(count * 0.99))] * 1000,
+        errors[0],
+    )
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    workdir = tempfile.mkdtemp(prefix="bench_sqlite_")
+    print(f"每项 {seconds:.1f} 秒，{threads} 个线程，预置 {SEED_USERS} 个用户")
+    print("=" * 78)
+    print(f"{'配置':<20}{'负载':<8}{'次/秒':>12}{'p50 ms':>12}{'p99 ms':>12}{'错误':>8}")
+    print("-" * 78)
+    try:
+        for profile in SQLITE_PROFILES:
+            db_path = os.path.join(workdir, f"{profile}.db")
+            seed(db_path)
+            engine = create_sqlite_engine(db_path, profile)
+            Session = sessionmaker(bind=engine, expire_on_commit=False)
+            read_only = SQLITE_PROFILES[profile]["pragmas"].get("query_only") == "ON"
+            workloads = [("登录", lambda w, s: login(Session, read_only))]
+            if not read_only:
+                workloads.insert(0, ("下单", lambda w, s: create_order(Session, w, s)))
+            for name, fn in workloads:
+                ops, p50, p99, errors = run(fn, threads, seconds)
+                print(f"{profile:<20}{name:<8}{ops:>12.1f}{p50:>12.3f}{p99:>12.3f}{errors:>8}")
+            engine.dispose()
+        print("-" * 78)
+        profile = "read-only-replica"
+        db_path = os.path.join(workdir, f"{profile}.db")
+        candidates = [(SQLITE_PROFILES[profile]["poolclass"].__name__, None)] + list(POOL_CANDIDATES.items())
+        for pool_name, options in candidates:
+            if options is None:
+                engine = create_sqlite_engine(db_path, profile)
+            else:
+                engine = apply_sqlite_profile(create_engine(f"sqlite:///{db_path}", **options), profile)
+            Session = sessionmaker(bind=engine, expire_on_commit=False)
+            ops, p50, p99, errors = run(lambda w, s: login(Session, True), threads, seconds)
+            print(f"{pool_name:<20}{'登录':<8}{ops:>12.1f}{p50:>12.3f}{p99:>12.3f}{errors:>8}")
+            engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+批量导入用户（命令行）：
+    python import_users.py users.ndjson
+    python import_users.py users.csv --workers 4 --chunk-size 2000
+
+NDJSON 每行一个 {"username": ..., "password": ..., "phone": ...}；CSV 首行为表头 username,password,phone。
+手机号 SM2 加密在多个进程上并行，密码走批量 SM3，每批在一个事务内写入 user.db。
+"""
+import argparse
+import json
+import sys
+
+from app.services.Crypto_Executor import disable_crypto_executor, enable_crypto_executor
+from app.services.SM2_Utils import SM2Service
+from app.services.user_service import BULK_CHUNK_SIZE, iter_user_records, user_service
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量导入用户")
+    parser.add_argument("path", help="NDJSON 或 CSV 文件，- 表示标准输入")
+    parser.add_argument("--format", choices=("ndjson", "csv"), help="默认按扩展名判断")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE, help="每个事务写入的行数")
+    parser.add_argument("--workers", type=int, default=None, help="加密进程数，默认 CPU 核数，0 为不启用")
+    parser.add_argument("--report", help="把完整导入报告（JSON）写入该文件")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    sm2_service = SM2Service()
+    if args.workers != 0:
+        enable_crypto_executor(args.workers, [sm2_service.public_key])
+    try:
+        if args.path == "-":
+            report = user_service.bulk_import(iter_user_records(sys.stdin, fmt), sm2_service, args.chunk_size)
+        else:
+            with open(args.path, "r", encoding="utf-8-sig", newline="") as f:
+                report = user_service.bulk_import(iter_user_records(f, fmt), sm2_service, args.chunk_size)
+    finally:
+        disable_crypto_executor()
+
+    print(f"✅ 导入完成: 共 {report['total']} 行，成功 {report['imported']}，失败 {report['failed']}")
+    for error in report["errors"][:20]:
+        print(f"⚠️ 第 {error['line']} 行 {error['username'] or ''}: {error['msg']}")
+    if len(report["errors"]) > 20:
+        print(f"⚠️ 其余 {len(report['errors']) - 20} 条错误见 --report 输出")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
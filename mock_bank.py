@@ -10,12 +10,15 @@ import os
 import time
 import secrets
 from datetime import datetime, timedelta
-from gmssl.sm2 import CryptSM2, default_ecc_table
-from gmssl.sm3 import sm3_hash as _gmssl_sm3_hash, bytes_to_list
-from gmssl.sm4 import CryptSM4, SM4_ENCRYPT, SM4_DECRYPT
+from gmssl.sm4 import SM4_ENCRYPT, SM4_DECRYPT
 import base64
 import json
 import threading
+from app.services.SM3_Service import SM3
+from app.services.SM2_Curve import derive_public_key, register_public_key
+from app.services.SM2_Cipher import C1C3C2, encrypt as sm2_encrypt
+from app.services.SM4_Backend import SM4Cipher
+from app.services.SQLite_Pool import get_pool
 
 app = Flask(__name__)
 CORS(app)
@@ -83,11 +86,8 @@ def load_bank_keys():
             return
     
     # 生成新密钥对
-    para = len(default_ecc_table["n"])
     private_key = secrets.token_hex(32)
-    placeholder = "0" * (2 * para)
-    tmp = CryptSM2(private_key=private_key, public_key=placeholder)
-    public_key = tmp._kg(int(private_key, 16), tmp.ecc_table["g"])
+    public_key = derive_public_key(private_key)
     
     BANK_PRIVATE_KEY = private_key
     BANK_PUBLIC_KEY = public_key
@@ -118,6 +118,8 @@ def load_ecommerce_public_key():
                 if len(lines) >= 2:
                     ECOMMERCE_PUBLIC_KEY = lines[1]  # 第二行是公钥
                     print(f"✅ 已加载电商公钥: {ECOMMERCE_PUBLIC_KEY[:50]}...")
+                    # 商户公钥长期使用：预建固定基表供验签与数字信封加密
+                    register_public_key(ECOMMERCE_PUBLIC_KEY)
                     return
             except Exception as e:
                 print(f"⚠️ 读取 {key_file} 失败: {e}")
@@ -129,7 +131,7 @@ def sm3_hash(data):
     """SM3 哈希"""
     if isinstance(data, str):
         data = data.encode("utf-8")
-    return _gmssl_sm3_hash(bytes_to_list(data))
+    return SM3(data).hexdigest()
 
 
 def verify_signature(order_id, amount, merchant_id, timestamp, signature):
@@ -170,7 +172,7 @@ def encrypt_with_digital_envelope(result_data):
         padding_len = block_size - (len(result_json) % block_size)
         padded_data = result_json + bytes([padding_len] * padding_len)
         
-        sm4 = CryptSM4()
+        sm4 = SM4Cipher()
         sm4.set_key(sm4_key, SM4_ENCRYPT)
         ciphertext = sm4.crypt_cbc(iv, padded_data)
         
@@ -178,10 +180,7 @@ def encrypt_with_digital_envelope(result_data):
         if not ECOMMERCE_PUBLIC_KEY:
             raise ValueError("未配置电商公钥，无法加密")
         
-        para = len(default_ecc_table["n"])
-        sm2 = CryptSM2(private_key="", public_key=ECOMMERCE_PUBLIC_KEY.lstrip("04"), mode=1)
-        
-        encrypted_sm4_key = sm2.encrypt(sm4_key)
+        encrypted_sm4_key = sm2_encrypt(ECOMMERCE_PUBLIC_KEY, sm4_key, C1C3C2)
         
         # 4. 组装返回数据（全部转 hex 字符串）
         envelope = {
@@ -208,21 +207,17 @@ def is_timestamp_valid(timestamp, validity_minutes=5):
 
 def is_order_processed(order_no):
     """检查订单是否已处理（防重放）"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT 1 FROM replay_protection WHERE order_no = ?", (order_no,))
-    result = cursor.fetchone()
-    conn.close()
-    return result is not None
+    with get_pool(DB_PATH).connection() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM replay_protection WHERE order_no = ?", (order_no,)
+        ).fetchone()
+    return row is not None
 
 
 def mark_order_processed(order_no):
     """标记订单已处理"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("INSERT OR IGNORE INTO replay_protection (order_no) VALUES (?)", (order_no,))
-    conn.commit()
-    conn.close()
+    with get_pool(DB_PATH).connection() as conn:
+        conn.execute("INSERT OR IGNORE INTO replay_protection (order_no) VALUES (?)", (order_no,))
 
 
 PAYMENT_PAGE_HTML = """
@@ -600,14 +595,11 @@ def process_payment():
         transaction_id = f"TXN{int(time.time())}{secrets.token_hex(4)}"
         
         # 保存交易记录
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO transactions (id, order_no, amount, merchant_id, timestamp, status, paid_at)
-            VALUES (?, ?, ?, ?, ?, 'completed', ?)
-        """, (transaction_id, order_id, amount, merchant_id, timestamp, datetime.utcnow()))
-        conn.commit()
-        conn.close()
+        with get_pool(DB_PATH).connection() as conn:
+            conn.execute("""
+                INSERT INTO transactions (id, order_no, amount, merchant_id, timestamp, status, paid_at)
+                VALUES (?, ?, ?, ?, ?, 'completed', ?)
+            """, (transaction_id, order_id, amount, merchant_id, timestamp, datetime.utcnow()))
         
         print(f"✅ 支付成功 - 订单: {order_id}, 交易号: {transaction_id}, 金额: {amount}")
         
@@ -1,17 +1,27 @@
 """主函数：初始化服务并启动多线程运行Flask和命令行菜单"""
 import threading
-from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from flask import Flask
 from flask_cors import CORS
 from app.api import init_api
 from app.services.SM2_Utils import SM2Service
 from app.services.SM4_Utils import SM4Service
+from app.services.SM2_NoncePool import enable_nonce_pool
+from app.services.Crypto_Executor import enable_crypto_executor
 from app.routes._init_ import register_blueprints
 from app.extensions import db
+from app.services.SQLite_Profiles import create_sqlite_engine, init_flask_sqlite
+
+# SM2 签名临时密钥池容量与补充水位（容量设为 0 则不启用）
+SM2_NONCE_POOL_SIZE = 256
+SM2_NONCE_POOL_LOW_WATERMARK = 64
+# SM2/RSA 计算卸载进程数（None 为 CPU 核数，0 则不启用，在请求线程内计算）
+CRYPTO_EXECUTOR_WORKERS = None
+# user.db 的 SQLite 引擎配置：oltp / bulk-load / read-only-replica（见 SQLite_Profiles）
+SQLITE_PROFILE = "oltp"
 
 # ========== 初始化数据库 ==========
-engine = create_engine('sqlite:///user.db')
+engine = create_sqlite_engine('user.db', SQLITE_PROFILE)
 Base = declarative_base()
 
 # ========== 初始化Flask应用 ==========
@@ -22,7 +32,7 @@ app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///user.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # 初始化 SQLAlchemy
-db.init_app(app)
+init_flask_sqlite(app, db, SQLITE_PROFILE)
 
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 init_api(app)
@@ -34,6 +44,15 @@ def init_crypto_services():
     # 预加载SM2/SM4密钥（首次运行自动生成）
     sm2_service = SM2Service()
     sm4_service = SM4Service()
+    # 计算卸载池须在临时密钥池线程和 Flask 线程之前建立（fork 时进程内只有主线程）
+    if CRYPTO_EXECUTOR_WORKERS != 0:
+        from app.services.JWT_SM2_Utils import jwt_service
+        public_keys = [sm2_service.public_key] + jwt_service.keyring.public_keys()
+        executor = enable_crypto_executor(CRYPTO_EXECUTOR_WORKERS, public_keys)
+        print(f"✅ 国密计算卸载池已启动（{executor.max_workers} 个进程）")
+    # SM2 签名临时密钥池：后台预计算 (k, k·G)，登录/签发令牌时直接取用
+    if SM2_NONCE_POOL_SIZE > 0:
+        enable_nonce_pool(size=SM2_NONCE_POOL_SIZE, low_watermark=SM2_NONCE_POOL_LOW_WATERMARK)
     print("✅ 国密加密服务初始化成功")
 
 # ========== 初始化电商数据表 ==========
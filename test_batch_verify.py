@@ -0,0 +1,157 @@
+"""
+测试 SM2 批量验签：整批通过只做一次组合校验、混入坏签名时二分定位、
+gmssl / 第三方（R 的 y 为奇数）签名不进整批方程而直接逐个验签，以及 SM2Service.verify_many 与逐个 verify 结果一致
+"""
+import os
+import secrets
+import tempfile
+
+from gmssl.sm2 import CryptSM2
+
+from app.services import SM2_Curve
+from app.services.SM2_Curve import N, base_mul, derive_public_key, sign_digest, verify_batch, verify_signature
+from app.services.SM2_Utils import SM2Service
+
+
+def _keypair():
+    d = secrets.randbelow(N - 1) + 1
+    return d, derive_public_key("%064x" % d)
+
+
+def _sign(d, e):
+    rs = None
+    while rs is None:
+        rs = sign_digest(d, e, secrets.randbelow(N - 1) + 1)
+    return rs
+
+
+def _sign_raw(d, e):
+    """按标准公式签名、不规范 k 的取向，且特意选 k·G 的 y 为奇数（第三方实现可能产出的签名）"""
+    while True:
+        k = secrets.randbelow(N - 1) + 1
+        q = base_mul(k)
+        if not q[1] & 1:
+            continue
+        r = (e + q[0]) % N
+        s = (pow(d + 1, -1, N) * (k + r) - r) % N
+        if r and r + k != N and s:
+            return r, s
+
+
+def _items(count, keys=3):
+    pairs = [_keypair() for _ in range(keys)]
+    items = []
+    for i in range(count):
+        d, pub = pairs[i % keys]
+        e = int.from_bytes(secrets.token_bytes(32), "big")
+        r, s = _sign(d, e)
+        items.append((pub, r, s, e))
+    return items
+
+
+class _count_single_verifies:
+    """统计批量验签回退到逐个验签的次数"""
+
+    def __enter__(self):
+        self.calls = 0
+        self.original = SM2_Curve.verify_signature
+
+        def counting(*args):
+            self.calls += 1
+            return self.original(*args)
+
+        SM2_Curve.verify_signature = counting
+        return self
+
+    def __exit__(self, *exc):
+        SM2_Curve.verify_signature = self.original
+
+
+def test_valid_batch_needs_no_single_verifies():
+    items = _items(32)
+    with _count_single_verifies() as counter:
+        assert verify_batch(items, normalized=True) == [True] * 32
+    assert counter.calls == 0
+
+
+def test_bad_signatures_located_by_bisection():
+    items = _items(32)
+    bad = {3, 17, 30}
+    for i in bad:
+        pub, r, s, e = items[i]
+        items[i] = (pub, r, s, e ^ 1)
+    with _count_single_verifies() as counter:
+        results = verify_batch(items, normalized=True)
+    assert results == [i not in bad for i in range(32)]
+    assert results == [verify_signature(*item) for item in items]
+    # 二分只在含坏签名的小组里逐个验签
+    assert 0 < counter.calls < 32
+
+
+def test_malformed_items_rejected():
+    items = _items(8)
+    pub, r, s, e = items[0]
+    _, other_pub = _keypair()
+    items += [
+        (pub, 0, s, e),
+        (pub, r, N, e),
+        (pub, r, N - r, e),
+        ("00" * 64, r, s, e),
+        (other_pub, r, s, e),
+    ]
+    assert verify_batch(items, normalized=True) == [True] * 8 + [False] * 5
+    assert verify_batch(items) == [True] * 8 + [False] * 5
+    assert verify_batch([]) == []
+
+
+def test_unnormalized_signatures_verified_singly():
+    d, pub = _keypair()
+    items = []
+    for _ in range(16):
+        e = int.from_bytes(secrets.token_bytes(32), "big")
+        r, s = _sign_raw(d, e)
+        assert verify_signature(pub, r, s, e)
+        items.append((pub, r, s, e))
+    # 默认视为来源未知：每条各验一次，不先做注定失败的整批方程再二分
+    with _count_single_verifies() as counter:
+        assert verify_batch(items) == [True] * 16
+    assert counter.calls == 16
+
+
+def test_gmssl_signatures():
+    d, pub = _keypair()
+    signer = CryptSM2(private_key="%064x" % d, public_key=pub)
+    items = []
+    for i in range(16):
+        data = secrets.token_bytes(32)
+        sig = signer.sign(data, secrets.token_hex(32))
+        items.append((pub, int(sig[:64], 16), int(sig[64:], 16), int.from_bytes(data, "big")))
+    items[5] = items[5][:3] + (items[5][3] ^ 1,)
+    expected = [i != 5 for i in range(16)]
+    assert verify_batch(items) == expected
+    # 误标为规范签名时结果依然准确（只是退化为二分）
+    assert verify_batch(items, normalized=True) == expected
+
+
+def test_mixed_normalized_flags():
+    own = _items(12)
+    d, pub = _keypair()
+    foreign = []
+    for _ in range(4):
+        e = int.from_bytes(secrets.token_bytes(32), "big")
+        foreign.append((pub, *_sign_raw(d, e), e))
+    with _count_single_verifies() as counter:
+        results = verify_batch(own + foreign, [True] * 12 + [False] * 4)
+    assert results == [True] * 16
+    assert counter.calls == 4
+
+
+def test_service_verify_many_matches_verify():
+    service = SM2Service(key_path=os.path.join(tempfile.mkdtemp(prefix="test_batch_verify_"), "sm2_key.txt"))
+    items = [(f"message-{i}", service.sign_compact(f"message-{i}")) for i in range(10)]
+    items[4] = ("tampered", items[4][1])
+    items[7] = (items[7][0], "not-a-signature")
+    expected = [service.verify(data, sig) for data, sig in items]
+    assert expected == [i not in (4, 7) for i in range(10)]
+    assert service.verify_many(items) == expected
+    assert service.verify_many(items, normalized=True) == expected
@@ -0,0 +1,145 @@
+"""
+测试批量导入用户：逐行错误与文件内 / 库内重复、分批写入、CSV 格式、加密或哈希失败只影响所在批次，
+以及启用计算卸载池时加密与密码哈希分摊到子进程
+"""
+import io
+import os
+import tempfile
+
+from app.services import user_service as user_module
+from app.services.Crypto_Executor import disable_crypto_executor, enable_crypto_executor
+from app.services.SM2_Utils import SM2Service
+from app.services.SM3_Service import hash_password
+from app.services.user_service import UserService, iter_user_records
+
+
+class _temp_db:
+    """把 user_service 的 user.db 换成临时库，测试结束后还原"""
+
+    def __enter__(self):
+        self.old = user_module.DB_PATH
+        user_module.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="test_bulk_import_"), "user.db")
+        user_module._ensure_table()
+        return UserService()
+
+    def __exit__(self, *exc):
+        user_module.DB_PATH = self.old
+
+
+def _sm2():
+    return SM2Service(key_path=os.path.join(tempfile.mkdtemp(prefix="test_bulk_import_"), "sm2_key.txt"))
+
+
+def _ndjson(lines):
+    return iter_user_records(io.StringIO("\n".join(lines) + "\n"), "ndjson")
+
+
+def test_line_errors_and_duplicates():
+    with _temp_db() as service:
+        sm2 = _sm2()
+        service.register("bob", "Passw0rd!", "13800000000", "x")
+        report = service.bulk_import(_ndjson([
+            '{"username": "alice", "password": "Passw0rd!", "phone": "13800138000"}',
+            'not json',
+            '["a", "list"]',
+            '{"username": "carol", "password": "", "phone": "13800138001"}',
+            '{"username": "alice", "password": "Other1!", "phone": "13800138002"}',
+            '{"username": "bob", "password": "Passw0rd!", "phone": "13800138003"}',
+        ]), sm2)
+        assert report["total"] == 6
+        assert report["imported"] == 1
+        assert report["failed"] == 5
+        errors = {e["line"]: e["msg"] for e in report["errors"]}
+        assert errors[2].startswith("JSON 解析失败")
+        assert errors[3] == "每行须为 JSON 对象"
+        assert errors[4] == "用户名、密码、手机号不能为空"
+        assert errors[5] == "用户名在导入文件中重复"
+        assert errors[6] == "用户名已存在"
+        assert service.login("alice", "Passw0rd!") is not None
+
+
+def test_chunked_import():
+    with _temp_db() as service:
+        sm2 = _sm2()
+        lines = [
+            f'{{"username": "user{i}", "password": "Pwd{i}!", "phone": "1380000{i:04d}"}}'
+            for i in range(25)
+        ]
+        report = service.bulk_import(_ndjson(lines), sm2, chunk_size=10)
+        assert report == {"total": 25, "imported": 25, "failed": 0, "errors": []}
+        for i in (0, 9, 10, 24):
+            user = service.login(f"user{i}", f"Pwd{i}!")
+            assert user is not None
+            assert sm2.decrypt(user.phone_encrypted) == f"1380000{i:04d}"
+        assert service.login("user3", "wrong") is None
+
+
+def test_csv_import():
+    with _temp_db() as service:
+        sm2 = _sm2()
+        stream = io.StringIO("username,password,phone\r\ndave,Passw0rd!,13800138000\r\nerin,,13800138001\r\n")
+        report = service.bulk_import(iter_user_records(stream, "csv"), sm2)
+        assert report["imported"] == 1
+        assert report["errors"] == [{"line": 3, "username": "erin", "msg": "用户名、密码、手机号不能为空"}]
+
+
+def test_hash_failure_reported_per_row():
+    with _temp_db() as service:
+        sm2 = _sm2()
+        calls = []
+        original = user_module._hash_passwords
+
+        def flaky(passwords):
+            calls.append(len(passwords))
+            if len(calls) == 2:
+                def fail():
+                    raise RuntimeError("worker died")
+                return fail
+            return original(passwords)
+
+        user_module._hash_passwords = flaky
+        try:
+            lines = [
+                f'{{"username": "user{i}", "password": "Pwd{i}!", "phone": "1370000{i:04d}"}}'
+                for i in range(25)
+            ]
+            report = service.bulk_import(_ndjson(lines), sm2, chunk_size=10)
+        finally:
+            user_module._hash_passwords = original
+        # 第二批哈希失败：只有这一批逐行记错，其余批次照常写入
+        assert report["total"] == 25
+        assert report["imported"] == 15
+        assert report["failed"] == 10
+        assert [e["line"] for e in report["errors"]] == list(range(11, 21))
+        assert all(e["msg"] == "密码哈希失败: worker died" for e in report["errors"])
+        assert service.login("user9", "Pwd9!") is not None
+        assert service.get_user_by_username("user10") is None
+        assert service.login("user20", "Pwd20!") is not None
+
+
+def test_import_through_executor():
+    with _temp_db() as service:
+        sm2 = _sm2()
+        executor = enable_crypto_executor(2, [sm2.public_key])
+        try:
+            lines = [
+                f'{{"username": "user{i}", "password": "Pwd{i}!", "phone": "1390000{i:04d}"}}'
+                for i in range(40)
+            ]
+            report = service.bulk_import(_ndjson(lines), sm2)
+            stats = executor.stats()
+        finally:
+            disable_crypto_executor()
+        assert report["imported"] == 40
+        # 哈希与加密都按进程数切片提交
+        assert stats["ops"]["hash_passwords"] == 2
+        assert stats["ops"]["encrypt_many"] == 2
+        assert stats["failed"] == 0
+        with user_module._conn() as conn:
+            row = conn.execute(
+                "SELECT password_hash FROM users WHERE username = ?", ("user17",)
+            ).fetchone()
+        assert row[0] == hash_password("Pwd17!")
+        user = service.login("user39", "Pwd39!")
+        assert sm2.decrypt(user.phone_encrypted) == "13900000039"
+
@@ -0,0 +1,62 @@
+"""
+测试国密计算卸载池（CryptoExecutor）：签名 / 验签 / 加解密 / 密钥生成往返、任务失败与 stats() 计数，
+以及子进程异常退出（BrokenProcessPool）后重建进程池
+"""
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.services.Crypto_Executor import CryptoExecutor
+from app.services.SM2_Cipher import C1C3C2
+from app.services.SM2_Curve import N, derive_public_key, verify_signature
+
+
+@pytest.fixture
+def executor():
+    executor = CryptoExecutor(max_workers=2).start()
+    yield executor
+    executor.shutdown()
+
+
+def test_roundtrip(executor):
+    private_key, public_key = executor.keygen("sm2")
+    assert 0 < int(private_key, 16) < N
+    assert derive_public_key(private_key) == public_key
+    r, s = executor.sign(private_key, b"payload")
+    assert executor.verify(public_key, b"payload", r, s)
+    assert not executor.verify(public_key, b"other", r, s)
+    assert verify_signature(public_key, r, s, int.from_bytes(b"payload", "big"))
+    cipher = executor.encrypt(public_key, b"13800138000", C1C3C2)
+    assert executor.decrypt(private_key, cipher, C1C3C2) == b"13800138000"
+    ciphers = executor.submit_encrypt_many(public_key, [b"a", b"b"], C1C3C2).result()
+    assert [executor.decrypt(private_key, c, C1C3C2) for c in ciphers] == [b"a", b"b"]
+    stats = executor.stats()
+    assert stats["ops"] == {"keygen_sm2": 1, "sign": 1, "verify": 2, "encrypt": 1, "decrypt": 3, "encrypt_many": 1}
+    assert stats["submitted"] == stats["completed"] == 9
+    assert stats["failed"] == 0 and stats["queue_depth"] == 0
+
+
+def test_failure_counted(executor):
+    private_key, public_key = executor.keygen("sm2")
+    other_private, _ = executor.keygen("sm2")
+    cipher = executor.encrypt(public_key, b"secret", C1C3C2)
+    with pytest.raises(ValueError):
+        executor.decrypt(other_private, cipher, C1C3C2)
+    with pytest.raises(ValueError):
+        executor.keygen("dsa")
+    stats = executor.stats()
+    assert stats["failed"] == 2
+    assert stats["completed"] == 3
+    assert stats["queue_depth"] == 0
+
+
+def test_rebuilt_after_broken_pool(executor):
+    with pytest.raises(BrokenProcessPool):
+        executor._submit("crash", os._exit, 1).result(30)
+    private_key, public_key = executor.keygen("sm2")
+    r, s = executor.sign(private_key, b"after restart")
+    assert executor.verify(public_key, b"after restart", r, s)
+    stats = executor.stats()
+    assert stats["restarts"] == 1
+    assert stats["failed"] == 1
@@ -0,0 +1,155 @@
+"""
+测试本机国密守护进程：签名 / 验签 / 加解密往返、支付数字信封经守护进程解密、套接字属主与目录权限检查，
+以及客户端调用超时与畸形响应帧
+"""
+import json
+import os
+import secrets
+import socket
+import tempfile
+import threading
+import time
+
+import pytest
+
+from gmssl.sm4 import SM4_ENCRYPT
+from app.services import Crypto_Sidecar
+from app.services.Crypto_Sidecar import CryptoSidecarServer, SidecarError, SidecarSM2Client
+from app.services.SM2_Cipher import C1C3C2, encrypt as sm2_encrypt
+from app.services.SM4_Backend import SM4Cipher
+from app.services.payment_service import PaymentService, sm3_hash
+
+
+def _start_server():
+    workdir = tempfile.mkdtemp(prefix="test_crypto_sidecar_")
+    socket_path = os.path.join(workdir, "run", "sm2_sidecar.sock")
+    server = CryptoSidecarServer(socket_path, key_path=os.path.join(workdir, "sm2_key.txt"))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_roundtrip_through_sidecar():
+    server = _start_server()
+    try:
+        client = SidecarSM2Client(server.socket_path)
+        assert client.public_key == server.sm2.public_key
+        signature = client.sign_compact("payload")
+        assert client.verify("payload", signature)
+        assert server.sm2.verify("payload", signature)
+        assert client.verify_many([("payload", signature), ("other", signature)]) == [True, False]
+        assert client.decrypt(client.encrypt("13800138000")) == "13800138000"
+        key = secrets.token_bytes(16)
+        assert client.decrypt_raw(sm2_encrypt(client.public_key, key, C1C3C2)) == key
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_socket_directory_is_private():
+    server = _start_server()
+    try:
+        directory = os.path.dirname(server.socket_path)
+        assert os.stat(directory).st_mode & 0o777 == 0o700
+        assert os.stat(server.socket_path).st_mode & 0o777 == 0o600
+        # 目录被放宽权限后客户端拒绝连接
+        os.chmod(directory, 0o777)
+        try:
+            SidecarSM2Client(server.socket_path)
+        except SidecarError:
+            pass
+        else:
+            raise AssertionError("不安全的套接字目录未被拒绝")
+        finally:
+            os.chmod(directory, 0o700)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_server_refuses_to_replace_foreign_file():
+    workdir = tempfile.mkdtemp(prefix="test_crypto_sidecar_")
+    socket_path = os.path.join(workdir, "sm2_sidecar.sock")
+    with open(socket_path, "w") as f:
+        f.write("not a socket")
+    try:
+        CryptoSidecarServer(socket_path, key_path=os.path.join(workdir, "sm2_key.txt"))
+    except SidecarError:
+        pass
+    else:
+        raise AssertionError("守护进程覆盖了非套接字文件")
+    assert os.path.exists(socket_path)
+
+
+def test_payment_service_through_sidecar():
+    server = _start_server()
+    previous = PaymentService.ECOMMERCE_SM2
+    try:
+        PaymentService.ECOMMERCE_SM2 = SidecarSM2Client(server.socket_path)
+        signature = PaymentService.generate_payment_signature("ORD1", "99.00", "MERCHANT_001", 1700000000)
+        data = "ORD1|99.00|MERCHANT_001|1700000000"
+        assert server.sm2.verify(sm3_hash(data), signature)
+        # 模拟银行的数字信封：SM4 密钥用电商公钥加密
+        sm4_key = secrets.token_bytes(16)
+        iv = secrets.token_bytes(16)
+        plain = json.dumps({"order_id": "ORD1", "status": "success"}).encode("utf-8")
+        pad = 16 - len(plain) % 16
+        cipher = SM4Cipher()
+        cipher.set_key(sm4_key, SM4_ENCRYPT)
+        ciphertext = cipher.crypt_cbc(iv, plain + bytes([pad] * pad))
+        encrypted_key = sm2_encrypt(server.sm2.public_key, sm4_key, C1C3C2)
+        result = PaymentService.decrypt_payment_result(encrypted_key.hex(), iv.hex(), ciphertext.hex())
+        assert result == {"success": True, "data": {"order_id": "ORD1", "status": "success"}}
+    finally:
+        PaymentService.ECOMMERCE_SM2 = previous
+        server.shutdown()
+        server.server_close()
+
+
+
+def test_call_timeout_raises_sidecar_error():
+    server = _start_server()
+    dispatch = server.dispatch
+
+    def slow_dispatch(op, fields):
+        if op == Crypto_Sidecar.OP_SIGN:
+            time.sleep(1.0)
+        return dispatch(op, fields)
+
+    server.dispatch = slow_dispatch
+    try:
+        client = SidecarSM2Client(server.socket_path, timeout=0.2)
+        started = time.monotonic()
+        with pytest.raises(SidecarError):
+            client.sign_compact("payload")
+        assert time.monotonic() - started < 0.9
+        # 超时的连接已丢弃，下一次调用重新连接，不会读到迟到的签名响应
+        assert client.decrypt(client.encrypt("13800138000")) == "13800138000"
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_malformed_reply_raises_sidecar_error():
+    workdir = tempfile.mkdtemp(prefix="test_crypto_sidecar_")
+    socket_path = os.path.join(workdir, "sm2_sidecar.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(1)
+
+    def bogus_daemon():
+        conn, _ = listener.accept()
+        with conn:
+            conn.recv(1024)
+            # 声明的帧长超过上限
+            conn.sendall(Crypto_Sidecar._HEADER.pack(Crypto_Sidecar.MAX_FRAME_SIZE + 1, 0))
+
+    thread = threading.Thread(target=bogus_daemon, daemon=True)
+    thread.start()
+    try:
+        with pytest.raises(SidecarError):
+            SidecarSM2Client(socket_path, timeout=2)
+    finally:
+        thread.join(2)
+        listener.close()
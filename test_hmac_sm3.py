@@ -0,0 +1,100 @@
+"""
+测试 HMAC-SM3：原生与纯 Python 两条路径都与按 RFC 2104 逐步计算（gmssl SM3）的结果一致、
+分段 update / copy、常量时间校验，以及密钥中间状态缓存的上限与清空
+"""
+from gmssl import func, sm3
+
+from app.services import SM3_HMAC
+from app.services.SM3_HMAC import HMACSM3, clear_key_cache, hmac_sm3, hmac_sm3_hex, verify_hmac_sm3
+
+KEYS = [b"", b"k", b"k" * 16, b"k" * 63, b"k" * 64, b"k" * 65, bytes(range(100))]
+MESSAGES = [b"", b"abc", b"m" * 55, b"m" * 56, b"m" * 64, b"m" * 200]
+
+
+def _reference(key, msg):
+    """RFC 2104：H((K ⊕ opad) || H((K ⊕ ipad) || m))，SM3 取自 gmssl"""
+    def h(data):
+        return bytes.fromhex(sm3.sm3_hash(func.bytes_to_list(data)))
+
+    if len(key) > 64:
+        key = h(key)
+    key = key.ljust(64, b"\x00")
+    inner = h(bytes(b ^ 0x36 for b in key) + msg)
+    return h(bytes(b ^ 0x5C for b in key) + inner)
+
+
+class _pure_python:
+    """临时关闭原生实现，走 SM3_Service 的纯 Python 中间状态"""
+
+    def __enter__(self):
+        self.old = SM3_HMAC._USE_NATIVE
+        SM3_HMAC._USE_NATIVE = False
+        clear_key_cache()
+
+    def __exit__(self, *exc):
+        SM3_HMAC._USE_NATIVE = self.old
+        clear_key_cache()
+
+
+def _check_against_reference():
+    for key in KEYS:
+        for msg in MESSAGES:
+            expected = _reference(key, msg)
+            assert hmac_sm3(key, msg) == expected, (len(key), len(msg))
+            # 第二次命中缓存的中间状态，结果不变
+            assert hmac_sm3(key, msg) == expected
+            assert hmac_sm3_hex(key, msg) == expected.hex()
+
+
+def test_matches_reference():
+    clear_key_cache()
+    _check_against_reference()
+
+
+def test_pure_python_matches_reference():
+    with _pure_python():
+        _check_against_reference()
+
+
+def _check_incremental():
+    mac = HMACSM3("secret")
+    mac.update("hello ")
+    snapshot = mac.copy()
+    mac.update(b"world")
+    assert mac.digest() == hmac_sm3(b"secret", b"hello world")
+    # digest() 不结束上下文，可继续 update
+    assert mac.digest() == mac.digest()
+    snapshot.update(b"there")
+    assert snapshot.digest() == hmac_sm3(b"secret", b"hello there")
+    assert HMACSM3(b"secret", b"x").hexdigest() == hmac_sm3_hex("secret", "x")
+
+
+def test_incremental_update_and_copy():
+    _check_incremental()
+    with _pure_python():
+        _check_incremental()
+
+
+def test_verify():
+    mac = hmac_sm3(b"key", b"data")
+    assert verify_hmac_sm3(b"key", b"data", mac)
+    assert verify_hmac_sm3(b"key", b"data", mac.hex())
+    assert verify_hmac_sm3(b"key", b"data", mac.hex().upper())
+    assert verify_hmac_sm3("key", "data", bytearray(mac))
+    assert not verify_hmac_sm3(b"key", b"data!", mac)
+    assert not verify_hmac_sm3(b"other", b"data", mac.hex())
+    assert not verify_hmac_sm3(b"key", b"data", mac[:-1])
+
+
+def test_key_cache_bounded_and_cleared():
+    clear_key_cache()
+    for i in range(SM3_HMAC.KEY_CACHE_SIZE + 10):
+        hmac_sm3(f"key-{i}", b"data")
+    assert len(SM3_HMAC._midstates) == SM3_HMAC.KEY_CACHE_SIZE
+    # 最早的密钥已被淘汰，最近使用的仍在缓存中
+    assert b"key-0" not in SM3_HMAC._midstates
+    assert f"key-{SM3_HMAC.KEY_CACHE_SIZE + 9}".encode() in SM3_HMAC._midstates
+    assert hmac_sm3(b"key-0", b"data") == _reference(b"key-0", b"data")
+    clear_key_cache()
+    assert len(SM3_HMAC._midstates) == 0
+
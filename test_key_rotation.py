@@ -0,0 +1,133 @@
+"""
+测试 SM2 密钥轮换：kid 密钥环（宽限期、跨实例重新加载、伪造 kid）与数据安全层 SM2Service（加解密、签名、轮换后旧令牌）
+"""
+import os
+import tempfile
+import time
+
+from app.services.SM2_Keyring import SM2Keyring
+from app.services import 数据安全层访问 as data_layer
+
+
+def _tmpdir():
+    return tempfile.mkdtemp(prefix="test_key_rotation_")
+
+
+class _chdir:
+    """数据安全层按相对路径读写 app/ 下的密钥文件与 ecommerce.db，测试在临时目录中进行"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.old = os.getcwd()
+        os.chdir(self.path)
+
+    def __exit__(self, *exc):
+        os.chdir(self.old)
+
+
+def test_keyring_rotation_with_grace():
+    keyring = SM2Keyring(os.path.join(_tmpdir(), "keyring.json"))
+    old_kid = keyring.signing_kid()
+    r, s = keyring.sign(old_kid, b"token-before-rotation")
+    new_kid = keyring.rotate(grace=60)
+    assert new_kid != old_kid and keyring.signing_kid() == new_kid
+    # 宽限期内旧 kid 仍可验签
+    assert keyring.verify(old_kid, b"token-before-rotation", r, s)
+    assert not keyring.verify(old_kid, b"tampered", r, s)
+    r2, s2 = keyring.sign(new_kid, b"token-after-rotation")
+    assert keyring.verify(new_kid, b"token-after-rotation", r2, s2)
+    assert not keyring.verify(old_kid, b"token-after-rotation", r2, s2)
+
+
+def test_keyring_grace_expiry_and_unknown_kid():
+    keyring = SM2Keyring(os.path.join(_tmpdir(), "keyring.json"))
+    old_kid = keyring.signing_kid()
+    r, s = keyring.sign(old_kid, b"data")
+    keyring.rotate(grace=-1)
+    assert keyring.public_key(old_kid) is None
+    assert not keyring.verify(old_kid, b"data", r, s)
+    assert not keyring.verify("0123456789abcdef", b"data", r, s)
+
+
+def test_keyring_other_instance_picks_up_rotation():
+    path = os.path.join(_tmpdir(), "keyring.json")
+    a = SM2Keyring(path)
+    b = SM2Keyring(path)
+    old_kid = a.signing_kid()
+    new_kid = a.rotate(grace=60)
+    r, s = a.sign(new_kid, b"data")
+    # b 遇到未知 kid 时立即重新读取密钥环文件
+    assert b.verify(new_kid, b"data", r, s)
+    assert b.public_key(old_kid) is not None
+
+
+def test_forged_kids_do_not_block_reload():
+    path = os.path.join(_tmpdir(), "keyring.json")
+    a = SM2Keyring(path)
+    b = SM2Keyring(path)
+    loads = []
+    original = b._load
+    b._load = lambda: (loads.append(1), original())
+    # 大量伪造 kid：文件未变时不重新解析
+    for i in range(50):
+        assert b.public_key(f"{i:016x}") is None
+    assert loads == []
+    # 紧接着出现的真实新 kid 仍能立即验签
+    new_kid = a.rotate(grace=60)
+    r, s = a.sign(new_kid, b"data")
+    assert b.verify(new_kid, b"data", r, s)
+    assert len(loads) == 1
+
+
+def test_data_layer_sm2_encrypt_sign():
+    with _chdir(_tmpdir()):
+        sm2 = data_layer.SM2Service()
+        cipher = sm2.encrypt("13800138000")
+        assert sm2.decrypt(cipher) == "13800138000"
+        signature = sm2.sign("payload")
+        assert sm2.verify("payload", signature)
+        assert not sm2.verify("other payload", signature)
+        assert sm2.decrypt_large_data(sm2.encrypt_large_data("x" * 200)) == "x" * 200
+
+
+def test_data_layer_rotation_keeps_old_tokens_valid():
+    with _chdir(_tmpdir()):
+        jwt = data_layer.SM2JWTService()
+        old_token = jwt.generate_token("alice", "buyer")["access_token"]
+        jwt.sm2.rotate_keys()
+        assert jwt.verify_token(old_token)[0]
+        new_token = jwt.generate_token("alice", "buyer")["access_token"]
+        assert jwt.verify_token(new_token)[0]
+        # 进程重启后从备份恢复宽限期内的旧公钥
+        restarted = data_layer.SM2JWTService()
+        assert restarted.verify_token(old_token)[0]
+        # 宽限期结束后旧令牌失效
+        restarted.sm2.retired_keys = [(key, time.time() - 1) for key, _ in restarted.sm2.retired_keys]
+        assert not restarted.verify_token(old_token)[0]
+        assert restarted.verify_token(new_token)[0]
+
+
+def test_data_layer_user_flow():
+    workdir = _tmpdir()
+    # 模块级引擎在导入时已解析出绝对路径，测试期间换成临时库
+    engine, data_layer.engine = data_layer.engine, data_layer.create_db_engine(
+        "sqlite", db_path=os.path.join(workdir, "ecommerce.db"))
+    data_layer.SessionLocal.configure(bind=data_layer.engine)
+    try:
+        with _chdir(workdir):
+            service = data_layer.DataSecurityService()
+            service.init_db()
+            ok, msg = service.create_user("alice", "Passw0rd!", "13800138000", email="alice@example.com")
+            assert ok, msg
+            ok, tokens = service.user_login("alice", "Passw0rd!")
+            assert ok, tokens
+            ok, info = service.get_user_info("alice", tokens["access_token"])
+            assert ok, info
+            assert info["phone"] == "138****8000"
+    finally:
+        data_layer.engine.dispose()
+        data_layer.engine = engine
+        data_layer.SessionLocal.configure(bind=engine)
+
@@ -0,0 +1,81 @@
+"""
+测试 SM2 签名临时密钥池：预计算的 (k, k·G) 正确且不重复、命中 / 未命中计数、签名可验，
+以及 fork 后子进程不会沿用父进程池中的 k
+"""
+import multiprocessing
+import time
+
+import pytest
+
+from app.services.SM2_Curve import base_mul
+from app.services.SM2_NoncePool import NoncePool, disable_nonce_pool, enable_nonce_pool, nonce_pool_stats, take_nonce
+from app.services.SM2_Utils import SM2Service
+
+
+def _wait_filled(pool, count, timeout=30):
+    deadline = time.time() + timeout
+    while pool.stats()["available"] < count:
+        if time.time() > deadline:
+            raise AssertionError("临时密钥池补充超时")
+        time.sleep(0.01)
+
+
+def _child_report(queue, pool):
+    queue.put({
+        "take_nonce": take_nonce(),
+        "stats": nonce_pool_stats(),
+        "instance_available": pool.stats()["available"],
+        "instance_take": pool.take(),
+    })
+
+
+def test_pairs_are_valid_and_unique():
+    pool = NoncePool(size=32, low_watermark=8).start()
+    try:
+        _wait_filled(pool, 32)
+        pairs = [pool.take() for _ in range(32)]
+        assert all(base_mul(k) == q and q[1] % 2 == 0 for k, q in pairs)
+        assert len({k for k, _ in pairs}) == 32
+        assert pool.stats()["hits"] == 32
+    finally:
+        pool.stop()
+
+
+def test_signing_with_pool():
+    pool = enable_nonce_pool(size=16, low_watermark=4)
+    try:
+        _wait_filled(pool, 16)
+        service = SM2Service()
+        signatures = [service.sign_compact(f"message-{i}") for i in range(8)]
+        assert all(service.verify(f"message-{i}", sig) for i, sig in enumerate(signatures))
+        assert nonce_pool_stats()["hits"] >= 8
+    finally:
+        disable_nonce_pool()
+    assert take_nonce() is None
+
+
+def test_forked_child_does_not_inherit_nonces():
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("当前平台不支持 fork")
+    pool = enable_nonce_pool(size=16, low_watermark=4)
+    standalone = NoncePool(size=8, low_watermark=2).start()
+    try:
+        _wait_filled(pool, 16)
+        _wait_filled(standalone, 8)
+        ctx = multiprocessing.get_context("fork")
+        queue = ctx.Queue()
+        child = ctx.Process(target=_child_report, args=(queue, standalone))
+        child.start()
+        report = queue.get(timeout=30)
+        child.join(30)
+        assert report["take_nonce"] is None
+        assert report["stats"] is None
+        assert report["instance_available"] == 0
+        assert report["instance_take"] is None
+        # 父进程的池不受影响
+        assert take_nonce() is not None
+        assert standalone.take() is not None
+    finally:
+        standalone.stop()
+        disable_nonce_pool()
+
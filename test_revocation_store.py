@@ -0,0 +1,67 @@
+"""
+测试带过期时间的注销表（ExpiringTokenStore）：过期清除、Bloom 前置判定、位图重建与内存上限
+"""
+import time
+
+from app.services.Token_Revocation import ExpiringTokenStore
+
+
+def test_add_contains_and_values():
+    store = ExpiringTokenStore()
+    exp = time.time() + 60
+    store.add("token-a", exp)
+    store.add("token-b", exp, value={"sid": "s1"})
+    assert "token-a" in store
+    assert store.get("token-b") == {"sid": "s1"}
+    assert "token-c" not in store
+    assert store.get("token-c", "missing") == "missing"
+    store.discard("token-a")
+    assert "token-a" not in store
+
+
+def test_expired_entries_are_purged():
+    store = ExpiringTokenStore()
+    past = time.time() - 10
+    for i in range(100):
+        store.add(f"old-{i}", past)
+    store.add("live", time.time() + 60)
+    assert "old-0" not in store
+    assert len(store) == 1
+    assert store.stats()["expired"] == 100
+
+
+def test_re_add_extends_expiry():
+    store = ExpiringTokenStore()
+    store.add("token", time.time() - 10)
+    store.add("token", time.time() + 60)
+    assert "token" in store
+    assert len(store) == 1
+
+
+def test_bloom_rejects_most_unknown_tokens():
+    store = ExpiringTokenStore(capacity=1000)
+    exp = time.time() + 60
+    for i in range(1000):
+        store.add(f"revoked-{i}", exp)
+    for i in range(10000):
+        assert f"valid-{i}" not in store
+    stats = store.stats()
+    # 目标误判率 1%，留足余量
+    assert stats["bloom_rejects"] >= 9500
+    assert all(f"revoked-{i}" in store for i in range(1000))
+
+
+def test_memory_bounded_by_live_entries():
+    store = ExpiringTokenStore(capacity=256)
+    past = time.time() - 10
+    for round_ in range(20):
+        for i in range(256):
+            store.add(f"r{round_}-{i}", past)
+    store.add("live", time.time() + 60)
+    stats = store.stats()
+    # 全部过期的条目已清除，位图按存活条目重建，未随累计插入量无限增长
+    assert stats["size"] == 1
+    assert stats["heap_size"] <= 64 + 2
+    assert stats["capacity"] == 256
+    assert "live" in store
+
@@ -0,0 +1,68 @@
+"""
+测试数据安全层的会话管理：session_scope 正常提交、异常回滚，两种情况下连接都归还连接池；
+借出等待计时与连接池耗尽时的借出超时计数
+"""
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine, exc as sa_exc, text
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from app.services import 数据安全层访问 as data_layer
+
+
+class _temp_engine:
+    """把数据安全层的会话工厂与连接池指标换成临时库上的同配置引擎，测试结束后还原"""
+
+    def __enter__(self):
+        self.old = data_layer.SessionLocal, data_layer.pool_metrics
+        path = os.path.join(tempfile.mkdtemp(prefix="test_session_scope_"), "ecommerce.db")
+        self.engine = data_layer.create_db_engine("sqlite", db_path=path)
+        data_layer.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        data_layer.pool_metrics = data_layer.PoolMetrics(self.engine)
+        return self.engine
+
+    def __exit__(self, *exc):
+        data_layer.SessionLocal, data_layer.pool_metrics = self.old
+        self.engine.dispose()
+
+
+def test_failed_session_returns_connection():
+    with _temp_engine() as engine:
+        with data_layer.session_scope() as db:
+            db.execute(text("CREATE TABLE items (name TEXT PRIMARY KEY)"))
+        with pytest.raises(RuntimeError):
+            with data_layer.session_scope() as db:
+                db.execute(text("INSERT INTO items VALUES ('dropped')"))
+                raise RuntimeError("boom")
+        with pytest.raises(sa_exc.IntegrityError):
+            with data_layer.session_scope() as db:
+                db.execute(text("INSERT INTO items VALUES ('dup'), ('dup')"))
+        stats = data_layer.pool_stats()
+        assert stats["in_use"] == 0
+        assert engine.pool.checkedout() == 0
+        assert stats["checkouts"] == 3
+        # 连接被复用而不是泄漏后另开
+        assert stats["connections_opened"] == 1
+        with data_layer.session_scope() as db:
+            assert db.execute(text("SELECT COUNT(*) FROM items")).scalar() == 0
+
+
+def test_checkout_wait_and_timeout_counted():
+    path = os.path.join(tempfile.mkdtemp(prefix="test_session_scope_"), "pool.db")
+    engine = create_engine(f"sqlite:///{path}", poolclass=QueuePool, pool_size=1, max_overflow=0, pool_timeout=0.1)
+    metrics = data_layer.PoolMetrics(engine)
+    held = Session(bind=engine)
+    metrics.acquire(held)
+    assert metrics.stats()["in_use"] == 1
+    with pytest.raises(sa_exc.TimeoutError):
+        metrics.acquire(Session(bind=engine))
+    held.close()
+    stats = metrics.stats()
+    assert stats["timeouts"] == 1
+    assert stats["in_use"] == 0
+    assert stats["checkouts"] == 1
+    assert stats["checkout_wait_max_ms"] >= 100
+    engine.dispose()
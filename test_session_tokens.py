@@ -0,0 +1,95 @@
+"""
+测试混合会话令牌（SM2 会话凭证 + HMAC-SM3 access_token）：签发、刷新、篡改、注销与签名密钥轮换
+"""
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="test_session_tokens_")
+os.environ.setdefault("REVOCATION_DB_PATH", os.path.join(_TMP, "revocation.db"))
+
+from app.services.JWT_SM2_Utils import JWTSM2Service
+from app.services.SM2_Keyring import SM2Keyring
+from app.services.Token_Revocation import SharedRevocationStore
+
+
+def _service(temp_keyring=False):
+    service = JWTSM2Service()
+    # 每个用例独立的注销表，互不影响
+    service._token_blacklist = SharedRevocationStore(os.path.join(tempfile.mkdtemp(dir=_TMP), "revocation.db"))
+    if temp_keyring:
+        # 需要轮换时换成临时密钥环，不动 app/ 下的密钥环文件
+        service.keyring = SM2Keyring(os.path.join(tempfile.mkdtemp(dir=_TMP), "keyring.json"))
+    return service
+
+
+def _fails(fn, *args):
+    try:
+        fn(*args)
+    except RuntimeError:
+        return True
+    return False
+
+
+def test_session_tokens_verify_and_refresh():
+    service = _service()
+    tokens = service.generate_session_tokens("alice", "user", user_id=7)
+    access = service.verify_token(tokens["access_token"])
+    session = service.verify_token(tokens["refresh_token"])
+    assert access["username"] == "alice" and access["user_id"] == 7
+    assert session["typ"] == "session" and session["sid"] == access["sid"]
+    refreshed = service.refresh_access_token(tokens["refresh_token"])
+    assert service.verify_token(refreshed)["sid"] == session["sid"]
+
+
+def test_tampered_mac_rejected():
+    service = _service()
+    access_token = service.generate_session_tokens("alice")["access_token"]
+    head, payload, mac = access_token.rsplit(".", 2)
+    forged = f"{head}.{payload}.{'A' if mac[0] != 'A' else 'B'}{mac[1:]}"
+    assert _fails(service.verify_token, forged)
+    # 换用其他会话的 sid 也不能通过（会话密钥按 sid 派生）
+    other = service.generate_session_tokens("bob")["access_token"]
+    assert _fails(service.verify_token, f"{head}.{other.split('.')[1]}.{mac}")
+
+
+def test_logout_revokes_whole_session():
+    service = _service()
+    tokens = service.generate_session_tokens("alice")
+    other = service.generate_session_tokens("bob")
+    service.verify_token_cached(tokens["refresh_token"])
+    service.add_to_blacklist(tokens["access_token"])
+
+    assert _fails(service.verify_token, tokens["access_token"])
+    assert _fails(service.verify_token, tokens["refresh_token"])
+    assert _fails(service.verify_token_cached, tokens["refresh_token"])
+    assert service.refresh_access_token(tokens["refresh_token"]) is None
+    assert service.verify_tokens([tokens["refresh_token"], tokens["access_token"]]) == [None, None]
+    # 其他会话不受影响
+    results = service.verify_tokens([other["refresh_token"], other["access_token"]])
+    assert all(payload is not None and payload["username"] == "bob" for payload in results)
+
+
+def test_expired_access_token_rejected():
+    service = _service()
+    session = service.verify_token(service.generate_session_tokens("alice")["refresh_token"])
+    assert _fails(service.verify_token, service.mint_session_access_token(session, expires_in=-1))
+
+
+
+def test_session_key_follows_signing_key_rotation():
+    service = _service(temp_keyring=True)
+    tokens = service.generate_session_tokens("alice")
+    old_kid = service.keyring.signing_kid()
+    service.rotate_signing_key(grace=60)
+    # 新签发的 access_token 换用新 kid 派生的会话密钥，宽限期内旧的仍可验证
+    refreshed = service.refresh_access_token(tokens["refresh_token"])
+    assert refreshed.split(".")[0] != tokens["access_token"].split(".")[0]
+    assert service.verify_token(refreshed)["username"] == "alice"
+    assert service.verify_token(tokens["access_token"])["username"] == "alice"
+    assert service.verify_tokens([tokens["access_token"], refreshed])[0]["username"] == "alice"
+    # 旧签名密钥过了宽限期：由它派生的会话令牌与会话凭证一并失效
+    service.rotate_signing_key(grace=60)
+    service.keyring._keys[old_kid]["retire_at"] = 0
+    assert _fails(service.verify_token, tokens["access_token"])
+    assert service.verify_tokens([tokens["access_token"]]) == [None]
+    assert service.verify_token(refreshed)["username"] == "alice"
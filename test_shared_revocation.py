@@ -0,0 +1,75 @@
+"""
+测试跨进程共享注销表（SharedRevocationStore）：增量同步、过期记录、序号推进与多进程可见性
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+
+from app.services.Token_Revocation import SharedRevocationStore
+
+
+def _db_path():
+    return os.path.join(tempfile.mkdtemp(prefix="test_shared_revocation_"), "revocation.db")
+
+
+def _revoke_in_child(db_path, key, exp):
+    SharedRevocationStore(db_path).add(key, exp)
+
+
+def test_created_lazily():
+    path = _db_path()
+    store = SharedRevocationStore(path)
+    assert not os.path.exists(path)
+    assert "token" not in store
+    assert os.path.exists(path)
+
+
+def test_revocation_visible_to_other_store():
+    path = _db_path()
+    a = SharedRevocationStore(path, refresh_interval=0)
+    b = SharedRevocationStore(path, refresh_interval=0)
+    assert "token-1" not in b
+    a.add("token-1", time.time() + 60)
+    assert "token-1" in a
+    assert "token-1" in b
+    assert "token-2" not in b
+
+
+def test_expired_rows_skipped_but_later_rows_pulled():
+    path = _db_path()
+    a = SharedRevocationStore(path, refresh_interval=0)
+    b = SharedRevocationStore(path, refresh_interval=0)
+    a.add("expired", time.time() - 10)
+    b.refresh(force=True)
+    assert "expired" not in b
+    a.add("fresh", time.time() + 60)
+    assert "fresh" in b
+    assert b.last_seq == 2
+
+
+def test_last_seq_only_advances_from_fetched_rows():
+    path = _db_path()
+    a = SharedRevocationStore(path, refresh_interval=0)
+    b = SharedRevocationStore(path, refresh_interval=0)
+    b.refresh(force=True)
+    assert b.last_seq == 0
+    # 模拟另一进程直接写入共享表（不经过 b 的本地缓存）
+    for i in range(5):
+        a.add(f"token-{i}", time.time() + 60)
+    b.refresh(force=True)
+    assert b.last_seq == 5
+    assert all(f"token-{i}" in b for i in range(5))
+
+
+def test_revocation_from_other_process():
+    path = _db_path()
+    store = SharedRevocationStore(path, refresh_interval=0)
+    assert "child-token" not in store
+    ctx = multiprocessing.get_context("spawn")
+    child = ctx.Process(target=_revoke_in_child, args=(path, "child-token", time.time() + 60))
+    child.start()
+    child.join(60)
+    assert child.exitcode == 0
+    assert "child-token" in store
+
@@ -0,0 +1,60 @@
+"""
+测试 JWT 签名段解析（_sig_segment_to_rs）：v2 原始字节、v1 Base64URL 包裹的 hex（带或不带填充）、
+裸 128 位 hex 解析出同一对 (r, s)，长度或字符不合法时抛 ValueError，以及 SM2Service.verify 接受三种格式
+"""
+import base64
+import os
+import secrets
+import tempfile
+
+import pytest
+
+from app.services.SM2_Utils import SM2Service, _sig_hex_to_b64url, _sig_rs_to_b64url, _sig_segment_to_rs
+
+R = int.from_bytes(secrets.token_bytes(32), "big")
+S = int.from_bytes(secrets.token_bytes(32), "big")
+HEX = "%064x%064x" % (R, S)
+
+
+def test_all_formats_decode_to_same_rs():
+    v2 = _sig_rs_to_b64url(R, S)
+    v1 = _sig_hex_to_b64url(HEX)
+    assert (len(v2), len(v1)) == (86, 171)
+    assert _sig_segment_to_rs(v2) == (R, S)
+    assert _sig_segment_to_rs(v1) == (R, S)
+    assert _sig_segment_to_rs(v1 + "=") == (R, S)
+    assert _sig_segment_to_rs(HEX) == (R, S)
+    assert _sig_segment_to_rs(HEX.upper()) == (R, S)
+
+
+@pytest.mark.parametrize("length", [0, 64, 85, 87, 127, 129, 170, 173, 200])
+def test_bad_lengths_rejected(length):
+    with pytest.raises(ValueError, match="长度错误"):
+        _sig_segment_to_rs("A" * length)
+
+
+def test_bad_characters_rejected():
+    v2 = _sig_rs_to_b64url(R, S)
+    v1 = _sig_hex_to_b64url(HEX)
+    bad = [
+        v2[:-1] + "+",
+        v2[:10] + "/" + v2[11:],
+        "g" + HEX[1:],
+        v1[:-1] + "*",
+        # v1 长度对了，但包裹的不是 hex
+        base64.urlsafe_b64encode(b"z" * 128).rstrip(b"=").decode("ascii"),
+    ]
+    for segment in bad:
+        with pytest.raises(ValueError):
+            _sig_segment_to_rs(segment)
+
+
+def test_service_verify_accepts_all_formats():
+    service = SM2Service(key_path=os.path.join(tempfile.mkdtemp(prefix="test_sig_segment_"), "sm2_key.txt"))
+    segment = service.sign_compact("payload")
+    r, s = _sig_segment_to_rs(segment)
+    hex_str = "%064x%064x" % (r, s)
+    for form in (segment, _sig_hex_to_b64url(hex_str), hex_str, f" {segment}\n"):
+        assert service.verify("payload", form)
+    assert not service.verify("other", segment)
+    assert not service.verify("payload", segment[:-1])
@@ -0,0 +1,65 @@
+"""
+测试 SM2 公钥加密（SM2_Cipher）：两种密文排列的往返、与 gmssl CryptSM2 互相解密，
+以及 C3 不符、C1 不在曲线上、密文过短时解密抛 ValueError
+"""
+import secrets
+
+import pytest
+from gmssl.sm2 import CryptSM2
+
+from app.services.SM2_Cipher import C1C2C3, C1C3C2, decrypt, encrypt
+from app.services.SM2_Curve import N, derive_public_key
+
+
+def _keypair():
+    d = "%064x" % (secrets.randbelow(N - 1) + 1)
+    return d, derive_public_key(d)
+
+
+@pytest.mark.parametrize("mode", [C1C2C3, C1C3C2])
+def test_round_trip_and_gmssl_interop(mode):
+    d, pub = _keypair()
+    gmssl = CryptSM2(private_key=d, public_key=pub, mode=mode)
+    for data in (b"", b"x", "13800138000".encode(), secrets.token_bytes(100)):
+        cipher = encrypt(pub, data, mode)
+        assert len(cipher) == 64 + 32 + len(data)
+        assert decrypt(d, cipher, mode) == data
+        if data:
+            assert gmssl.decrypt(cipher) == data
+            assert decrypt(d, gmssl.encrypt(data), mode) == data
+
+
+@pytest.mark.parametrize("mode", [C1C2C3, C1C3C2])
+def test_c3_mismatch_rejected(mode):
+    d, pub = _keypair()
+    cipher = bytearray(encrypt(pub, b"payment-secret", mode))
+    c3_offset = 64 if mode == C1C3C2 else len(cipher) - 32
+    c2_offset = 96 if mode == C1C3C2 else 64
+    for offset in (c3_offset, c2_offset):
+        tampered = bytearray(cipher)
+        tampered[offset] ^= 1
+        with pytest.raises(ValueError, match="C3 校验失败"):
+            decrypt(d, tampered, mode)
+    # 换一把私钥解出的 C3 同样对不上
+    with pytest.raises(ValueError, match="C3 校验失败"):
+        decrypt(_keypair()[0], cipher, mode)
+
+
+def test_off_curve_c1_rejected():
+    d, pub = _keypair()
+    cipher = bytearray(encrypt(pub, b"payment-secret"))
+    cipher[63] ^= 1
+    with pytest.raises(ValueError, match="不在曲线上"):
+        decrypt(d, cipher)
+    with pytest.raises(ValueError, match="不在曲线上"):
+        decrypt(d, bytes(64) + cipher[64:])
+
+
+def test_malformed_input_rejected():
+    d, pub = _keypair()
+    with pytest.raises(ValueError, match="过短"):
+        decrypt(d, bytes(95))
+    with pytest.raises(ValueError, match="mode"):
+        encrypt(pub, b"x", 2)
+    with pytest.raises(ValueError, match="mode"):
+        decrypt(d, encrypt(pub, b"x"), 2)
@@ -0,0 +1,37 @@
+"""
+测试批量 SM3（sm3_hash_many）：不同长度（含跨分组填充边界）的消息混合成批时，
+向量化实现与逐条 gmssl.sm3.sm3_hash 结果一致，顺序与输入一致；小批量走逐条路径
+"""
+import secrets
+
+from gmssl import func, sm3
+
+from app.services.SM3_Service import BATCH_MIN_SIZE, sm3_hash_many
+from app.services.SM3_Vectorized import hash_many
+
+
+def _gmssl(data):
+    return sm3.sm3_hash(func.bytes_to_list(data))
+
+
+def test_mixed_lengths_match_gmssl():
+    # 55 / 56、119 / 120 是填充后分组数变化的边界
+    lengths = [0, 1, 11, 32, 55, 56, 63, 64, 65, 119, 120, 200] * 3
+    messages = [secrets.token_bytes(n) for n in lengths]
+    expected = [_gmssl(m) for m in messages]
+    assert hash_many(messages) == expected
+    assert sm3_hash_many(messages) == expected
+
+
+def test_str_and_small_batches():
+    messages = ["13800138000", "中文手机号", b"\x00" * 10]
+    expected = [_gmssl(m.encode("utf-8") if isinstance(m, str) else m) for m in messages]
+    assert len(messages) < BATCH_MIN_SIZE
+    assert sm3_hash_many(messages) == expected
+    assert sm3_hash_many(messages * BATCH_MIN_SIZE) == expected * BATCH_MIN_SIZE
+    assert sm3_hash_many([]) == []
+
+
+def test_same_length_batch():
+    phones = [f"1380013{i:04d}".encode() for i in range(100)]
+    assert hash_many(phones) == [_gmssl(p) for p in phones]
@@ -0,0 +1,66 @@
+"""
+测试 hashlib 风格的 SM3 增量哈希：标准测试向量、任意分片 update 与一次性计算一致、
+copy() 分叉后互不影响，以及与 gmssl.sm3.sm3_hash 的结果一致
+"""
+import secrets
+
+import pytest
+from gmssl import func, sm3
+
+from app.services.SM3_Service import SM3, sm3_hash
+
+
+def _gmssl(data):
+    return sm3.sm3_hash(func.bytes_to_list(data))
+
+
+def test_standard_vectors():
+    # GB/T 32905-2016 附录 A 示例
+    assert SM3(b"abc").hexdigest() == "66c7f0f462eeedd9d1f2d46bdc10e4e24167c4875cf2f7a2297da02b8f4ba8e0"
+    assert SM3(b"abcd" * 16).hexdigest() == "debe9ff92275b8a138604889c18e5a4d6fdb70e5387e5765293dcba39c0c5732"
+    assert SM3().digest_size == 32 and SM3().block_size == 64
+
+
+@pytest.mark.parametrize("length", [0, 1, 55, 56, 63, 64, 65, 119, 128, 1000])
+def test_matches_gmssl(length):
+    data = secrets.token_bytes(length)
+    assert SM3(data).hexdigest() == _gmssl(data)
+    assert sm3_hash(data) == _gmssl(data)
+
+
+def test_incremental_updates():
+    data = secrets.token_bytes(500)
+    expected = SM3(data).hexdigest()
+    for step in (1, 7, 63, 64, 65, 200):
+        h = SM3()
+        for i in range(0, len(data), step):
+            h.update(data[i:i + step])
+        assert h.hexdigest() == expected
+    h = SM3()
+    h.update(bytearray(data[:100]))
+    h.update(memoryview(data)[100:])
+    assert h.hexdigest() == expected
+    # digest() 不改变状态，之后还能继续 update
+    assert h.digest() == bytes.fromhex(expected)
+    h.update(b"x")
+    assert h.hexdigest() == SM3(data + b"x").hexdigest()
+
+
+def test_copy_forks_state():
+    prefix = b"shared-prefix" * 10
+    base = SM3(prefix)
+    left = base.copy()
+    right = base.copy()
+    left.update(b"left")
+    right.update(b"right")
+    assert left.hexdigest() == _gmssl(prefix + b"left")
+    assert right.hexdigest() == _gmssl(prefix + b"right")
+    assert base.hexdigest() == _gmssl(prefix)
+
+
+def test_rejects_str():
+    with pytest.raises(TypeError):
+        SM3().update("text")
+    with pytest.raises(TypeError):
+        sm3_hash(123)
+    assert sm3_hash("中文") == _gmssl("中文".encode("utf-8"))
@@ -0,0 +1,129 @@
+"""
+测试 SM4 流式加解密：GCM 往返与 tag / 密文 / 附加数据被篡改时拒绝，CTR 在任意分片边界上往返
+（cryptography 后端与 gmssl 后端的计数器实现结果一致），以及 iter_encrypt / encrypt_file 的输出格式
+"""
+import io
+import secrets
+
+import pytest
+
+from app.services.SM4_Backend import GmsslSM4Backend
+from app.services.SM4_Stream import (
+    CTR,
+    GCM,
+    GCM_NONCE_SIZE,
+    GCM_TAG_SIZE,
+    SM4StreamDecryptor,
+    SM4StreamEncryptor,
+    decrypt_file,
+    encrypt_file,
+    iter_decrypt,
+    iter_encrypt,
+)
+
+KEY = bytes(range(16))
+# 分片长度故意不是 16 的倍数，覆盖剩余密钥流的衔接
+SIZES = (1, 15, 16, 17, 33, 100, 7)
+
+
+def _split(data, sizes=SIZES):
+    chunks = []
+    i = 0
+    while i < len(data):
+        n = sizes[len(chunks) % len(sizes)]
+        chunks.append(data[i:i + n])
+        i += n
+    return chunks
+
+
+def _encrypt(data, mode, backend=None, nonce=None, associated_data=None):
+    encryptor = SM4StreamEncryptor(KEY, mode, nonce, associated_data, backend)
+    out = b"".join(encryptor.update(chunk) for chunk in _split(data)) + encryptor.finalize()
+    return encryptor.nonce, out, encryptor.tag
+
+
+def _decrypt(nonce, data, mode, tag=None, backend=None, associated_data=None):
+    decryptor = SM4StreamDecryptor(KEY, nonce, mode, associated_data, backend)
+    out = b"".join(decryptor.update(chunk) for chunk in _split(data, SIZES[::-1]))
+    return out + decryptor.finalize(tag)
+
+
+def test_gcm_round_trip():
+    data = secrets.token_bytes(1000)
+    nonce, ciphertext, tag = _encrypt(data, GCM, associated_data=b"order-42")
+    assert len(nonce) == GCM_NONCE_SIZE and len(tag) == GCM_TAG_SIZE
+    assert len(ciphertext) == len(data) and ciphertext != data
+    assert _decrypt(nonce, ciphertext, GCM, tag, associated_data=b"order-42") == data
+
+
+def test_gcm_rejects_tampering():
+    data = secrets.token_bytes(200)
+    nonce, ciphertext, tag = _encrypt(data, GCM, associated_data=b"order-42")
+    bad_tag = bytes([tag[0] ^ 1]) + tag[1:]
+    bad_ciphertext = ciphertext[:50] + bytes([ciphertext[50] ^ 1]) + ciphertext[51:]
+    with pytest.raises(ValueError, match="认证失败"):
+        _decrypt(nonce, ciphertext, GCM, bad_tag, associated_data=b"order-42")
+    with pytest.raises(ValueError, match="认证失败"):
+        _decrypt(nonce, bad_ciphertext, GCM, tag, associated_data=b"order-42")
+    with pytest.raises(ValueError, match="认证失败"):
+        _decrypt(nonce, ciphertext, GCM, tag, associated_data=b"order-43")
+    with pytest.raises(ValueError, match="缺少 16 字节 tag"):
+        _decrypt(nonce, ciphertext, GCM, associated_data=b"order-42")
+
+
+def test_ctr_round_trip_across_backends():
+    data = secrets.token_bytes(777)
+    nonce, ciphertext, tag = _encrypt(data, CTR)
+    assert tag is None
+    assert _decrypt(nonce, ciphertext, CTR) == data
+    # gmssl 后端走 _CounterStream，同一 nonce 产出同一密文，可与 cryptography 后端互解
+    gmssl = GmsslSM4Backend()
+    assert _encrypt(data, CTR, gmssl, nonce)[1] == ciphertext
+    assert _decrypt(nonce, ciphertext, CTR, backend=gmssl) == data
+
+
+def test_ctr_counter_wraps():
+    data = secrets.token_bytes(100)
+    nonce = b"\xff" * 16
+    _, ciphertext, _ = _encrypt(data, CTR, nonce=nonce)
+    assert _encrypt(data, CTR, GmsslSM4Backend(), nonce)[1] == ciphertext
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        SM4StreamEncryptor(KEY, CTR, associated_data=b"aad")
+    with pytest.raises(ValueError):
+        SM4StreamEncryptor(KEY, GCM, nonce=bytes(16))
+    with pytest.raises(ValueError):
+        SM4StreamDecryptor(KEY, bytes(12), CTR)
+    with pytest.raises(RuntimeError):
+        SM4StreamEncryptor(KEY, GCM, backend=GmsslSM4Backend())
+
+
+@pytest.mark.parametrize("mode", [CTR, GCM])
+def test_iter_round_trip(mode):
+    data = secrets.token_bytes(500)
+    stream = b"".join(iter_encrypt(KEY, _split(data), mode))
+    # 密文流按任意边界重新切分，nonce 与 tag 跨片也能识别
+    for sizes in ((1,), (5, 40), (600,)):
+        assert b"".join(iter_decrypt(KEY, _split(stream, sizes), mode)) == data
+    if mode == GCM:
+        tampered = stream[:-1] + bytes([stream[-1] ^ 1])
+        with pytest.raises(ValueError):
+            b"".join(iter_decrypt(KEY, [tampered], mode))
+        with pytest.raises(ValueError, match="缺少 tag"):
+            b"".join(iter_decrypt(KEY, [stream[:GCM_NONCE_SIZE + 5]], mode))
+
+
+def test_file_round_trip():
+    data = secrets.token_bytes(10000)
+    encrypted = io.BytesIO()
+    written = encrypt_file(KEY, io.BytesIO(data), encrypted, associated_data=b"file", chunk_size=1000)
+    assert written == GCM_NONCE_SIZE + len(data) + GCM_TAG_SIZE == len(encrypted.getvalue())
+    decrypted = io.BytesIO()
+    encrypted.seek(0)
+    assert decrypt_file(KEY, encrypted, decrypted, associated_data=b"file", chunk_size=999) == len(data)
+    assert decrypted.getvalue() == data
+    encrypted.seek(0)
+    with pytest.raises(ValueError, match="认证失败"):
+        decrypt_file(KEY, encrypted, io.BytesIO(), associated_data=b"other", chunk_size=999)
@@ -0,0 +1,126 @@
+"""
+测试原生 sqlite3 连接池（SQLitePool）：每请求一个线程时连接跨线程复用、连接数上限与借出超时、
+with 块的提交 / 回滚，以及被关闭连接的重新打开计数
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+
+import pytest
+
+from app.services.SQLite_Pool import SQLitePool
+
+
+def _pool(**options):
+    path = os.path.join(tempfile.mkdtemp(prefix="test_sqlite_pool_"), "pool.db")
+    pool = SQLitePool(path, **options)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE items (name TEXT PRIMARY KEY)")
+    return pool
+
+
+def _in_new_thread(fn):
+    """模拟 Flask 开发服务器：每个请求在一个新线程里处理"""
+    errors = []
+
+    def run():
+        try:
+            fn()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    if errors:
+        raise errors[0]
+
+
+def test_connection_reused_across_request_threads():
+    pool = _pool()
+
+    def request(i):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO items VALUES (?)", (f"item-{i}",))
+
+    for i in range(20):
+        _in_new_thread(lambda i=i: request(i))
+    stats = pool.stats()
+    assert stats["opened"] == 1
+    assert stats["checkouts"] == 21
+    assert stats["reused"] == 20
+    assert stats["connections"] == 1 and stats["idle"] == 1 and stats["in_use"] == 0
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 20
+
+
+def test_bounded_with_waiting_and_timeout():
+    pool = _pool(max_connections=2, checkout_timeout=0.2)
+    release = threading.Event()
+    held = threading.Barrier(3)
+
+    def hold():
+        with pool.connection():
+            held.wait()
+            release.wait(5)
+
+    holders = [threading.Thread(target=hold) for _ in range(2)]
+    for t in holders:
+        t.start()
+    held.wait()
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection():
+            pass
+    # 等待中的借出方在连接归还后拿到连接
+    waiter_done = threading.Event()
+
+    def wait_for_connection():
+        pool.checkout_timeout = 5
+        with pool.connection():
+            waiter_done.set()
+
+    waiter = threading.Thread(target=wait_for_connection)
+    waiter.start()
+    release.set()
+    waiter.join(5)
+    for t in holders:
+        t.join(5)
+    assert waiter_done.is_set()
+    stats = pool.stats()
+    assert stats["max_in_use"] == 2
+    assert stats["connections"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["waits"] >= 2
+
+
+def test_block_commits_or_rolls_back():
+    pool = _pool()
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO items VALUES ('kept')")
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO items VALUES ('dropped')")
+            raise RuntimeError("boom")
+    with pool.connection() as conn:
+        names = [row["name"] for row in conn.execute("SELECT name FROM items")]
+        assert not conn.in_transaction
+    assert names == ["kept"]
+    assert pool.stats()["opened"] == 1
+
+
+def test_closed_connection_is_replaced():
+    pool = _pool()
+    with pool.connection() as conn:
+        pass
+    conn.close()
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+    stats = pool.stats()
+    assert stats["reopened"] == 1
+    assert stats["opened"] == 2
+    assert stats["connections"] == 1
+    pool.close_all()
+    assert pool.stats()["connections"] == 0
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
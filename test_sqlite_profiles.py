@@ -0,0 +1,106 @@
+"""
+测试 SQLite 引擎配置（SQLite_Profiles）：每个配置新建的连接上 PRAGMA 确实生效、连接池参数与配置一致，
+只读副本拒绝写入，kwargs 覆盖连接池参数，init_flask_sqlite 给 Flask-SQLAlchemy 的引擎挂上同样的 PRAGMA，
+以及未知配置名抛 ValueError
+"""
+import os
+import tempfile
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.services.SQLite_Profiles import SQLITE_PROFILES, create_sqlite_engine, get_profile, init_flask_sqlite
+
+# PRAGMA 读回来的是数值，符号名按 SQLite 文档换算
+_SYMBOLS = {
+    "synchronous": {"OFF": 0, "NORMAL": 1, "FULL": 2},
+    "temp_store": {"DEFAULT": 0, "FILE": 1, "MEMORY": 2},
+    "query_only": {"OFF": 0, "ON": 1},
+}
+
+
+def _db_path():
+    path = os.path.join(tempfile.mkdtemp(prefix="test_sqlite_profiles_"), "test.db")
+    # 只读副本不改 journal_mode，先建好库和表
+    engine = create_sqlite_engine(path)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+    engine.dispose()
+    return path
+
+
+def _expected(key, value):
+    if key == "journal_mode":
+        return value.lower()
+    return _SYMBOLS.get(key, {}).get(value, value)
+
+
+def _read_pragmas(conn, pragmas):
+    return {key: conn.exec_driver_sql(f"PRAGMA {key}").scalar() for key in pragmas}
+
+
+@pytest.mark.parametrize("profile", list(SQLITE_PROFILES))
+def test_profile_pragmas_applied(profile):
+    pragmas = {key: value for key, value in get_profile(profile)["pragmas"].items() if value is not None}
+    engine = create_sqlite_engine(_db_path(), profile)
+    try:
+        with engine.connect() as conn:
+            assert _read_pragmas(conn, pragmas) == {key: _expected(key, value) for key, value in pragmas.items()}
+        pool_options = get_profile(profile)["pool_options"]
+        assert engine.pool.size() == pool_options["pool_size"]
+        assert engine.pool._max_overflow == pool_options["max_overflow"]
+    finally:
+        engine.dispose()
+
+
+def test_pragmas_applied_to_every_connection():
+    engine = create_sqlite_engine(_db_path(), "bulk-load", pool_size=2)
+    try:
+        with engine.connect() as first, engine.connect() as second:
+            assert first.connection.dbapi_connection is not second.connection.dbapi_connection
+            for conn in (first, second):
+                assert _read_pragmas(conn, ["synchronous", "cache_size"]) == {
+                    "synchronous": 0, "cache_size": -256 * 1024,
+                }
+    finally:
+        engine.dispose()
+
+
+def test_read_only_replica_rejects_writes():
+    path = _db_path()
+    engine = create_sqlite_engine(path, "read-only-replica")
+    try:
+        with engine.connect() as conn:
+            # 不改 journal_mode：保持建库时的 WAL
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert conn.execute(text("SELECT COUNT(*) FROM t")).scalar() == 0
+            with pytest.raises(OperationalError, match="readonly"):
+                conn.execute(text("INSERT INTO t (id) VALUES (1)"))
+    finally:
+        engine.dispose()
+
+
+def test_flask_engine_gets_profile():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_db_path()}"
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_size": 3}
+    db = SQLAlchemy()
+    init_flask_sqlite(app, db, "oltp")
+    with app.app_context():
+        try:
+            with db.engine.connect() as conn:
+                assert _read_pragmas(conn, ["journal_mode", "synchronous", "busy_timeout"]) == {
+                    "journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000,
+                }
+            # 应用自己的引擎参数优先于配置
+            assert db.engine.pool.size() == 3
+        finally:
+            db.engine.dispose()
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError, match="未知的 SQLite 配置"):
+        create_sqlite_engine(_db_path(), "fast")
@@ -0,0 +1,172 @@
+"""
+测试 SM2 预计算表磁盘缓存：写入后冷启动按需解码（不重建）、只装入登记过的公钥表、
+未变化时不重写、索引 / 表数据 / 缓存密钥损坏时作废并现场计算、表数量上限与密钥环删除密钥后的淘汰
+"""
+import os
+import secrets
+import tempfile
+
+from app.services import SM2_Curve, SM2_TableCache
+from app.services.SM2_Curve import FixedBaseTable, N, derive_public_key, register_public_key, sign_digest, verify_signature
+from app.services.SM2_Keyring import SM2Keyring
+from app.services.SM2_TableCache import load_table_cache, save_table_cache
+
+
+def _cache_path():
+    return os.path.join(tempfile.mkdtemp(prefix="test_table_cache_"), "sm2_tables.cache")
+
+
+def _keypair():
+    d = secrets.randbelow(N - 1) + 1
+    return d, derive_public_key("%064x" % d)
+
+
+def _file_keys(path):
+    state = SM2_TableCache._CacheFile(path)
+    SM2_TableCache._read(state)
+    return list(state.tables)
+
+
+class _cold_process:
+    """模拟新进程：清空已装入的缓存文件与给定公钥的常驻表，并统计现场建表次数"""
+
+    def __init__(self, *public_keys):
+        self.public_keys = public_keys
+
+    def __enter__(self):
+        self.old_files = SM2_TableCache._files
+        SM2_TableCache._files = {}
+        for key in self.public_keys:
+            SM2_Curve._PINNED_TABLES.pop(key, None)
+        self.builds = 0
+        self.original_init = FixedBaseTable.__init__
+
+        def counting(table, *args, **kwargs):
+            self.builds += 1
+            self.original_init(table, *args, **kwargs)
+
+        FixedBaseTable.__init__ = counting
+        return self
+
+    def __exit__(self, *exc):
+        FixedBaseTable.__init__ = self.original_init
+        SM2_TableCache._files = self.old_files
+
+
+def _check_table(public_key, d):
+    table = register_public_key(public_key)
+    assert SM2_Curve.point_to_hex(table.rows[0][0]) == public_key
+    e = int.from_bytes(secrets.token_bytes(32), "big")
+    rs = None
+    while rs is None:
+        rs = sign_digest(d, e, secrets.randbelow(N - 1) + 1)
+    assert verify_signature(public_key, *rs, e)
+
+
+def test_round_trip_is_lazy_and_not_rewritten():
+    path = _cache_path()
+    (d1, pub1), (d2, pub2) = _keypair(), _keypair()
+    register_public_key(pub1)
+    register_public_key(pub2)
+    assert save_table_cache(path, [pub1, pub2])
+    mtime = os.stat(path).st_mtime_ns
+    # 没有新增、淘汰或派生公钥时不重写文件
+    assert not save_table_cache(path, [pub1, pub2])
+    assert not save_table_cache(path, [pub2])
+    assert os.stat(path).st_mtime_ns == mtime
+    assert oct(os.stat(path + ".key").st_mode & 0o777) == "0o600"
+    with _cold_process(pub1, pub2) as cold:
+        assert load_table_cache(path) == 2
+        # 只有登记的公钥才解码并常驻
+        assert pub1 not in SM2_Curve._PINNED_TABLES and pub2 not in SM2_Curve._PINNED_TABLES
+        _check_table(pub1, d1)
+        assert pub1 in SM2_Curve._PINNED_TABLES and pub2 not in SM2_Curve._PINNED_TABLES
+        assert cold.builds == 0
+    assert sorted(_file_keys(path)) == sorted(["G", pub1, pub2])
+
+
+def test_corrupt_table_rebuilt():
+    path = _cache_path()
+    (d1, pub1), (d2, pub2) = _keypair(), _keypair()
+    register_public_key(pub1)
+    register_public_key(pub2)
+    save_table_cache(path, [pub1, pub2])
+    state = SM2_TableCache._CacheFile(path)
+    SM2_TableCache._read(state)
+    offset = state.tables[pub1][0] + 1000
+    state.buf.close()
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 1]))
+    with _cold_process(pub1, pub2) as cold:
+        assert load_table_cache(path) == 2
+        _check_table(pub1, d1)
+        _check_table(pub2, d2)
+        # 损坏的那张表现场重建，另一张照常取自缓存
+        assert cold.builds == 1
+        # 下次保存写回完好的表
+        assert save_table_cache(path, [pub1, pub2])
+    with _cold_process(pub1) as cold:
+        load_table_cache(path)
+        _check_table(pub1, d1)
+        assert cold.builds == 0
+
+
+def test_tampered_index_or_secret_rejected():
+    path = _cache_path()
+    _, pub = _keypair()
+    register_public_key(pub)
+    save_table_cache(path, [pub])
+    with open(path, "rb") as f:
+        original = f.read()
+    index_start = SM2_TableCache._HEADER.size
+    tampered = bytearray(original)
+    tampered[index_start + 5] ^= 1
+    with open(path, "wb") as f:
+        f.write(tampered)
+    with _cold_process(pub):
+        assert load_table_cache(path) == 0
+    # 文件完好但缓存密钥被替换：同样作废
+    with open(path, "wb") as f:
+        f.write(original)
+    with open(path + ".key", "wb") as f:
+        f.write(os.urandom(32))
+    with _cold_process(pub) as cold:
+        assert load_table_cache(path) == 0
+        register_public_key(pub)
+        assert cold.builds == 1
+
+
+def test_size_cap_keeps_newest():
+    path = _cache_path()
+    keys = [_keypair()[1] for _ in range(3)]
+    old_max = SM2_TableCache.MAX_CACHED_TABLES
+    SM2_TableCache.MAX_CACHED_TABLES = 2
+    try:
+        for key in keys:
+            register_public_key(key)
+            assert save_table_cache(path, [key])
+    finally:
+        SM2_TableCache.MAX_CACHED_TABLES = old_max
+    assert _file_keys(path) == ["G", keys[2], keys[1]]
+
+
+def test_keyring_evicts_removed_keys():
+    directory = tempfile.mkdtemp(prefix="test_table_cache_")
+    keyring = SM2Keyring(os.path.join(directory, "keyring.json"))
+    path = os.path.join(directory, "sm2_tables.cache")
+    # 缓存文件默认放在密钥环旁
+    assert keyring.table_cache_path == path
+    old_public = keyring.public_key(keyring.signing_kid())
+    assert old_public in _file_keys(path)
+    keyring.rotate(grace=60)
+    new_public = keyring.public_key(keyring.signing_kid())
+    assert {old_public, new_public} <= set(_file_keys(path))
+    # 宽限期为负：上一把签发密钥随轮换立即删除，其表从文件与常驻表中移除
+    keyring.rotate(grace=-1)
+    keys = _file_keys(path)
+    assert new_public not in keys and new_public not in SM2_Curve._PINNED_TABLES
+    assert old_public in keys
+    assert keyring.public_key(keyring.signing_kid()) in keys
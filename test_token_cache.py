@@ -0,0 +1,110 @@
+"""
+测试已验签令牌缓存（VerifiedTokenCache）：命中免去重复验签、按 exp 过期、LRU 淘汰，
+以及 add_to_blacklist 清除 verify_token_cached 的缓存条目、注销后缓存不再放行
+"""
+import os
+import tempfile
+import time
+
+_TMP = tempfile.mkdtemp(prefix="test_token_cache_")
+os.environ.setdefault("REVOCATION_DB_PATH", os.path.join(_TMP, "revocation.db"))
+
+from app.services.JWT_SM2_Utils import JWTSM2Service, VerifiedTokenCache
+from app.services.Token_Revocation import SharedRevocationStore
+
+
+def _service():
+    service = JWTSM2Service()
+    service._token_blacklist = SharedRevocationStore(os.path.join(tempfile.mkdtemp(dir=_TMP), "revocation.db"))
+    return service
+
+
+def _fails(fn, *args):
+    try:
+        fn(*args)
+    except RuntimeError:
+        return True
+    return False
+
+
+class _count_verifies:
+    """统计 verify_token_cached 实际走到验签的次数"""
+
+    def __init__(self, service):
+        self.service = service
+
+    def __enter__(self):
+        self.calls = 0
+        original = self.service.verify_token
+
+        def counting(token):
+            self.calls += 1
+            return original(token)
+
+        self.service.verify_token = counting
+        return self
+
+    def __exit__(self, *exc):
+        del self.service.verify_token
+
+
+def test_cache_hit_skips_verification():
+    service = _service()
+    token = service.generate_token({"username": "alice", "role": "user"})
+    with _count_verifies(service) as counter:
+        first = service.verify_token_cached(token)
+        second = service.verify_token_cached(token)
+    assert counter.calls == 1
+    assert first == second and first["username"] == "alice"
+    # 返回的是副本，调用方改动不影响缓存
+    second["role"] = "admin"
+    assert service.verify_token_cached(token)["role"] == "user"
+    assert service.token_cache.stats()["hits"] == 2
+
+
+def test_blacklist_evicts_cached_entry():
+    service = _service()
+    token = service.generate_token({"username": "alice"})
+    other = service.generate_token({"username": "bob"})
+    service.verify_token_cached(token)
+    service.verify_token_cached(other)
+    assert service.token_cache.stats()["size"] == 2
+    service.add_to_blacklist(token)
+    assert service.token_cache.stats()["size"] == 1
+    assert service.token_cache.get(token) is None
+    assert _fails(service.verify_token_cached, token)
+    assert service.verify_token_cached(other)["username"] == "bob"
+
+
+def test_revoked_session_rejected_from_cache():
+    service = _service()
+    tokens = service.generate_session_tokens("alice")
+    service.verify_token_cached(tokens["refresh_token"])
+    # 只注销 access_token：同一会话的会话凭证虽仍在缓存中，也随会话一并失效
+    service.add_to_blacklist(tokens["access_token"])
+    assert service.token_cache.get(tokens["refresh_token"]) is not None
+    assert _fails(service.verify_token_cached, tokens["refresh_token"])
+
+
+def test_tampered_token_not_cached():
+    service = _service()
+    token = service.generate_token({"username": "alice"})
+    head, payload, sig = token.split(".")
+    forged = f"{head}.{payload}.{'A' if sig[0] != 'A' else 'B'}{sig[1:]}"
+    assert _fails(service.verify_token_cached, forged)
+    assert service.token_cache.stats()["size"] == 0
+
+
+def test_expiry_and_lru():
+    cache = VerifiedTokenCache(max_size=2)
+    now = int(time.time())
+    cache.put("expired", {"exp": now - 1})
+    assert cache.get("expired") is None
+    cache.put("a", {"exp": now + 60})
+    cache.put("b", {"exp": now + 60})
+    cache.get("a")
+    cache.put("c", {"exp": now + 60})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    cache.clear()
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,111 @@
+"""
+测试用户记录缓存（UserCache）：命中 / 负缓存、TTL 过期、LRU 淘汰、负缓存独立限量、世代号防止旧值回填，
+以及 UserService 注册、改手机号后缓存同步失效
+"""
+import os
+import tempfile
+import time
+
+from app.services import user_service as user_module
+from app.services.user_service import UserCache, UserService
+
+
+class _temp_db:
+    """把 user_service 的 user.db 换成临时库，测试结束后还原"""
+
+    def __enter__(self):
+        self.old = user_module.DB_PATH
+        user_module.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="test_user_cache_"), "user.db")
+        user_module._ensure_table()
+        return UserService()
+
+    def __exit__(self, *exc):
+        user_module.DB_PATH = self.old
+
+
+def test_hits_and_negative_hits():
+    cache = UserCache()
+    hit, record, generation = cache.get("alice")
+    assert not hit and record is None
+    cache.put("alice", ("row",), generation)
+    cache.put("ghost", None, generation)
+    assert cache.get("alice")[:2] == (True, ("row",))
+    assert cache.get("ghost")[:2] == (True, None)
+    stats = cache.stats()
+    assert (stats["hits"], stats["negative_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_ttl_expiry():
+    cache = UserCache(ttl=0.2, negative_ttl=0.05)
+    generation = cache.get("alice")[2]
+    cache.put("alice", ("row",), generation)
+    cache.put("ghost", None, generation)
+    time.sleep(0.1)
+    # 负缓存有效期更短，先过期
+    assert not cache.get("ghost")[0]
+    assert cache.get("alice")[0]
+    time.sleep(0.15)
+    assert not cache.get("alice")[0]
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_eviction():
+    cache = UserCache(max_size=3)
+    generation = cache.get("a")[2]
+    for name in ("a", "b", "c"):
+        cache.put(name, (name,), generation)
+    cache.get("a")
+    cache.put("d", ("d",), generation)
+    assert not cache.get("b")[0]
+    assert all(cache.get(name)[0] for name in ("a", "c", "d"))
+    assert cache.stats()["size"] == 3
+
+
+def test_negative_entries_bounded_separately():
+    cache = UserCache(max_size=4, negative_max_size=2)
+    generation = cache.get("alice")[2]
+    cache.put("alice", ("row",), generation)
+    # 大量不存在的用户名只在负缓存内互相淘汰，挤不掉真实用户
+    for i in range(100):
+        cache.put(f"ghost{i}", None, generation)
+    assert cache.get("alice")[:2] == (True, ("row",))
+    assert cache.get("ghost99")[:2] == (True, None)
+    assert not cache.get("ghost0")[0]
+    stats = cache.stats()
+    assert (stats["size"], stats["negative_size"]) == (1, 2)
+    # 同一用户名从负缓存转为正缓存时不留两份
+    cache.put("ghost99", ("new row",), generation)
+    assert cache.get("ghost99")[:2] == (True, ("new row",))
+    assert cache.stats()["negative_size"] == 1
+
+
+def test_stale_read_not_written_back():
+    cache = UserCache()
+    _, _, generation = cache.get("alice")
+    # 查库期间该用户被修改：失效之前读到的旧值不能回填
+    cache.invalidate("alice")
+    cache.put("alice", ("old row",), generation)
+    assert not cache.get("alice")[0]
+    _, _, generation = cache.get("alice")
+    cache.put("alice", ("new row",), generation)
+    assert cache.get("alice")[:2] == (True, ("new row",))
+    cache.clear()
+    assert not cache.get("alice")[0]
+
+
+def test_service_invalidates_on_writes():
+    with _temp_db() as service:
+        assert service.get_user_by_username("alice") is None
+        assert service.login("alice", "Passw0rd!") is None
+        assert service.user_cache.stats()["negative_hits"] == 1
+        # 注册后负缓存被清掉，立即可登录
+        assert service.register("alice", "Passw0rd!", "13800138000", "enc-1")["success"]
+        user = service.login("alice", "Passw0rd!")
+        assert user is not None and user.phone_encrypted == "enc-1"
+        assert service.update_user_phone("alice", "enc-2", "13900139000")
+        assert service.get_user_by_username("alice").phone_encrypted == "enc-2"
+        # 重复注册失败不触发失效，随后的登录命中缓存
+        assert not service.register("alice", "Other1!", "13800138000", "enc-3")["success"]
+        assert service.login("alice", "Passw0rd!") is not None
+        assert service.user_cache.stats()["hits"] == 1
+